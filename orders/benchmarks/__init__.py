@@ -0,0 +1,13 @@
+import os
+import django
+
+
+def setup_database():
+    """Настраивает Django и создаёт тестовую базу для замеров"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'orders.settings')
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    return connection
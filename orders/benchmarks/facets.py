@@ -0,0 +1,89 @@
+"""Время фасетного фильтра на большом каталоге: прежний GROUP BY по всей
+таблице ProductParameter и списки товаров ProductFacet со счётчиками
+FacetCount, которые ведёт импорт.
+
+Запуск: python -m benchmarks.facets [количество предложений] [повторы]
+"""
+import statistics
+import sys
+import time
+from benchmarks import setup_database
+from benchmarks.import_catalog import iter_goods
+
+
+
+def legacy_counts(facets):
+    """Прежний facet_counts: счётчики по ProductParameter всех
+    предложений, включая снятые с продажи"""
+    from django.db.models import Count
+    from service.models import ProductInfo, ProductParameter
+    offers = ProductInfo.objects.all()
+    for name, values in facets.items():
+        offers = offers.filter(id__in=ProductParameter.objects.filter(
+            parameter__name=name,
+            value__in=values
+            ).values('product_info'))
+    return list(ProductParameter.objects.filter(
+        product_info__in=offers
+        ).values_list('parameter__name', 'value').annotate(
+            count=Count('product_info__product', distinct=True)
+            ).order_by())
+
+
+
+def measure(name, query, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        query()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f'{name:32s} {statistics.median(timings):10.1f} ms')
+
+
+
+def main(count, repeats):
+    setup_database()
+    from endpoints.filters import facet_counts, ParameterFacetFilter
+    from endpoints.queries import product_queryset
+    from service.importer import get_importer, COPY
+    from service.models import Shop
+
+    shop = Shop.objects.create(name='facets', distance=10)
+    stats = get_importer(shop, loader=COPY).run(
+        [{'id': 224, 'name': 'Смартфоны'}, {'id': 15, 'name': 'Аксессуары'}],
+        iter_goods(count)
+        )
+    print(f'import with facets: {stats.rows} rows {stats.duration:8.2f} s')
+
+    one = {'Цвет': {'Цвет 3'}}
+    two = {'Цвет': {'Цвет 3', 'Цвет 4'},
+           'Встроенная память (Гб)': {'Встроенная память (Гб) 3'}}
+    measure('legacy, no filter', lambda: legacy_counts({}), repeats)
+    measure('legacy, two parameters', lambda: legacy_counts(two), repeats)
+    measure('facets, no filter', lambda: facet_counts({}), repeats)
+    measure('facets, one parameter', lambda: facet_counts(one), repeats)
+    measure('facets, two parameters', lambda: facet_counts(two), repeats)
+
+    backend = ParameterFacetFilter()
+    measure('products page, two parameters', lambda: list(
+        backend.filter_queryset(FakeRequest(two), product_queryset(), None)[:50]
+        ), repeats)
+
+
+
+"""Запрос с параметрами ?param=имя:значение для ParameterFacetFilter"""
+class FakeRequest:
+
+    def __init__(self, facets):
+        from django.http import QueryDict
+        self.query_params = QueryDict(mutable=True)
+        self.query_params.setlist('param', [
+            f'{name}:{value}' for name, values in facets.items()
+            for value in values
+            ])
+
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5)
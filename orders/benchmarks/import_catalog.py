@@ -0,0 +1,99 @@
+"""Сравнение построчного импорта прайса с пакетным CatalogImporter.
+
+Запуск: python -m benchmarks.import_catalog [количество товаров]
+"""
+import sys
+import time
+from benchmarks import setup_database
+
+
+PARAMETERS = ('Диагональ (дюйм)', 'Разрешение (пикс)',
+              'Встроенная память (Гб)', 'Цвет')
+
+
+
+def iter_goods(count):
+    for number in range(count):
+        yield {'id': 1000000 + number,
+               'category': 224 if number % 2 else 15,
+               'model': f'model/{number % 100}',
+               'name': f'Товар {number % 5000}',
+               'price': 1000 + number % 700,
+               'price_rrc': 1200 + number % 700,
+               'quantity': number % 30,
+               'parameters': {name: f'{name} {number % 7}'
+                              for name in PARAMETERS}}
+
+
+
+def generate_goods(count):
+    return list(iter_goods(count))
+
+
+
+def legacy_import(shop, categories, goods):
+    """Прежний путь update_price: get_or_create на каждую строку"""
+    from service.models import ProductInfo, Product, Parameter, \
+        ProductParameter, Category
+    for category in categories:
+        category_object, _ = Category.objects.get_or_create(
+            id=category['id'],
+            name=category['name']
+        )
+        category_object.shops.add(shop.id)
+    ProductInfo.objects.filter(shop=shop.id).delete()
+    for item in goods:
+        product, _ = Product.objects.get_or_create(
+            name=item['name'],
+            category_id=item['category']
+        )
+        product_info = ProductInfo.objects.create(
+            external_id=item['id'],
+            model=item['model'],
+            shop_id=shop.id,
+            product_id=product.id,
+            quantity=item['quantity'],
+            price=item['price'],
+            price_rrc=item['price_rrc']
+        )
+        for name, value in item['parameters'].items():
+            parameter_object, _ = Parameter.objects.get_or_create(name=name)
+            ProductParameter.objects.create(
+                product_info_id=product_info.id,
+                parameter_id=parameter_object.id,
+                value=value
+            )
+
+
+
+def main(count):
+    setup_database()
+    from django.db import transaction
+    from service.importer import CatalogImporter, QueryCounter, DELTA
+    from service.models import Shop
+
+    categories = [{'id': 224, 'name': 'Смартфоны'},
+                  {'id': 15, 'name': 'Аксессуары'}]
+    goods = generate_goods(count)
+
+    shop = Shop.objects.create(name='legacy', distance=10)
+    start = time.perf_counter()
+    with QueryCounter() as counter, transaction.atomic():
+        legacy_import(shop, categories, goods)
+    duration = time.perf_counter() - start
+    print(f'legacy:   {count / duration:10.1f} rows/s '
+          f'{counter.count:8d} queries {duration:8.2f} s')
+
+    shop = Shop.objects.create(name='bulk', distance=10)
+    stats = CatalogImporter(shop).run(categories, goods)
+    print(f'importer: {stats.rows_per_second:10.1f} rows/s '
+          f'{stats.queries:8d} queries {stats.duration:8.2f} s')
+
+    stats = CatalogImporter(shop, mode=DELTA).run(categories, goods)
+    print(f'delta:    {stats.rows_per_second:10.1f} rows/s '
+          f'{stats.queries:8d} queries {stats.duration:8.2f} s')
+
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,115 @@
+"""Нагрузка на чтение каталога: синхронные воркеры против ASGI.
+
+Сервер запускается отдельно с одинаковым бюджетом памяти, например
+    gunicorn orders.wsgi -w 8 -b :8000
+    gunicorn orders.asgi -k uvicorn.workers.UvicornWorker -w 2 -b :8001
+и для каждого выполняется
+    python -m benchmarks.load_catalog http://localhost:8000 \\
+        --concurrency 200 --duration 30 --pid <pid мастера gunicorn>
+Сценарий смешивает список товаров, сравнение предложений и карточки
+(--products, --shop), без заголовков If-None-Match, чтобы мерить
+ответы из кеша каталога и базы, а не 304. Печатает запросы в секунду,
+перцентили задержки, ошибки и суммарный RSS процесса с потомками.
+Обе вьюхи ограничивают частоту запросов, поэтому на время замера
+DEFAULT_THROTTLE_RATES в настройках сервера нужно поднять.
+"""
+import argparse
+import itertools
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+
+def scenario(base_url, products, shop):
+    ids = ','.join(map(str, products))
+    urls = [f'{base_url}/products/', f'{base_url}/products/?page_size=200',
+            f'{base_url}/products/offers/?product={ids}']
+    urls += [f'{base_url}/user/products/{product}?shop_id={shop}'
+             for product in products]
+    return itertools.cycle(urls)
+
+
+
+def rss(pid):
+    """RSS процесса и его потомков в МБ по /proc"""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f'/proc/{current}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+            with open(f'/proc/{current}/task/{current}/children') as children:
+                pids.extend(int(child) for child in children.read().split())
+        except FileNotFoundError:
+            continue
+    return total / 1024
+
+
+
+def worker(urls, lock, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        with lock:
+            url = next(urls)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+        except (urllib.error.URLError, OSError):
+            errors.append(url)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+
+def percentile(values, share):
+    return values[min(int(len(values) * share), len(values) - 1)] * 1000
+
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('base_url')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--products', default='1,2,3,4,5')
+    parser.add_argument('--shop', type=int, default=1)
+    parser.add_argument('--pid', type=int)
+    args = parser.parse_args()
+
+    urls = scenario(args.base_url.rstrip('/'),
+                    [int(product) for product in args.products.split(',')],
+                    args.shop)
+    lock = threading.Lock()
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        for _ in range(args.concurrency):
+            executor.submit(worker, urls, lock, deadline, latencies, errors)
+        peak = 0
+        while time.perf_counter() < deadline:
+            if args.pid:
+                peak = max(peak, rss(args.pid))
+            time.sleep(1)
+
+    latencies.sort()
+    if not latencies:
+        print(f'no successful requests, errors {len(errors)}')
+        return
+    print(f'{len(latencies) / args.duration:10.1f} req/s '
+          f'p50 {percentile(latencies, 0.5):8.1f} ms '
+          f'p95 {percentile(latencies, 0.95):8.1f} ms '
+          f'p99 {percentile(latencies, 0.99):8.1f} ms '
+          f'errors {len(errors)}')
+    if args.pid:
+        print(f'peak rss {peak:10.1f} MB (pid {args.pid} with children)')
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Время кодирования страницы каталога: стандартный JSONRenderer DRF,
+он же с вложенными блоками, закодированными строкой (как раньше отдавались
+карточки и корзина), и ORJSONRenderer.
+
+Запуск: python -m benchmarks.render_catalog [количество предложений] [повторы]
+"""
+import json
+import sys
+import time
+from benchmarks import setup_database
+from benchmarks.import_catalog import generate_goods
+
+
+
+def double_encoded(page):
+    """Вложенные блоки строкой внутри JSON, как json.dumps во вьюхах"""
+    return {'results': [
+        {key: json.dumps(value) if isinstance(value, (dict, list)) else value
+         for key, value in item.items()}
+        for item in page['results']
+        ]}
+
+
+
+def measure(render, data, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        size = len(render(data))
+    return (time.perf_counter() - start) / repeats * 1000, size
+
+
+
+def main(count, repeats):
+    setup_database()
+    from rest_framework.renderers import JSONRenderer
+    from endpoints.queries import product_info_queryset
+    from endpoints.renderers import ORJSONRenderer
+    from endpoints.serializers import ProductInfoSerializer
+    from service.importer import CatalogImporter
+    from service.models import Shop
+
+    shop = Shop.objects.create(name='render', distance=10)
+    CatalogImporter(shop).run([{'id': 224, 'name': 'Смартфоны'},
+                               {'id': 15, 'name': 'Аксессуары'}],
+                              generate_goods(count))
+    page = {'results': ProductInfoSerializer(
+        product_info_queryset().order_by('id')[:count], many=True
+        ).data}
+    renderer = JSONRenderer()
+
+    for name, render in (
+            ('drf json', renderer.render),
+            ('drf json, double',
+             lambda data: renderer.render(double_encoded(data))),
+            ('orjson', ORJSONRenderer().render),
+            ):
+        duration, size = measure(render, page, repeats)
+        print(f'{name:18s} {duration:8.2f} ms/page {size:10d} bytes')
+
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 50)
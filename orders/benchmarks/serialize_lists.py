@@ -0,0 +1,59 @@
+"""Сравнение ModelSerializer и сериализаторов по values() на длинных
+списках: товары каталога и позиции заказа. Время включает выборку из
+базы, потому что values() меняет и её.
+
+Запуск: python -m benchmarks.serialize_lists [количество предложений]
+"""
+import sys
+import time
+from benchmarks import setup_database
+from benchmarks.import_catalog import generate_goods
+
+
+
+def measure(name, serialize):
+    start = time.perf_counter()
+    rows = len(serialize())
+    duration = time.perf_counter() - start
+    print(f'{name:28s} {rows:8d} rows {duration * 1000:10.1f} ms')
+
+
+
+def main(count):
+    setup_database()
+    from endpoints.queries import product_queryset, order_items_prefetch, \
+        order_items_queryset
+    from endpoints.serializers import ProductSerializer, \
+        OrderItemCreateSerializer, ProductValuesSerializer, \
+        OrderItemValuesSerializer
+    from service.importer import CatalogImporter
+    from service.models import Shop, User, Order, OrderItem, ProductInfo
+
+    shop = Shop.objects.create(name='serialize', distance=10)
+    CatalogImporter(shop).run([{'id': 224, 'name': 'Смартфоны'},
+                               {'id': 15, 'name': 'Аксессуары'}],
+                              generate_goods(count))
+    user = User.objects.create_user('bench@mail.ru', 'Pass1234')
+    order = Order.objects.create(user=user, status='new')
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_info_id=info_id, shop=shop, quantity=1)
+        for info_id in ProductInfo.objects.values_list('id', flat=True)
+        ])
+
+    measure('products, model', lambda: ProductSerializer(
+        product_queryset(), many=True
+        ).data)
+    measure('products, values', lambda: ProductValuesSerializer(
+        ProductValuesSerializer.values(product_queryset())
+        ).data)
+    measure('order items, model', lambda: OrderItemCreateSerializer(
+        order_items_prefetch().queryset.filter(order=order), many=True
+        ).data)
+    measure('order items, values', lambda: OrderItemValuesSerializer(
+        OrderItemValuesSerializer.values(order_items_queryset(order.id))
+        ).data)
+
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -1,4 +1,9 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class BackendConfig(AppConfig):
-    name = 'endpoints'
\ No newline at end of file
+    name = 'endpoints'
+
+    def ready(self):
+        from endpoints.search import create_search_indexes
+        post_migrate.connect(create_search_indexes, sender=self)
@@ -0,0 +1,202 @@
+"""Асинхронные вьюхи чтения каталога для ASGI (orders.asgi).
+
+Отдают то же, что ProductViewSet.list, ProductViewSet.offers и
+ProductDetailView, из того же кеша каталога и с теми же ETag и
+Last-Modified, но не держат поток на время ожидания базы и кеша.
+Аутентификация и ограничение частоты запросов те же, что у DRF:
+пользователь и счётчики общие с синхронными вьюхами. Остальные методы
+передаются синхронным вьюхам DRF.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import APIException, AuthenticationFailed, \
+    NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from endpoints.filters import ParameterFacetFilter, parse_facets
+from endpoints.offers import parse_product_ids, acompare_offers
+from endpoints.pagination import KeysetPagination
+from endpoints.queries import product_queryset
+from endpoints.renderers import ORJSONResponse
+from endpoints.serializers import ProductValuesSerializer
+from endpoints.views import ProductViewSet, ProductDetailView, \
+    conditional_response, set_validators
+from service.cards import aget_card
+from service.catalog_cache import acached, acatalog_state
+
+
+READ_METHODS = ('GET', 'HEAD')
+product_list_view = ProductViewSet.as_view({'get': 'list', 'post': 'create'})
+product_offers_view = ProductViewSet.as_view({'get': 'offers'})
+product_detail_view = ProductDetailView.as_view()
+
+
+
+async def acatalog_response(request, respond, shop_id=None):
+    """catalog_response для асинхронных вьюх, respond - корутина"""
+    path = request.get_full_path()
+    version, modified = await acatalog_state(shop_id)
+    validators, response = conditional_response(request, path, version,
+                                                modified)
+    if response is None:
+        response = await acached_response(path, version, respond)
+    return set_validators(response, *validators)
+
+
+
+async def acached_response(path, version, respond):
+    responses = []
+
+    async def build():
+        response = await respond()
+        responses.append(response)
+        if response.status_code != 200:
+            return None
+        return response.data
+
+    data, hit = await acached(path, version, build)
+    response = responses[0] if responses else ORJSONResponse(data)
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+
+def csrf_exempt(view):
+    """Как у APIView.as_view: CSRF для сессий проверяет DRF, а
+    django.views.decorators.csrf.csrf_exempt в Django 4.1 делает
+    корутину синхронной вьюхой"""
+    view.csrf_exempt = True
+    return view
+
+
+
+def error_response(exc):
+    """Ответ на исключение DRF в том же виде, что у exception_handler"""
+    if isinstance(exc.detail, (dict, list)):
+        response = ORJSONResponse(exc.detail, status=exc.status_code)
+    else:
+        response = ORJSONResponse({'detail': exc.detail},
+                                  status=exc.status_code)
+    if getattr(exc, 'auth_header', None):
+        response['WWW-Authenticate'] = exc.auth_header
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+
+def check_request(request):
+    """Аутентификация и DEFAULT_THROTTLE_CLASSES, как в APIView.initial.
+
+    Вьюхи каталога используют настройки DRF по умолчанию, поэтому
+    проверка идёт через APIView с теми же классами и теми же ключами
+    счётчиков в кеше. Отказ - исключение DRF (401, 429).
+    """
+    view = APIView()
+    view.args, view.kwargs = (), {}
+    drf_request = view.initialize_request(request)
+    view.request = drf_request
+    try:
+        view.perform_authentication(drf_request)
+    except (NotAuthenticated, AuthenticationFailed) as exc:
+        exc.auth_header = view.get_authenticate_header(drf_request)
+        raise
+    view.check_throttles(drf_request)
+
+
+
+@csrf_exempt
+async def products(request, *args, **kwargs):
+    """3. Список товаров"""
+    if request.method not in READ_METHODS:
+        return await sync_to_async(product_list_view)(request, *args,
+                                                      **kwargs)
+    try:
+        await sync_to_async(check_request)(request)
+        return await acatalog_response(request,
+                                       lambda: product_page(request))
+    except APIException as exc:
+        return error_response(exc)
+
+
+
+async def product_page(request):
+    drf_request = Request(request)
+    queryset = product_queryset()
+    if parse_facets(drf_request.query_params):
+        # имена параметров переводятся в id синхронным запросом
+        queryset = await sync_to_async(
+            ParameterFacetFilter().filter_queryset
+            )(drf_request, queryset, None)
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(
+        ProductValuesSerializer.values(queryset),
+        drf_request
+        )
+    return ORJSONResponse({
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': ProductValuesSerializer(page).data,
+        })
+
+
+
+@csrf_exempt
+async def product_offers(request, *args, **kwargs):
+    """Сравнение предложений магазинов по товарам"""
+    if request.method not in READ_METHODS:
+        return await sync_to_async(product_offers_view)(request, *args,
+                                                        **kwargs)
+    try:
+        await sync_to_async(check_request)(request)
+        product_ids = parse_product_ids(Request(request).query_params)
+    except APIException as exc:
+        return error_response(exc)
+
+    async def respond():
+        return ORJSONResponse(
+            {'results': await acompare_offers(product_ids)}
+            )
+
+    return await acatalog_response(request, respond)
+
+
+
+@csrf_exempt
+async def product_card(request, pk, *args, **kwargs):
+    """4. Карточка товара"""
+    if request.method not in READ_METHODS:
+        return await sync_to_async(product_detail_view)(request, pk, *args,
+                                                        **kwargs)
+    try:
+        await sync_to_async(check_request)(request)
+    except APIException as exc:
+        return error_response(exc)
+    shop_id = request.GET.get('shop_id')
+    if shop_id is None:
+        return await acatalog_response(request, no_shop_response)
+    if not shop_id.isdigit():
+        return ORJSONResponse({'Status': False,
+                               'Errors': 'Неверный магазин'},
+                              status=400
+                              )
+
+    async def respond():
+        card = await aget_card(pk, shop_id)
+        if card is None:
+            return ORJSONResponse({'Status': False,
+                                   'Errors': 'Товар не найден'},
+                                  status=404
+                                  )
+        return ORJSONResponse({'left_module': card['left_module'],
+                               'rigth_module': card['rigth_module']
+                               })
+
+    return await acatalog_response(request, respond, shop_id=shop_id)
+
+
+
+async def no_shop_response():
+    return ORJSONResponse({'Status': False,
+                           'Errors': 'Отсутствует выбор магазина'}
+                          )
@@ -0,0 +1,129 @@
+from django.db.models import Count, Sum
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from service.models import Parameter, Product, ProductFacet, FacetCount
+
+
+FACET_QUERY_PARAM = 'param'
+
+
+
+def parse_facets(query_params):
+    """Разбирает ?param=Цвет:красный&param=Цвет:белый в {имя: {значения}}.
+
+    Значения одного параметра объединяются по ИЛИ, разные параметры -
+    по И.
+    """
+    facets = {}
+    for facet in query_params.getlist(FACET_QUERY_PARAM):
+        name, separator, value = facet.partition(':')
+        if not separator or not name:
+            raise ValidationError(
+                {FACET_QUERY_PARAM: f'Ожидается "параметр:значение": {facet}'}
+                )
+        facets.setdefault(name, set()).add(value)
+    return facets
+
+
+
+def parameter_ids(facets):
+    return dict(Parameter.objects.filter(
+        name__in=facets
+        ).values_list('name', 'id'))
+
+
+
+def matching_products(products, facets, ids, exclude=None):
+    """Товары, у которых есть все выбранные значения параметров.
+
+    Каждый параметр - отдельное полусоединение со списком товаров из
+    ProductFacet, который читается по уникальному индексу
+    (parameter, value, product). Наличие не проверяется: фильтр сужает
+    тот же список, что отдаётся без фильтра.
+    """
+    for name, values in facets.items():
+        if name == exclude:
+            continue
+        products = products.filter(id__in=ProductFacet.objects.filter(
+            parameter=ids.get(name),
+            value__in=values
+            ).values('product'))
+    return products
+
+
+
+def count_values(queryset, count, counts):
+    for name, value, number in queryset.values_list(
+            'parameter__name', 'value'
+            ).annotate(number=count).order_by():
+        counts.setdefault(name, {})[value] = number
+    return counts
+
+
+
+def facet_counts(facets):
+    """Число товаров в наличии для каждого значения каждого параметра.
+
+    Считаются только строки ProductFacet с in_stock. Без фильтра счётчики читаются из готовой таблицы FacetCount, с
+    фильтром считаются строки ProductFacet только найденных товаров.
+    Для выбранного параметра счётчики считаются без его собственного
+    условия, чтобы было видно, сколько товаров даст другое значение.
+    """
+    ids = parameter_ids(facets)
+    if any(name not in ids for name in facets):
+        return {}
+    if not facets:
+        return count_values(FacetCount.objects.all(), Sum('products'), {})
+    counts = count_values(
+        ProductFacet.objects.filter(
+            in_stock=True,
+            product__in=matching_products(Product.objects.all(), facets, ids)
+            ).exclude(parameter__in=ids.values()),
+        Count('product'),
+        {}
+        )
+    for name in facets:
+        if len(facets) == 1:
+            count_values(FacetCount.objects.filter(parameter=ids[name]),
+                         Sum('products'), counts)
+            continue
+        count_values(
+            ProductFacet.objects.filter(
+                parameter=ids[name],
+                in_stock=True,
+                product__in=matching_products(Product.objects.all(), facets,
+                                              ids, exclude=name)
+                ),
+            Count('product'),
+            counts
+            )
+    return counts
+
+
+
+"""Фильтр списка товаров по значениям параметров (?param=имя:значение).
+
+Как и список без фильтра, отдаёт товары и без предложений в наличии;
+счётчики facet_counts при этом показывают только товары в наличии.
+"""
+class ParameterFacetFilter(BaseFilterBackend):
+
+    def filter_queryset(self, request, queryset, view):
+        facets = parse_facets(request.query_params)
+        if not facets:
+            return queryset
+        ids = parameter_ids(facets)
+        if any(name not in ids for name in facets):
+            return queryset.none()
+        return matching_products(queryset, facets, ids)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': FACET_QUERY_PARAM,
+            'required': False,
+            'in': 'query',
+            'description': 'Значение параметра товара в виде имя:значение, '
+                           'можно указать несколько раз',
+            'schema': {'type': 'array', 'items': {'type': 'string'}},
+            'explode': True,
+            }]
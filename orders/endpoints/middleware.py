@@ -0,0 +1,15 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.deprecation import MiddlewareMixin
+
+
+ASGI_URLCONF = 'orders.asgi_urls'
+
+
+
+"""Запросы через ASGI разрешаются по orders.asgi_urls, где чтение
+каталога обслуживают асинхронные вьюхи; под WSGI всё остаётся как было."""
+class AsyncCatalogMiddleware(MiddlewareMixin):
+
+    def process_request(self, request):
+        if isinstance(request, ASGIRequest):
+            request.urlconf = ASGI_URLCONF
@@ -0,0 +1,73 @@
+from rest_framework.exceptions import ValidationError
+from service.models import ProductInfo
+
+
+OFFERS_QUERY_PARAM = 'product'
+MAX_OFFER_PRODUCTS = 100
+
+
+
+def parse_product_ids(query_params):
+    """Разбирает ?product=1,2&product=3 в список id без повторов"""
+    product_ids = []
+    for value in query_params.getlist(OFFERS_QUERY_PARAM):
+        for item in value.split(','):
+            item = item.strip()
+            if not item.isdigit():
+                raise ValidationError(
+                    {OFFERS_QUERY_PARAM: f'Неверный номер товара: {item}'}
+                    )
+            if int(item) not in product_ids:
+                product_ids.append(int(item))
+    if not product_ids:
+        raise ValidationError({OFFERS_QUERY_PARAM: 'Не указаны товары'})
+    if len(product_ids) > MAX_OFFER_PRODUCTS:
+        raise ValidationError(
+            {OFFERS_QUERY_PARAM:
+             f'Не больше {MAX_OFFER_PRODUCTS} товаров за запрос'}
+            )
+    return product_ids
+
+
+
+def compare_offers(product_ids):
+    """Предложения магазинов в наличии, от дешёвых к дорогим.
+
+    Один запрос по частичному индексу (product, price, shop) с
+    quantity и id в листьях: сами предложения читаются только из
+    индекса, к ним присоединяется небольшая таблица магазинов.
+    """
+    return group_offers(product_ids, offers_queryset(product_ids))
+
+
+
+async def acompare_offers(product_ids):
+    return group_offers(product_ids, [
+        offer async for offer in offers_queryset(product_ids)
+        ])
+
+
+
+def offers_queryset(product_ids):
+    return ProductInfo.objects.filter(
+        product__in=product_ids,
+        quantity__gt=0
+        ).order_by('product', 'price', 'shop').values_list(
+            'product', 'id', 'price', 'quantity',
+            'shop', 'shop__name', 'shop__distance'
+            )
+
+
+
+def group_offers(product_ids, offers):
+    results = {product_id: [] for product_id in product_ids}
+    for product_id, info_id, price, quantity, shop_id, shop_name, \
+            distance in offers:
+        results[product_id].append({'product_info': info_id,
+                                    'shop': shop_id,
+                                    'shop_name': shop_name,
+                                    'price': price,
+                                    'quantity': quantity,
+                                    'distance': distance})
+    return [{'product': product_id, 'offers': items}
+            for product_id, items in results.items()]
@@ -0,0 +1,158 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from django.db.models import F, Field, Func, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+
+"""Кортеж (a, b, ...) для сравнения строк целиком"""
+class Row(Func):
+    function = ''
+    template = '(%(expressions)s)'
+    output_field = Field()
+
+
+
+"""Постраничный вывод по ключу (keyset) вместо OFFSET.
+
+Курсор хранит значения полей ordering последней (или первой) строки
+страницы, следующая страница выбирается сравнением кортежей
+(category_id, name, id) > (...). Все поля ordering лежат в таблице
+продуктов, поэтому и сортировку, и это условие обслуживает индекс
+product_category_name_id_idx, а глубокие страницы читаются так же
+быстро, как первая. Размер страницы задаётся параметром page_size,
+но не больше max_page_size.
+"""
+class KeysetPagination(BasePagination):
+    ordering = ('category_id', 'name', 'id')
+    cursor_query_param = 'cursor'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.set_page([item async for item
+                              in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """Запрос страницы с одной лишней строкой - признаком продолжения"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.size = self.get_page_size(request)
+        self.cursor_position, self.reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(f'-{field}' for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor_position is not None:
+            queryset = self.after(queryset, self.cursor_position,
+                                  self.reverse)
+        return queryset[:self.size + 1]
+
+    def set_page(self, page):
+        position, reverse = self.cursor_position, self.reverse
+        has_more = len(page) > self.size
+        page = page[:self.size]
+        if reverse:
+            page.reverse()
+        self.page = page
+
+        # назад есть куда идти, если пришли по курсору вперёд, и наоборот
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def after(self, queryset, position, reverse):
+        """Строки строго после position в порядке ordering"""
+        lookup = 'lt' if reverse else 'gt'
+        return queryset.alias(
+            keyset=Row(*(F(field) for field in self.ordering))
+            ).filter(**{
+                f'keyset__{lookup}': Row(*(Value(value) for value in position))
+                })
+
+    def position(self, item):
+        """Значения ordering для объекта модели или строки values()"""
+        if isinstance(item, dict):
+            return [item[field] for field in self.ordering]
+        values = []
+        for field in self.ordering:
+            value = item
+            for attr in field.split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError,
+                BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, item, reverse):
+        cursor = {'p': self.position(item)}
+        if reverse:
+            cursor['r'] = 1
+        encoded = b64encode(
+            json.dumps(cursor, ensure_ascii=False).encode('utf-8')
+            ).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+            })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True,
+                         'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True,
+                             'format': 'uri'},
+                'results': schema,
+                },
+            }
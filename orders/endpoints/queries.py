@@ -0,0 +1,85 @@
+"""Планы запросов для эндпоинтов каталога и заказов.
+
+Каждая функция возвращает queryset, который заранее подтягивает
+через select_related/prefetch_related всё, что читают сериализаторы,
+поэтому число запросов не зависит от числа строк в ответе.
+"""
+from django.db.models import Prefetch
+from service.models import Product, ProductInfo, ProductParameter, Order, \
+    OrderItem, Category
+
+
+
+def parameters_prefetch(lookup='product_parameters'):
+    return Prefetch(
+        lookup,
+        queryset=ProductParameter.objects.select_related('parameter')
+        )
+
+
+
+def product_queryset():
+    """Товары для списка: категория в том же запросе"""
+    return Product.objects.select_related('category').order_by(
+        'category__name', 'name'
+        )
+
+
+
+def category_summary_queryset():
+    """Категории со сводкой из таблицы CategorySummary, без GROUP BY"""
+    return Category.objects.order_by('name', 'id')
+
+
+
+def product_info_queryset():
+    """Предложения магазинов с продуктом, магазином и параметрами"""
+    return ProductInfo.objects.select_related(
+        'product__category',
+        'shop'
+        ).prefetch_related(parameters_prefetch())
+
+
+
+def order_items_prefetch():
+    return Prefetch(
+        'ordered_items',
+        queryset=OrderItem.objects.select_related(
+            'product_info__product__category',
+            'product_info__shop',
+            'shop'
+            ).prefetch_related(
+                parameters_prefetch('product_info__product_parameters')
+                ).order_by('id')
+        )
+
+
+
+def order_list_queryset(user_id):
+    """Заказы пользователя без позиций; суммы хранятся в самом заказе"""
+    return Order.objects.filter(user=user_id).order_by('-dt')
+
+
+
+def order_header_queryset(user_id):
+    """Заказы пользователя с суммой, покупателем и его контактами"""
+    return order_list_queryset(user_id).select_related(
+        'user'
+        ).prefetch_related(
+            'user__contactadress',
+            'user__contactphone'
+            )
+
+
+
+def order_queryset(user_id):
+    """Заказы пользователя с позициями, покупателем и его контактами"""
+    return order_header_queryset(user_id).prefetch_related(
+        order_items_prefetch()
+        )
+
+
+
+def order_items_queryset(order_id):
+    """Позиции заказа для OrderItemValuesSerializer"""
+    return OrderItem.objects.filter(order=order_id).order_by('id')
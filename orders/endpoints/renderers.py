@@ -0,0 +1,49 @@
+"""Кодирование JSON через orjson для ответов и тел запросов DRF.
+
+orjson сам сериализует dict/list/str/int и их подклассы (ReturnDict,
+ErrorDetail), datetime и UUID; остальное (Decimal, ленивые строки
+переводов, QuerySet) передаётся стандартному кодировщику DRF.
+"""
+import orjson
+from django.http import HttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+
+
+class ORJSONRenderer(JSONRenderer):
+    options = orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = self.options
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            # orjson умеет только отступ в два пробела
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=JSONEncoder().default,
+                            option=options)
+
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+
+class ORJSONResponse(HttpResponse):
+    """JSON-ответ вне DRF; data остаются в ответе для кеша каталога"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(ORJSONRenderer().render(data), **kwargs)
+        self.data = data
@@ -0,0 +1,161 @@
+"""Поиск товаров по названию продукта и модели предложения.
+
+В PostgreSQL используется полнотекстовый поиск с русской
+конфигурацией по Product.name и триграммы pg_trgm по ProductInfo.model,
+которые прощают опечатки в строках вида apple/iphone/xr. На других базах
+(SQLite в тестах) поиск идёт по инвертированному индексу в памяти
+с той же логикой ранжирования.
+"""
+import math
+import re
+from collections import defaultdict
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector, TrigramSimilarity
+from django.db import connection, connections
+from django.db.models import Max
+from service.models import Product, ProductInfo
+
+
+SEARCH_CONFIG = 'russian'
+# порог похожести триграмм, как pg_trgm.similarity_threshold по умолчанию
+TRIGRAM_THRESHOLD = 0.3
+MODEL_WEIGHT = 0.5
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+TOKEN_RE = re.compile(r'\w+')
+
+SEARCH_INDEXES = (
+    (Product, GinIndex(
+        SearchVector('name', config=SEARCH_CONFIG),
+        name='product_name_search_idx'
+        )),
+    (ProductInfo, GinIndex(
+        OpClass('model', name='gin_trgm_ops'),
+        name='product_info_model_trgm_idx'
+        )),
+    )
+
+
+
+def create_search_indexes(sender=None, using='default', **kwargs):
+    """Создаёт расширение pg_trgm и GIN-индексы поиска после migrate.
+
+    Индексы есть только в PostgreSQL, поэтому их нет в Meta моделей.
+    """
+    database = connections[using]
+    if database.vendor != 'postgresql':
+        return
+    with database.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for model, index in SEARCH_INDEXES:
+            existing = database.introspection.get_constraints(
+                cursor, model._meta.db_table
+                )
+            if index.name not in existing:
+                with database.schema_editor() as schema_editor:
+                    schema_editor.add_index(model, index)
+
+
+
+def tokens(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+
+def trigrams(word):
+    """Триграммы слова так же, как их режет pg_trgm"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+
+def similarity(first, second):
+    first, second = trigrams(first), trigrams(second)
+    return len(first & second) / len(first | second)
+
+
+
+"""Инвертированный индекс: слово -> {id продукта: вес}"""
+class InvertedIndex:
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = set()
+
+    def add(self, product_id, text, weight=1.0):
+        self.documents.add(product_id)
+        for token in tokens(text):
+            postings = self.postings[token]
+            postings[product_id] = max(postings.get(product_id, 0), weight)
+
+    def matches(self, token):
+        """Слова индекса, подходящие к слову запроса, с коэффициентом"""
+        if token in self.postings:
+            yield token, 1.0
+        for word in self.postings:
+            if word == token:
+                continue
+            if word.startswith(token):
+                # грубая замена стемминга: "смартфон" находит "смартфоны"
+                yield word, 0.8
+            else:
+                score = similarity(token, word)
+                if score >= TRIGRAM_THRESHOLD:
+                    yield word, score
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        scores = defaultdict(float)
+        total = len(self.documents) or 1
+        for token in tokens(query):
+            for word, score in self.matches(token):
+                postings = self.postings[word]
+                idf = math.log(1 + total / len(postings))
+                for product_id, weight in postings.items():
+                    scores[product_id] += score * weight * idf
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+
+def build_index():
+    index = InvertedIndex()
+    for product_id, name in Product.objects.values_list('id', 'name'):
+        index.add(product_id, name)
+    for product_id, model in ProductInfo.objects.values_list(
+            'product_id', 'model'
+            ):
+        index.add(product_id, model, MODEL_WEIGHT)
+    return index
+
+
+
+def postgres_search(query, limit):
+    search_query = SearchQuery(query, config=SEARCH_CONFIG,
+                               search_type='websearch')
+    vector = SearchVector('name', config=SEARCH_CONFIG)
+    scores = defaultdict(float)
+    for product_id, rank in Product.objects.annotate(
+            search=vector
+            ).filter(search=search_query).annotate(
+                rank=SearchRank(vector, search_query)
+                ).order_by('-rank').values_list('id', 'rank')[:limit]:
+        scores[product_id] += rank
+    for product_id, score in ProductInfo.objects.filter(
+            model__trigram_similar=query
+            ).values('product_id').annotate(
+                score=Max(TrigramSimilarity('model', query))
+                ).order_by('-score').values_list(
+                    'product_id', 'score'
+                    )[:limit]:
+        scores[product_id] += score * MODEL_WEIGHT
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+
+def search_products(query, limit=SEARCH_LIMIT):
+    """Список пар (id продукта, ранг) по убыванию ранга"""
+    if connection.vendor == 'postgresql':
+        return postgres_search(query, limit)
+    return build_index().search(query, limit)
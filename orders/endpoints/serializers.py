@@ -1,4 +1,4 @@
-from rest_framework.fields import IntegerField, DecimalField
+from rest_framework.fields import DateTimeField, DecimalField
 from rest_framework.relations import StringRelatedField
 from rest_framework.serializers import ModelSerializer
 from service.models import User, UsersContactAdress, \
@@ -39,8 +39,16 @@ class UsrPhoneSerializer(ModelSerializer):
 
 
 class UserSerializer(ModelSerializer):
-    adress_cont = UsrAdressSerializer(read_only=True, many=True)
-    phone_cont = UsrPhoneSerializer(read_only=True, many=True)
+    adress_cont = UsrAdressSerializer(
+        source='contactadress',
+        read_only=True,
+        many=True
+        )
+    phone_cont = UsrPhoneSerializer(
+        source='contactphone',
+        read_only=True,
+        many=True
+        )
 
     class Meta:
         model = User
@@ -111,8 +119,8 @@ class OrderItemSerializer(ModelSerializer):
 
     class Meta:
         model = OrderItem
-        fields = ('id', 'product_info', 'quantity', 'order', 'shop')
-        read_only_fields = ('id',)
+        fields = ('id', 'product_info', 'quantity', 'order', 'shop', 'price')
+        read_only_fields = ('id', 'price')
         extra_kwargs = {
             'order': {'write_only': True}
         }
@@ -126,13 +134,7 @@ class OrderItemCreateSerializer(OrderItemSerializer):
 
 class OrderSerializer(ModelSerializer):
     user = UserSerializer(read_only=True)
-    adress_cont = UsrAdressSerializer(read_only=True)
-    phone_cont = UsrPhoneSerializer(read_only=True)
     ordered_items = OrderItemCreateSerializer(read_only=True, many=True)
-    cost_delivery = DecimalField(decimal_places=3, max_digits=2)
-    total_price = IntegerField()
-    order_price = DecimalField(decimal_places=3, max_digits=2)
-    final_price = DecimalField(decimal_places=3, max_digits=2)
 
     class Meta:
         model = Order
@@ -142,10 +144,186 @@ class OrderSerializer(ModelSerializer):
                   'status',
                   'ordered_items',
                   'total_price',
-                  'cost_delivery',
-                  'order_price',
+                  'delivery_price',
                   'final_price',
-                  'adress_cont',
-                  'phone_cont'
                   )
-        read_only_fields = ('id',)
\ No newline at end of file
+        read_only_fields = ('id',
+                            'total_price',
+                            'delivery_price',
+                            'final_price',
+                            )
+
+
+
+class OrderListSerializer(ModelSerializer):
+
+    class Meta:
+        model = Order
+        fields = ('id',
+                  'dt',
+                  'status',
+                  'total_price',
+                  'delivery_price',
+                  'final_price',
+                  )
+        read_only_fields = ('id',
+                            'total_price',
+                            'delivery_price',
+                            'final_price',
+                            )
+
+
+
+
+"""Сериализаторы только для чтения для длинных списков.
+
+Строят словари прямо из строк queryset.values(), минуя поля DRF, и
+отдают тот же формат, что и соответствующий ModelSerializer. Строки
+выбираются через values(queryset), чтобы набор колонок задавал сам
+сериализатор, а формат строки - метод to_representation(row)
+подкласса. Запись по-прежнему идёт через ModelSerializer.
+"""
+class ValuesSerializer:
+    fields = ()
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values(*cls.fields)
+
+    @property
+    def data(self):
+        return [self.to_representation(row) for row in self.rows]
+
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    """Формат ProductSerializer"""
+    fields = ('id', 'name', 'category_id', 'category__name')
+
+    def to_representation(self, row):
+        return {'id': row['id'],
+                'name': row['name'],
+                'category': row['category__name']}
+
+
+
+class OrderListValuesSerializer(ValuesSerializer):
+    """Формат OrderListSerializer"""
+    fields = ('id', 'dt', 'status', 'total_price', 'delivery_price',
+              'final_price')
+    dt = DateTimeField()
+    money = DecimalField(max_digits=12, decimal_places=2)
+
+    def to_representation(self, row):
+        return {'id': row['id'],
+                'dt': self.dt.to_representation(row['dt']),
+                'status': row['status'],
+                'total_price': row['total_price'],
+                'delivery_price': self.money.to_representation(
+                    row['delivery_price']
+                    ),
+                'final_price': self.money.to_representation(
+                    row['final_price']
+                    )}
+
+
+
+class OrderItemValuesSerializer(ValuesSerializer):
+    """Формат OrderItemCreateSerializer: позиция с предложением,
+    продуктом, магазином и параметрами. Параметры всех позиций читаются
+    одним дополнительным запросом."""
+    fields = ('id',
+              'quantity',
+              'shop',
+              'price',
+              'product_info',
+              'product_info__external_id',
+              'product_info__model',
+              'product_info__quantity',
+              'product_info__price',
+              'product_info__price_rrc',
+              'product_info__product',
+              'product_info__product__name',
+              'product_info__product__category__name',
+              'product_info__shop',
+              'product_info__shop__name',
+              'product_info__shop__distance',
+              'product_info__shop__url',
+              'product_info__shop__filename',
+              'product_info__shop__user',
+              )
+
+    @property
+    def data(self):
+        self.rows = list(self.rows)
+        self.parameters = {}
+        for product_info, parameter, value in \
+                ProductParameter.objects.filter(
+                    product_info__in={row['product_info']
+                                      for row in self.rows}
+                    ).order_by('id').values_list('product_info',
+                                                 'parameter__name',
+                                                 'value'):
+            self.parameters.setdefault(product_info, []).append(
+                {'product_info': product_info,
+                 'parameter': parameter,
+                 'value': value}
+                )
+        return super().data
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'product_info': {
+                'external_id': row['product_info__external_id'],
+                'model': row['product_info__model'],
+                'product': {
+                    'id': row['product_info__product'],
+                    'name': row['product_info__product__name'],
+                    'category': row['product_info__product__category__name'],
+                    },
+                'shop': {
+                    'id': row['product_info__shop'],
+                    'name': row['product_info__shop__name'],
+                    'distance': row['product_info__shop__distance'],
+                    'url': row['product_info__shop__url'],
+                    'filename': row['product_info__shop__filename'],
+                    'user': row['product_info__shop__user'],
+                    },
+                'quantity': row['product_info__quantity'],
+                'price': row['product_info__price'],
+                'price_rrc': row['product_info__price_rrc'],
+                'product_parameters': self.parameters.get(
+                    row['product_info'], []
+                    ),
+                },
+            'quantity': row['quantity'],
+            'shop': row['shop'],
+            'price': row['price'],
+            }
+
+
+
+class CategorySummarySerializer(ValuesSerializer):
+    """Категория со сводкой, которую пересчитывает импорт. У категорий,
+    по которым импорта ещё не было, счётчики нулевые."""
+    fields = ('id',
+              'name',
+              'summary__products',
+              'summary__offers',
+              'summary__shops',
+              'summary__min_price',
+              'summary__max_price',
+              )
+
+    def to_representation(self, row):
+        return {'id': row['id'],
+                'name': row['name'],
+                'products': row['summary__products'] or 0,
+                'offers': row['summary__offers'] or 0,
+                'shops': row['summary__shops'] or 0,
+                'min_price': row['summary__min_price'],
+                'max_price': row['summary__max_price']}
@@ -1,19 +1,39 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from django.db.models import Sum, F
 from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework.authtoken.models import Token
-from rest_framework.generics import ListAPIView, RetrieveUpdateAPIView, get_object_or_404
-import json
+from rest_framework.decorators import action
+from rest_framework.generics import ListAPIView, RetrieveUpdateAPIView
+import orjson
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from endpoints.filters import ParameterFacetFilter, parse_facets, \
+    facet_counts
+from endpoints.offers import parse_product_ids, compare_offers
+from endpoints.pagination import KeysetPagination
+from endpoints.renderers import ORJSONResponse
+from endpoints.queries import product_queryset, order_queryset, \
+    order_list_queryset, order_header_queryset, order_items_queryset, \
+    category_summary_queryset
+from endpoints.search import search_products, SEARCH_LIMIT, \
+    MAX_SEARCH_LIMIT
 from endpoints.serializers import UserSerializer, ProductSerializer, \
-    ProductInfoSerializer, OrderSerializer, UsrAdressSerializer
-from service.models import Product, ProductInfo, Order, \
-    UsersContactPhone, UsersContactAdress, User
+    OrderSerializer, OrderListSerializer, UsrAdressSerializer, \
+    ProductValuesSerializer, OrderListValuesSerializer, \
+    OrderItemValuesSerializer, CategorySummarySerializer
+from service.cards import get_card, refresh_cards
+from service.basket import BasketError, add_items, update_items, \
+    delete_items
+from service.pricing import price_basket
+from service.catalog_cache import cached, catalog_state, catalog_digest, \
+    bump_catalog_version
+from service.models import UsersContactPhone, UsersContactAdress, User, \
+    Shop, ProductInfo
 from celery import shared_task
 
 
@@ -94,110 +114,264 @@ class RegisterAccount(APIView):
 
 
 
+def catalog_response(request, respond, wrap=Response, shop_id=None):
+    """Ответ эндпоинта каталога из кеша, версионированного по импортам.
+
+    ETag строится из версии каталога, Last-Modified - из времени его
+    последнего изменения (импорт или правка), поэтому на
+    If-None-Match/If-Modified-Since ответ 304 отдаётся без основного запроса и сериализатора.
+    respond() строит ответ при промахе, в кеш попадают только ответы
+    со статусом 200. wrap() собирает ответ из данных при попадании.
+    """
+    path = request.get_full_path()
+    version, modified = catalog_state(shop_id)
+    validators, response = conditional_response(request, path, version,
+                                                modified)
+    if response is None:
+        response = cached_response(path, version, respond, wrap)
+    return set_validators(response, *validators)
+
+
+
+def conditional_response(request, path, version, modified):
+    """Валидаторы ответа и ответ 304, если клиент их уже знает"""
+    etag = quote_etag(catalog_digest(path, version))
+    last_modified = int(modified.timestamp()) if modified else None
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    return (etag, last_modified), response
+
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+
+def cached_response(path, version, respond, wrap):
+    responses = []
+
+    def build():
+        response = respond()
+        responses.append(response)
+        if response.status_code != 200:
+            return None
+        return response.data
+
+    data, hit = cached(path, version, build)
+    response = responses[0] if responses else wrap(data)
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+
 """3. Список товаров"""
 class ProductViewSet(ModelViewSet):
-    queryset = Product.objects.order_by('category__name', 'name')
+    queryset = product_queryset()
     serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, ParameterFacetFilter]
+
+    def list(self, request, *args, **kwargs):
+        return catalog_response(request, lambda: self.list_response(request))
+
+    def list_response(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(ProductValuesSerializer.values(queryset))
+        return self.get_paginated_response(ProductValuesSerializer(page).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return catalog_response(
+            request,
+            lambda: super(ProductViewSet, self).retrieve(request, *args,
+                                                         **kwargs)
+            )
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        bump_catalog_version(Shop.objects.all())
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # в карточках предложений товара его название и категория
+        refresh_cards(ProductInfo.objects.filter(
+            product=serializer.instance
+            ).values_list('id', flat=True))
+        bump_catalog_version(Shop.objects.all())
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        bump_catalog_version(Shop.objects.all())
+
+    @action(detail=False)
+    def facets(self, request, *args, **kwargs):
+        """Счётчики товаров по значениям параметров для текущего фильтра"""
+        return catalog_response(request, lambda: Response(
+            facet_counts(parse_facets(request.query_params))
+            ))
+
+    @action(detail=False)
+    def offers(self, request, *args, **kwargs):
+        """Предложения магазинов по товарам ?product=1,2,3, от дешёвых"""
+        product_ids = parse_product_ids(request.query_params)
+        return catalog_response(request, lambda: Response(
+            {'results': compare_offers(product_ids)}
+            ))
+
+    @action(detail=False)
+    def search(self, request, *args, **kwargs):
+        """Поиск по названию и модели, лучшие совпадения первыми"""
+        return catalog_response(request, lambda: self.search_response(request))
+
+    def search_response(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return JsonResponse({'Status': False,
+                                 'Errors': 'Не указан поисковый запрос'},
+                                status=400
+                                )
+        try:
+            limit = min(int(request.query_params.get('limit', SEARCH_LIMIT)),
+                        MAX_SEARCH_LIMIT)
+        except ValueError:
+            limit = SEARCH_LIMIT
+        ranked = search_products(query, max(limit, 1))
+        products = product_queryset().in_bulk([pk for pk, _ in ranked])
+        results = []
+        for product_id, rank in ranked:
+            item = ProductSerializer(products[product_id]).data
+            item['rank'] = round(rank, 4)
+            results.append(item)
+        return Response({'results': results})
 
 
 
 """4. Карточка товара"""
 class ProductDetailView(APIView):
 
-    def get(self, request, *args, **kwargs):
-        if {'shop_id'}.issubset(request.query_params):
-            product = get_object_or_404(Product.objects.all(), pk=args).select_related('category__name')
-            ser_product = ProductSerializer(product)
-            left_module = json.dumps({'Наименование: ': ser_product.data['name'],
-                                     'Описание: ': ser_product.data['category__name']})
-
-            needed_product = ProductInfo.objects.all().filter(product=product.id,
-                                                              shop=request.query_params.get('shop_id'),
-                                                                 ).select_related('shop__name').first()
-            ser_needed_product = ProductInfoSerializer(needed_product)
-            rigth_module = json.dumps({'Поставщик: ': ser_needed_product.data['shop__name'],
-                                       'Характеристики: ': ser_needed_product.data['product_parameters'],
-                                       'Цена: ': ser_needed_product.data['price'],
-                                       'Количество: ': ser_needed_product.data['quantity'],
-                                       'В корзину': '',
-                                       })
-        else:
+    def get(self, request, pk, *args, **kwargs):
+        shop_id = request.query_params.get('shop_id')
+        if shop_id is not None and not shop_id.isdigit():
             return JsonResponse({'Status': False,
-                                 'Errors': 'Отсутствует выбор магазина'}
+                                 'Errors': 'Неверный магазин'},
+                                status=400
                                 )
+        return catalog_response(request,
+                                lambda: self.card(request, pk),
+                                wrap=ORJSONResponse,
+                                shop_id=shop_id)
+
+    def card(self, request, pk):
+        if {'shop_id'}.issubset(request.query_params):
+            # готовая карточка, которую пересобирает импорт
+            card = get_card(pk, request.query_params.get('shop_id'))
+            if card is None:
+                return ORJSONResponse({'Status': False,
+                                       'Errors': 'Товар не найден'},
+                                      status=404
+                                      )
+        else:
+            return ORJSONResponse({'Status': False,
+                                   'Errors': 'Отсутствует выбор магазина'}
+                                  )
+
+        return ORJSONResponse({'left_module': card['left_module'],
+                               'rigth_module': card['rigth_module']
+                               })
 
-        return JsonResponse({'left_module': left_module,
-                             'rigth_module': rigth_module
-                             })
+
+
+"""Категории со сводкой: товары и предложения в наличии, цены"""
+class CategoryView(APIView):
+
+    def get(self, request, *args, **kwargs):
+        return catalog_response(request, lambda: Response({
+            'results': CategorySummarySerializer(
+                CategorySummarySerializer.values(category_summary_queryset())
+                ).data
+            }))
 
 
 
 """5. Корзина"""
 class BasketView(APIView):
 
-    def delivery(self, request, *args, **kwargs):
-        base_delivery = 500
-        discount = User.objects.flilter(user=request.user.id).get('discount_factor')
-        quantity = Order.objects.filter(
-            user=request.user.id,
-            status='basket').get('ordered_items__quantity')
-        distan = Order.objects.filter(
-            user=request.user.id,
-            status='basket').get('ordered_items__shop__distance')
-        if distan <= 50:
-            cost_delivery = base_delivery/100*discount
-        elif (distan > 50) and (distan <= 300):
-            cost_delivery = distan/11*discount
-        else:
-            cost_delivery = distan/10.5*discount
-        cost_delivery = cost_delivery*quantity*0.4
-        return cost_delivery
-
     def get(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return JsonResponse(
                 {'Status': False, 'Error': 'Log in required'},
                 status=403
                 )
-        basket = (Order.objects.filter(
-            user=request.user.id,
-            status='basket'
-            ).select_related(
-                'ordered_items__product_info__product__name',
-                'ordered_items__shop',
-                'ordered_items__shop__product_infos__price'
-                'ordered_items__quantity'
-                ).annotate(
-                    total_price=Sum(F(
-                        'ordered_items__quantity') * F('ordered_items__shop__product_infos__price')
-                                    ))).exclude('id',
-                                                'user',
-                                                'dt',
-                                                'status',
-                                                'cost_delivery',
-                                                'order_price',
-                                                'final_price',
-                                                'adress_cont',
-                                                'phone_cont'
-                                                ).distinct()
+        basket = list(order_queryset(request.user.id).filter(status='basket'))
         posit_list = OrderSerializer(basket, many=True)
 
-        total_list = basket.objects.annotate(
-            order_price=Sum('total_price'),
-            cost_delivery=self.delivery(request.user.id),
-            final_price='cost_delivery'+'final_price'
-            )
-
-        ser_total_list = OrderSerializer(total_list)
-        total = json.dumps({
-            'Сумма: ': ser_total_list.data['order_price'],
-            'Стоимость доставки: ': ser_total_list.data['cost_delivery'],
-            'Итог: ': ser_total_list.data['final_price']
-            })
+        pricing = price_basket(request.user)
+        shops = [{'Магазин: ': shop['name'],
+                  'Количество: ': shop['quantity'],
+                  'Сумма: ': shop['subtotal'],
+                  'Стоимость доставки: ': shop['delivery']}
+                 for shop in pricing['shops']]
+        total = {
+            'Сумма: ': pricing['subtotal'],
+            'Стоимость доставки: ': pricing['delivery'],
+            'Итог: ': pricing['total']
+            }
 
         return JsonResponse({'Список товаров: ': posit_list.data,
+                             'По магазинам: ': shops,
                              'Итог: ': total})
 
+    def change(self, request, apply, labels):
+        """Пакетное изменение корзины: items - список строк или
+        та же строка в JSON"""
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Log in required'},
+                status=403
+                )
+        items = request.data.get('items')
+        if not items:
+            return JsonResponse({'Status': False,
+                                 'Errors': 'Не указаны все необходимые аргументы'},
+                                status=400
+                                )
+        if isinstance(items, str) and items.lstrip().startswith('['):
+            try:
+                items = orjson.loads(items)
+            except orjson.JSONDecodeError:
+                items = None
+        try:
+            result = apply(request.user, items)
+        except BasketError as error:
+            return JsonResponse({'Status': False, 'Errors': str(error)},
+                                status=400
+                                )
+        response = {'Status': True}
+        for key, label in labels.items():
+            response[label] = result[key]
+        response['Errors'] = result['errors']
+        return JsonResponse(response)
+
+    # добавить позиции в корзину
+    def post(self, request, *args, **kwargs):
+        return self.change(request, add_items,
+                           {'created': 'Создано объектов',
+                            'updated': 'Обновлено объектов'})
+
+    # изменить количество
+    def put(self, request, *args, **kwargs):
+        return self.change(request, update_items,
+                           {'updated': 'Обновлено объектов'})
+
+    # удалить позиции из корзины
+    def delete(self, request, *args, **kwargs):
+        return self.change(request, delete_items,
+                           {'deleted': 'Удалено объектов'})
+
 
 
 """6. Подтверждение заказа."""
@@ -253,58 +427,40 @@ class AcceptOrder(APIView):
 class GreetingOrder(APIView):
 
     def get(self, request, *args, **kwargs):
-
-        # list_goods = Order.objects.filter(id=request.data['id'])
-        # serializer_goods = OrderSerializer(list_goods, many=True)
-        # adress = UsersContactAdress.objects.filter(user=request.user.id)
-        # serializer_adress = UserSerializer(adress)
-        # person = User.objects.filter(id=request.user.id)
-
         if not request.user.is_authenticated:
             return JsonResponse(
                 {'Status': False, 'Error': 'Log in required'},
                 status=403
                 )
 
-        order_positions = Order.objects.filter(
-            user=request.user.id,
+        order_client = order_header_queryset(request.user.id).filter(
             status='confirmed'
-            ).select_related(
-                'ordered_items__product_info__product__name',
-                'ordered_items__shop',
-                'ordered_items__shop__product_infos__price'
-                'ordered_items__quantity'
-        ).exclude('id',
-                  'user',
-                  'dt',
-                  'status',
-                  'total_price',
-                  'cost_delivery',
-                  'order_price',
-                  'final_price',
-                  'adress_cont',
-                  'phone_cont').annotate(summ=Sum(F(
-            'ordered_items__quantity') * F('ordered_items__shop__product_infos__price'))).distinct()
-
-        order_client = Order.objects.filter(
-            user=request.user.id,
-            status='confirmed'
-        ).select_related(
-            'user__email',
-            'user__contactphone',
-            'user__contactadress')
-        ser_info = OrderSerializer(order_client)
-        ser_pos = OrderSerializer(order_positions, many=True)
-        upper_module = json.dumps({
+            ).first()
+        if order_client is None:
+            return JsonResponse({'Status': False,
+                                 'Errors': 'Нет подтверждённых заказов'},
+                                status=404
+                                )
+        ser_info = OrderListSerializer(order_client)
+        ser_user = UserSerializer(order_client.user)
+        ordered_items = OrderItemValuesSerializer(
+            OrderItemValuesSerializer.values(
+                order_items_queryset(order_client.id)
+                )
+            )
+        upper_module = {
             'Номер вашего заказа: ': ser_info.data['id'],
             'Наш оператор свяжется с Вами в ближайшее время для уточнения делатей заказа ': '',
             'Статус заказов вы можете посмотреть в разделе "Заказы" ': ''
-            })
-        main_module = json.dumps({
-            'Детали заказа: ': ser_pos.data,
-            'Детали получателя: ': ser_info.data['user', 'user__email', 'user__contactphone'],
-            'Адрес: ': ser_info.data['user__contactadress']
-            })
+            }
+        main_module = {
+            'Детали заказа: ': ordered_items.data,
+            'Детали получателя: ': {
+                'email': ser_user.data['email'],
+                'phone': ser_user.data['phone_cont'],
+                },
+            'Адрес: ': ser_user.data['adress_cont']
+            }
         return JsonResponse({'Верхний блок': upper_module,
                              'Основной блок': main_module})
 
@@ -319,21 +475,10 @@ class ListOrderView(APIView):
                 'Status': False, 'Error': 'Log in required'},
                 status=403,
                 )
-        orders = (Order.objects.filter(user=request.user.id).annotate(
-            order_price=Sum(F(
-                'ordered_items__quantity') * F('ordered_items__shop__product_infos__price')
-                            )).distinct()).\
-            exclude('user',
-                    'ordered_items',
-                    'summ',
-                    'total_summ',
-                    'cost_delivery',
-                    'final_price',
-                    'total',
-                    'adress_cont',
-                    'phone_cont'
-                    )
-        ser_orders = OrderSerializer(orders , many=True)
+        orders = order_list_queryset(request.user.id).exclude(status='basket')
+        ser_orders = OrderListValuesSerializer(
+            OrderListValuesSerializer.values(orders)
+            )
         return JsonResponse({
             'История заказов': ser_orders.data,
         })
@@ -349,57 +494,44 @@ class OrderView(APIView):
                 'Status': False, 'Error': 'Log in required'},
                 status=403,
                 )
+        if not {'id'}.issubset(request.query_params):
+            return JsonResponse({'Status': False,
+                                 'Errors': 'Не указан номер заказа'},
+                                status=400
+                                )
 
-        order_client = Order.objects.filter(
-            id=args,
-            user=request.user.id,
-            status='delivered'
-            ).select_related(
-                'user__email',
-                'user__contactphone',
-                'user__contactadress')
-
-        order_positions = Order.objects.filter(
-            id=args,
-            user=request.user.id,
+        order_client = order_header_queryset(request.user.id).filter(
+            id=request.query_params['id'],
             status='delivered'
-        ).select_related(
-            'ordered_items__product_info__product__name',
-            'ordered_items__shop',
-            'ordered_items__shop__product_infos__price'
-            'ordered_items__quantity'
-        ).exclude('id',
-                  'user',
-                  'dt',
-                  'status',
-                  'total_price',
-                  'cost_delivery',
-                  'order_price',
-                  'final_price',
-                  'adress_cont',
-                  'phone_cont'
-                  ).annotate(summ=Sum(F(
-            'ordered_items__quantity') * F('ordered_items__shop__product_infos__price'))).distinct()
-
-        ser_info = OrderSerializer(order_client)
-        ser_pos = OrderSerializer(order_positions, many=True)
-        upper_module = json.dumps({
-            'Номер: ': ser_info.data('id'),
-            'Дата: ': ser_info.data('dt'),
-            'Статус: Доставлен ': ser_info.data('dt')
-            })
-        main_module = json.dumps({
-            'Детали заказа: ': ser_pos.data,
-            'Детали получателя: ': ser_info.data['user',
-                                                 'user__email',
-                                                 'user__contactphone'
-                                                ],
-            'Адрес: ': ser_info.data['user__contactadress']
-             })
+            ).first()
+        if order_client is None:
+            return JsonResponse({'Status': False,
+                                 'Errors': 'Заказ не найден'},
+                                status=404
+                                )
+
+        ser_info = OrderListSerializer(order_client)
+        ser_user = UserSerializer(order_client.user)
+        ordered_items = OrderItemValuesSerializer(
+            OrderItemValuesSerializer.values(
+                order_items_queryset(order_client.id)
+                )
+            )
+        upper_module = {
+            'Номер: ': ser_info.data['id'],
+            'Дата: ': ser_info.data['dt'],
+            'Статус: Доставлен ': ser_info.data['dt']
+            }
+        main_module = {
+            'Детали заказа: ': ordered_items.data,
+            'Детали получателя: ': {
+                'email': ser_user.data['email'],
+                'phone': ser_user.data['phone_cont'],
+                },
+            'Адрес: ': ser_user.data['adress_cont']
+             }
 
         return JsonResponse({
             'Верхний блок': upper_module,
             'Основной блок': main_module
             })
-
-
@@ -3,7 +3,8 @@ from django.contrib.auth.admin import UserAdmin
 
 from service.models import User, Shop, Category, Product, \
     ProductInfo, ProductParameter, Parameter, Order, \
-    OrderItem, UsersContactPhone, UsersContactAdress, ConfirmEmailToken
+    OrderItem, UsersContactPhone, UsersContactAdress, ConfirmEmailToken, \
+    ImportHistory, ImportJob, ExportArtifact
 
 
 @admin.register(User)
@@ -36,6 +37,24 @@ class ShopAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(ImportHistory)
+class ImportHistoryAdmin(admin.ModelAdmin):
+    list_display = ('shop', 'dt', 'status', 'rows', 'duration',)
+    list_filter = ('status',)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('url', 'user', 'dt', 'state', 'progress', 'rows',)
+    list_filter = ('state',)
+
+
+@admin.register(ExportArtifact)
+class ExportArtifactAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'shop', 'user', 'dt', 'state', 'size', 'rows',)
+    list_filter = ('kind', 'state',)
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     pass
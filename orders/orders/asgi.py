@@ -0,0 +1,19 @@
+"""
+ASGI config for orders project.
+
+It exposes the ASGI callable as
+a module-level variable named ``application``.
+Reads of the catalog are served by async views from
+``orders.asgi_urls``, see ``endpoints.middleware``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'orders.settings')
+
+application = get_asgi_application()
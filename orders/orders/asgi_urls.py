@@ -0,0 +1,27 @@
+"""URL-ы для запросов, пришедших через ASGI.
+
+Чтение каталога обслуживают асинхронные вьюхи по тем же адресам,
+остальные маршруты берутся из orders.urls.
+"""
+
+
+from django.urls import path
+from endpoints.async_views import products, product_offers, product_card
+from orders.urls import urlpatterns as sync_urlpatterns
+
+
+app_name = 'orders'
+urlpatterns = [
+    path('products/',
+         products,
+         name='all_products_3-list'
+         ),
+    path('products/offers/',
+         product_offers,
+         name='all_products_3-offers'
+         ),
+    path('user/products/<int:pk>',
+         product_card,
+         name='product_info_4'
+         ),
+    ] + sync_urlpatterns
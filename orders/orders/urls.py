@@ -22,8 +22,10 @@ from rest_framework.routers import DefaultRouter
 import endpoints.views
 from endpoints.views import LoginAccount, RegisterAccount, \
     ProductDetailView, BasketView, AcceptOrder, \
-    GreetingOrder, ListOrderView, OrderView
-from service.views import PartnerUpdate
+    GreetingOrder, ListOrderView, OrderView, CategoryView
+from service.views import PartnerUpdate, PartnerUpdateStatus, \
+    PartnerExport, PartnerExportJob, PartnerExportStatus, \
+    PartnerExportDownload, CatalogCacheStats
 
 
 router = DefaultRouter()
@@ -50,6 +52,10 @@ urlpatterns = [
          ProductDetailView.as_view(),
          name='product_info_4'
          ),
+    path('categories',
+         CategoryView.as_view(),
+         name='categories'
+         ),
     path('user/basket',
          BasketView.as_view(),
          name='basket_5'
@@ -74,6 +80,30 @@ urlpatterns = [
          PartnerUpdate.as_view(),
          name='update_catalog'
          ),
+    path('update_catalog/<int:pk>',
+         PartnerUpdateStatus.as_view(),
+         name='update_catalog_status'
+         ),
+    path('export_catalog',
+         PartnerExport.as_view(),
+         name='export_catalog'
+         ),
+    path('export',
+         PartnerExportJob.as_view(),
+         name='export'
+         ),
+    path('export/<int:pk>',
+         PartnerExportStatus.as_view(),
+         name='export_status'
+         ),
+    path('export/<int:pk>/download',
+         PartnerExportDownload.as_view(),
+         name='export_download'
+         ),
+    path('catalog_cache',
+         CatalogCacheStats.as_view(),
+         name='catalog_cache'
+         ),
     path('api/schema/',
          SpectacularAPIView.as_view(),
          name='schema'),
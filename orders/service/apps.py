@@ -1,4 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 class BackendConfig(AppConfig):
-    name = 'service'
\ No newline at end of file
+    name = 'service'
+
+    def ready(self):
+        from service.models import Order, OrderItem
+        from service.order_totals import item_changed, order_saved
+        post_save.connect(item_changed, sender=OrderItem)
+        post_delete.connect(item_changed, sender=OrderItem)
+        post_save.connect(order_saved, sender=Order)
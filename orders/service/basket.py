@@ -0,0 +1,163 @@
+"""Пакетное изменение корзины.
+
+Все строки запроса проверяются сразу, связанные предложения и позиции
+читаются одним запросом, изменения пишутся через bulk_create,
+bulk_update и одно удаление в общей транзакции, суммы корзины
+пересчитываются один раз. Ошибочные строки возвращаются списком
+{'line': номер строки, 'Errors': текст} и не мешают остальным.
+"""
+from django.db import transaction
+from .models import Order, OrderItem, ProductInfo
+from .order_totals import deferred_totals
+
+
+MAX_BASKET_LINES = 1000
+
+
+
+class BasketError(ValueError):
+    """Запрос целиком не разобран: не список или слишком много строк"""
+
+
+
+def check_lines(lines):
+    if not isinstance(lines, list):
+        raise BasketError('Неверный формат запроса')
+    if len(lines) > MAX_BASKET_LINES:
+        raise BasketError(f'Не больше {MAX_BASKET_LINES} позиций за запрос')
+    return lines
+
+
+
+def is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool) \
+        and value > 0
+
+
+
+def get_basket(user, create=True):
+    basket = Order.objects.filter(user=user, status='basket').order_by(
+        'id'
+        ).first()
+    if basket is None and create:
+        basket = Order.objects.create(user=user, status='basket')
+    return basket
+
+
+
+def line_error(index, message):
+    return {'line': index, 'Errors': message}
+
+
+
+def add_items(user, lines):
+    """Добавляет строки {'product_info', 'quantity'}; если предложение
+    уже в корзине, его количество увеличивается"""
+    errors = []
+    wanted = []
+    for index, line in enumerate(check_lines(lines)):
+        if not isinstance(line, dict) or not is_id(line.get('product_info')) \
+                or not is_id(line.get('quantity')):
+            errors.append(line_error(index,
+                                     'Нужны product_info и quantity > 0'))
+            continue
+        wanted.append((index, line['product_info'], line['quantity']))
+
+    with transaction.atomic(), deferred_totals() as pending:
+        infos = ProductInfo.objects.in_bulk(
+            {product_info for _, product_info, _ in wanted}
+            )
+        basket = get_basket(user)
+        items = {item.product_info_id: item
+                 for item in OrderItem.objects.filter(order=basket,
+                                                      product_info__in=infos)}
+        updated = set()
+        for index, product_info, quantity in wanted:
+            info = infos.get(product_info)
+            if info is None:
+                errors.append(line_error(index, 'Предложение не найдено'))
+                continue
+            item = items.setdefault(product_info, OrderItem(
+                order=basket, product_info=info, shop_id=info.shop_id,
+                quantity=0
+                ))
+            if item.quantity + quantity > info.quantity:
+                errors.append(line_error(index,
+                                         f'В наличии {info.quantity} шт.'))
+                continue
+            item.quantity += quantity
+            if item.pk is not None:
+                updated.add(product_info)
+        created = [item for item in items.values()
+                   if item.pk is None and item.quantity]
+        OrderItem.objects.bulk_create(created)
+        OrderItem.objects.bulk_update([items[key] for key in updated],
+                                      ['quantity'])
+        pending.add(basket.id)
+    return {'created': len(created),
+            'updated': len(updated),
+            'errors': sorted(errors, key=lambda error: error['line'])}
+
+
+
+def update_items(user, lines):
+    """Меняет количество позиций корзины по строкам {'id', 'quantity'}"""
+    errors = []
+    wanted = []
+    for index, line in enumerate(check_lines(lines)):
+        if not isinstance(line, dict) or not is_id(line.get('id')) \
+                or not is_id(line.get('quantity')):
+            errors.append(line_error(index, 'Нужны id и quantity > 0'))
+            continue
+        wanted.append((index, line['id'], line['quantity']))
+
+    with transaction.atomic(), deferred_totals() as pending:
+        basket = get_basket(user, create=False)
+        items = OrderItem.objects.filter(
+            order=basket,
+            id__in={item_id for _, item_id, _ in wanted}
+            ).select_related('product_info').in_bulk() if basket else {}
+        updated = {}
+        for index, item_id, quantity in wanted:
+            item = items.get(item_id)
+            if item is None:
+                errors.append(line_error(index, 'Позиция не найдена'))
+                continue
+            if quantity > item.product_info.quantity:
+                errors.append(line_error(
+                    index, f'В наличии {item.product_info.quantity} шт.'
+                    ))
+                continue
+            item.quantity = quantity
+            updated[item_id] = item
+        OrderItem.objects.bulk_update(updated.values(), ['quantity'])
+        if basket is not None:
+            pending.add(basket.id)
+    return {'updated': len(updated),
+            'errors': sorted(errors, key=lambda error: error['line'])}
+
+
+
+def delete_items(user, item_ids):
+    """Удаляет позиции корзины по списку id или строке вида 1,2,3"""
+    if isinstance(item_ids, str):
+        item_ids = [int(item) if item.strip().isdigit() else item
+                    for item in item_ids.split(',')]
+    errors = []
+    wanted = {}
+    for index, item_id in enumerate(check_lines(item_ids)):
+        if not is_id(item_id):
+            errors.append(line_error(index, 'Неверный номер позиции'))
+            continue
+        wanted[index] = item_id
+
+    with transaction.atomic(), deferred_totals():
+        basket = get_basket(user, create=False)
+        items = OrderItem.objects.filter(order=basket,
+                                         id__in=set(wanted.values()))
+        found = set(items.values_list('id', flat=True)) if basket else set()
+        deleted = items.filter(id__in=found).delete()[0] if found else 0
+    errors += [line_error(index, 'Позиция не найдена')
+               for index, item_id in wanted.items() if item_id not in found]
+    return {'deleted': deleted,
+            'errors': sorted(errors, key=lambda error: error['line'])}
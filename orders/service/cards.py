@@ -0,0 +1,93 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from .models import ProductInfo, ProductParameter, ProductCard
+
+
+BATCH_SIZE = 1000
+
+
+
+def build_card(info):
+    """Документ карточки товара для ProductDetailView"""
+    return {
+        'left_module': {
+            'Наименование: ': info.product.name,
+            'Описание: ': info.product.category.name,
+            },
+        'rigth_module': {
+            'Поставщик: ': info.shop.name,
+            'Характеристики: ': [
+                {'product_info': info.id,
+                 'parameter': item.parameter.name,
+                 'value': item.value}
+                for item in info.product_parameters.all()
+                ],
+            'Цена: ': info.price,
+            'Количество: ': info.quantity,
+            'В корзину': '',
+            },
+        }
+
+
+
+def refresh_cards(product_info_ids, batch_size=BATCH_SIZE):
+    """Пересобирает карточки указанных предложений.
+
+    Вызывается импортом для созданных, изменённых и снятых с продажи
+    предложений, поэтому карточки остальных не трогаются.
+    """
+    product_info_ids = list(product_info_ids)
+    for start in range(0, len(product_info_ids), batch_size):
+        batch = product_info_ids[start:start + batch_size]
+        infos = ProductInfo.objects.filter(id__in=batch).select_related(
+            'product__category',
+            'shop'
+            ).prefetch_related(Prefetch(
+                'product_parameters',
+                queryset=ProductParameter.objects.select_related(
+                    'parameter'
+                    ).order_by('id')
+                ))
+        cards = [ProductCard(product_info_id=info.id,
+                             product_id=info.product_id,
+                             shop_id=info.shop_id,
+                             document=build_card(info))
+                 for info in infos]
+        ProductCard.objects.filter(product_info_id__in=batch).delete()
+        ProductCard.objects.bulk_create(cards)
+
+
+
+def get_card(product_id, shop_id):
+    """Карточка одним запросом по индексу (product, shop).
+
+    Если карточки ещё нет (данные появились до её введения или
+    в обход импорта), она собирается и сохраняется.
+    """
+    document = ProductCard.objects.filter(
+        product=product_id,
+        shop=shop_id
+        ).order_by('product_info').values_list('document', flat=True).first()
+    if document is not None:
+        return document
+    product_info_id = ProductInfo.objects.filter(
+        product=product_id,
+        shop=shop_id
+        ).order_by('id').values_list('id', flat=True).first()
+    if product_info_id is None:
+        return None
+    refresh_cards([product_info_id])
+    return ProductCard.objects.get(product_info_id=product_info_id).document
+
+
+
+async def aget_card(product_id, shop_id):
+    """get_card для асинхронных вьюх; сборка недостающей карточки
+    остаётся синхронной"""
+    document = await ProductCard.objects.filter(
+        product=product_id,
+        shop=shop_id
+        ).order_by('product_info').values_list('document', flat=True).afirst()
+    if document is not None:
+        return document
+    return await sync_to_async(get_card)(product_id, shop_id)
@@ -0,0 +1,131 @@
+import hashlib
+from django.core.cache import cache
+from django.utils import timezone
+from django.db.models import F, Sum, Count, Max
+from .models import Shop
+
+
+# ключ содержит версию каталога, поэтому устаревшая запись просто
+# перестаёт читаться; срок жизни нужен только чтобы освобождать память
+CACHE_TIMEOUT = 60 * 60 * 24
+KEY_PREFIX = 'catalog'
+STATS_KEYS = {'hits': f'{KEY_PREFIX}:hits', 'misses': f'{KEY_PREFIX}:misses'}
+
+
+
+def bump_catalog_version(shops):
+    """Увеличивает версию каталога магазинов и отмечает время изменения.
+
+    Вызывается внутри транзакции импорта и при правках каталога через
+    ProductViewSet: новая версия становится видна вместе с изменениями
+    в момент коммита, а по времени изменения строится Last-Modified.
+    """
+    return shops.update(catalog_version=F('catalog_version') + 1,
+                        catalog_modified=timezone.now())
+
+
+
+def catalog_state(shop_id=None):
+    """Версия каталога и время его последнего изменения одним запросом.
+
+    Для shop_id - данные магазина, иначе сводные по всем магазинам.
+    """
+    if shop_id is not None:
+        return Shop.objects.filter(pk=shop_id).values_list(
+            'catalog_version', 'catalog_modified'
+            ).first() or (None, None)
+    summary = Shop.objects.aggregate(
+        versions=Sum('catalog_version'),
+        shops=Count('id'),
+        last=Max('id'),
+        modified=Max('catalog_modified')
+        )
+    return '{versions}.{shops}.{last}'.format(**summary), \
+        summary['modified']
+
+
+
+async def acatalog_state(shop_id=None):
+    """catalog_state для асинхронных вьюх"""
+    if shop_id is not None:
+        return await Shop.objects.filter(pk=shop_id).values_list(
+            'catalog_version', 'catalog_modified'
+            ).afirst() or (None, None)
+    summary = await Shop.objects.aaggregate(
+        versions=Sum('catalog_version'),
+        shops=Count('id'),
+        last=Max('id'),
+        modified=Max('catalog_modified')
+        )
+    return '{versions}.{shops}.{last}'.format(**summary), \
+        summary['modified']
+
+
+
+def catalog_digest(path, version):
+    """Отпечаток ответа: ключ кеша и ETag"""
+    return hashlib.sha256(f'{version}:{path}'.encode('utf-8')).hexdigest()
+
+
+
+def count(name):
+    key = STATS_KEYS[name]
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # запись вытеснили между add и incr
+        cache.set(key, 1, None)
+
+
+
+async def acount(name):
+    key = STATS_KEYS[name]
+    await cache.aadd(key, 0, None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, None)
+
+
+
+def cached(path, version, build):
+    """Возвращает (данные, попадание) для ответа по пути запроса.
+
+    build() строит данные ответа при промахе; если он вернул None,
+    ответ не кешируется.
+    """
+    key = f'{KEY_PREFIX}:{catalog_digest(path, version)}'
+    data = cache.get(key)
+    if data is not None:
+        count('hits')
+        return data, True
+    data = build()
+    if data is not None:
+        cache.set(key, data, CACHE_TIMEOUT)
+    count('misses')
+    return data, False
+
+
+
+async def acached(path, version, build):
+    """cached для асинхронных вьюх, build - корутина"""
+    key = f'{KEY_PREFIX}:{catalog_digest(path, version)}'
+    data = await cache.aget(key)
+    if data is not None:
+        await acount('hits')
+        return data, True
+    data = await build()
+    if data is not None:
+        await cache.aset(key, data, CACHE_TIMEOUT)
+    await acount('misses')
+    return data, False
+
+
+
+def cache_stats():
+    values = cache.get_many(STATS_KEYS.values())
+    stats = {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 3) if total else 0
+    return stats
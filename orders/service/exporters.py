@@ -0,0 +1,242 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+from django.db.models import Prefetch
+from yaml import dump
+try:
+    from yaml import CSafeDumper as Dumper
+except ImportError:
+    from yaml import SafeDumper as Dumper
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+from .models import ProductInfo, ProductParameter, Category, Order, OrderItem
+
+
+CHUNK_SIZE = 2000
+
+CSV_COLUMNS = ('id', 'category', 'model', 'name',
+               'price', 'price_rrc', 'quantity', 'parameters')
+
+ORDER_CSV_COLUMNS = ('order', 'dt', 'status', 'user', 'shop',
+                     'product_info', 'model', 'name', 'price', 'quantity')
+
+
+
+def iter_goods(shop, chunk_size=CHUNK_SIZE):
+    """Отдаёт предложения магазина в схеме data/shop1.yaml.
+
+    Строки читаются курсором порциями по chunk_size вместе
+    с параметрами, поэтому память не зависит от размера каталога.
+    """
+    queryset = ProductInfo.objects.filter(shop=shop).select_related(
+        'product'
+        ).prefetch_related(Prefetch(
+            'product_parameters',
+            queryset=ProductParameter.objects.select_related('parameter')
+            )).order_by('id')
+    for info in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': info.external_id,
+            'category': info.product.category_id,
+            'model': info.model,
+            'name': info.product.name,
+            'price': info.price,
+            'price_rrc': info.price_rrc,
+            'quantity': info.quantity,
+            'parameters': {item.parameter.name: item.value
+                           for item in info.product_parameters.all()},
+            }
+
+
+
+def export_yaml(shop, goods):
+    header = {
+        'shop': shop.name,
+        'categories': [
+            {'id': category_id, 'name': name}
+            for category_id, name in Category.objects.filter(
+                shops=shop
+                ).order_by('id').values_list('id', 'name')
+            ],
+        }
+    yield dump(header, Dumper=Dumper, allow_unicode=True, sort_keys=False)
+    yield '\ngoods:\n'
+    for item in goods:
+        text = dump([item], Dumper=Dumper, allow_unicode=True,
+                    sort_keys=False)
+        yield ''.join('  ' + line for line in text.splitlines(True))
+
+
+
+def export_csv(shop, goods):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for item in goods:
+        writer.writerow([
+            json.dumps(item[column], ensure_ascii=False)
+            if column == 'parameters' else item[column]
+            for column in CSV_COLUMNS
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+
+def export_jsonl(shop, goods):
+    for item in goods:
+        yield json.dumps(item, ensure_ascii=False) + '\n'
+
+
+
+EXPORT_FORMATS = {
+    'yaml': (export_yaml, 'application/x-yaml'),
+    'csv': (export_csv, 'text/csv'),
+    'jsonl': (export_jsonl, 'application/x-ndjson'),
+    }
+
+
+
+def export_catalog(shop, export_format, chunk_size=CHUNK_SIZE):
+    """Генератор строк выгрузки каталога магазина в нужном формате"""
+    writer, _ = EXPORT_FORMATS[export_format]
+    return writer(shop, iter_goods(shop, chunk_size))
+
+
+
+def iter_orders(shop=None, date_from=None, date_to=None,
+                chunk_size=CHUNK_SIZE):
+    """Отдаёт заказы с позициями за период.
+
+    Для магазина в заказ попадают только позиции из его прайса.
+    """
+    items = OrderItem.objects.select_related(
+        'product_info__product'
+        ).order_by('id')
+    orders = Order.objects.exclude(status='basket').order_by('id')
+    if shop is not None:
+        items = items.filter(shop=shop)
+        orders = orders.filter(ordered_items__shop=shop).distinct()
+    if date_from is not None:
+        orders = orders.filter(dt__date__gte=date_from)
+    if date_to is not None:
+        orders = orders.filter(dt__date__lte=date_to)
+    orders = orders.prefetch_related(
+        Prefetch('ordered_items', queryset=items)
+        )
+    for order in orders.iterator(chunk_size=chunk_size):
+        yield {
+            'id': order.id,
+            'dt': order.dt.isoformat(),
+            'status': order.status,
+            'user': order.user_id,
+            'items': [{
+                'shop': item.shop_id,
+                'product_info': item.product_info_id,
+                'model': item.product_info.model,
+                'name': item.product_info.product.name,
+                'price': item.product_info.price,
+                'quantity': item.quantity,
+                } for item in order.ordered_items.all()],
+            }
+
+
+
+def export_orders_csv(orders):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_CSV_COLUMNS)
+    for order in orders:
+        for item in order['items']:
+            writer.writerow((order['id'], order['dt'], order['status'],
+                             order['user'], item['shop'],
+                             item['product_info'], item['model'],
+                             item['name'], item['price'], item['quantity']))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+
+def export_orders_jsonl(orders):
+    for order in orders:
+        yield json.dumps(order, ensure_ascii=False) + '\n'
+
+
+
+ORDER_EXPORT_FORMATS = {
+    'csv': export_orders_csv,
+    'jsonl': export_orders_jsonl,
+    }
+
+COMPRESSIONS = ('gzip', 'zstd') if zstandard is not None else ('gzip',)
+
+COMPRESSION_SUFFIXES = {'gzip': 'gz', 'zstd': 'zst'}
+
+
+
+def open_compressed(stream, compression):
+    """Оборачивает бинарный поток в сжимающий writer"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='wb')
+    if compression == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor().stream_writer(stream, closefd=False)
+    raise ValueError(f'Неизвестное сжатие: {compression}')
+
+
+
+"""Итератор, считающий отданные записи"""
+class RowCounter:
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+
+def catalog_key(shop, export_format, compression):
+    """Отпечаток выгрузки каталога.
+
+    Любое изменение каталога - импорт или правка через ProductViewSet -
+    увеличивает catalog_version магазина, поэтому пока версия и источник
+    импорта те же, готовый файл можно отдать повторно.
+    """
+    source = f'{shop.id}:{shop.catalog_version}:{shop.import_hash}:' \
+             f'{shop.imported_at}:{export_format}:{compression}'
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+
+def artifact_name(artifact):
+    owner = f'shop{artifact.shop_id}' if artifact.shop_id else 'all'
+    return f'{artifact.kind}_{owner}_{artifact.id}.{artifact.export_format}.' \
+           f'{COMPRESSION_SUFFIXES[artifact.compression]}'
+
+
+
+def write_artifact(artifact, stream, chunk_size=CHUNK_SIZE):
+    """Пишет выгрузку в бинарный поток со сжатием, возвращает число записей"""
+    if artifact.kind == 'catalog':
+        records = RowCounter(iter_goods(artifact.shop, chunk_size))
+        writer, _ = EXPORT_FORMATS[artifact.export_format]
+        chunks = writer(artifact.shop, records)
+    else:
+        records = RowCounter(iter_orders(artifact.shop, artifact.date_from,
+                                         artifact.date_to, chunk_size))
+        chunks = ORDER_EXPORT_FORMATS[artifact.export_format](records)
+    with open_compressed(stream, artifact.compression) as compressed:
+        for chunk in chunks:
+            compressed.write(chunk.encode('utf-8'))
+    return records.count
@@ -0,0 +1,740 @@
+import time
+from itertools import islice
+from django.db import connection, transaction
+from django.utils import timezone
+from .cards import refresh_cards
+from .catalog_cache import bump_catalog_version
+from .order_totals import refresh_basket_totals
+from .summaries import refresh_category_summaries, refresh_facets
+from .models import ProductInfo, Product, Parameter, ProductParameter, \
+    Category, Shop, ImportHistory, ProductCard, StagedOffer, StagedParameter
+from .parser import PriceList, download
+
+
+BATCH_SIZE = 1000
+
+REPLACE = 'replace'
+DELTA = 'delta'
+IMPORT_MODES = (REPLACE, DELTA)
+
+OFFER_FIELDS = ('product_id', 'model', 'quantity', 'price', 'price_rrc')
+STAGED_FIELDS = ('position', 'category_id', 'name', 'model', 'quantity',
+                 'price', 'price_rrc', 'parameters')
+
+# строка каталога отличается от строки прайса s в промежуточной таблице
+OFFER_DIFFERS = '''(
+    {product_info}.product_id <> s.product_id
+    OR {product_info}.model <> s.model
+    OR {product_info}.quantity <> s.quantity
+    OR {product_info}.price <> s.price
+    OR {product_info}.price_rrc <> s.price_rrc
+)'''
+
+ORM = 'orm'
+COPY = 'copy'
+LOADERS = (ORM, COPY)
+
+
+
+def batched(iterable, size):
+    """Разбивает итерируемый объект на списки длиной не больше size"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+
+"""Счётчик SQL-запросов, выполненных внутри блока with"""
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+
+"""Статистика импорта прайса"""
+class ImportStats:
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.retired = 0
+        self.parameters = 0
+        self.queries = 0
+        self.duration = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.duration:
+            return 0.0
+        return self.rows / self.duration
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'retired': self.retired,
+            'parameters': self.parameters,
+            'queries': self.queries,
+            'duration': round(self.duration, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            }
+
+
+
+"""Кеш ключей на время одного импорта.
+
+Хранит id категорий, название -> id параметра и (название, категория) ->
+id продукта. Параметры загружаются одним запросом целиком, продукты -
+одним запросом на каждую новую категорию; созданные при импорте ключи
+дописываются в кеш. Так число обращений к базе зависит от числа разных
+ключей, а не от числа строк и параметров в прайсе.
+"""
+class ImportKeyCache:
+
+    def __init__(self):
+        self.categories = {}
+        self.products = {}
+        self.parameters = None
+        self.loaded_categories = set()
+
+    def load_categories(self, category_ids):
+        """Возвращает словарь id -> название для уже известных категорий"""
+        missing = set(category_ids) - self.categories.keys()
+        if missing:
+            self.categories.update(
+                Category.objects.filter(id__in=missing).values_list('id', 'name')
+                )
+        return self.categories
+
+    def load_products(self, category_ids):
+        missing = set(category_ids) - self.loaded_categories
+        if not missing:
+            return
+        existing = Product.objects.filter(
+            category_id__in=missing
+            ).order_by('id').values_list('name', 'category_id', 'id')
+        for name, category_id, product_id in existing.iterator():
+            self.products.setdefault((name, category_id), product_id)
+        self.loaded_categories.update(missing)
+
+    def load_parameters(self):
+        if self.parameters is not None:
+            return
+        self.parameters = {}
+        existing = Parameter.objects.order_by('id').values_list('name', 'id')
+        for name, parameter_id in existing:
+            self.parameters.setdefault(name, parameter_id)
+
+
+
+"""Импорт прайса магазина пакетами.
+
+Ключи категорий, продуктов и параметров разрешаются несколькими
+запросами на пакет, строки ProductInfo и ProductParameter пишутся
+через bulk_create. Весь импорт выполняется в одной транзакции.
+
+В режиме REPLACE предложения магазина удаляются и создаются заново.
+В режиме DELTA входящие товары сравниваются с существующими ProductInfo
+по (shop, external_id): меняются только изменившиеся строки и параметры,
+новые добавляются, а отсутствующие в прайсе снимаются с продажи
+(quantity = 0), чтобы не трогать историю заказов.
+"""
+class CatalogImporter:
+
+    def __init__(self, shop, batch_size=BATCH_SIZE, mode=REPLACE,
+                 progress=None):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f'Неизвестный режим импорта: {mode}')
+        self.shop = shop
+        self.batch_size = batch_size
+        self.mode = mode
+        self.progress = progress
+        self.stats = ImportStats()
+        self.keys = ImportKeyCache()
+        self.seen = set()
+
+    def run(self, categories, goods):
+        return self.apply(
+            categories,
+            (self.resolve(batch) for batch in batched(goods, self.batch_size))
+            )
+
+    def apply(self, categories, resolved):
+        """Записывает в одной транзакции пакеты (offers, values),
+        полученные из resolve() - здесь же или в другом процессе"""
+        start = time.perf_counter()
+        with QueryCounter() as counter, transaction.atomic():
+            self.import_categories(categories)
+            self.keys.load_products(item['id'] for item in categories)
+            if self.mode == REPLACE:
+                ProductInfo.objects.filter(shop=self.shop).delete()
+            for offers, values in resolved:
+                self.write(offers, values)
+                if self.progress is not None:
+                    self.stats.duration = time.perf_counter() - start
+                    self.progress(self.stats)
+            if self.mode == DELTA:
+                self.retire_missing()
+            self.refresh_summaries()
+            bump_catalog_version(Shop.objects.filter(pk=self.shop.pk))
+        self.stats.queries = counter.count
+        self.stats.duration = time.perf_counter() - start
+        return self.stats
+
+    def refresh_summaries(self):
+        """Сводки и фасеты всех категорий магазина: и новых, и тех,
+        откуда предложения ушли, и суммы корзин с его предложениями"""
+        category_ids = list(Category.objects.filter(
+            shops=self.shop
+            ).values_list('id', flat=True))
+        refresh_category_summaries(category_ids)
+        refresh_facets(category_ids)
+        refresh_basket_totals(self.shop)
+
+    def import_categories(self, categories):
+        names = {item['id']: item['name'] for item in categories}
+        if not names:
+            return
+        existing = self.keys.load_categories(names)
+        Category.objects.bulk_create(
+            [Category(id=category_id, name=name)
+             for category_id, name in names.items()
+             if category_id not in existing]
+            )
+        renamed = [Category(id=category_id, name=name)
+                   for category_id, name in names.items()
+                   if category_id in existing and existing[category_id] != name]
+        if renamed:
+            Category.objects.bulk_update(renamed, ['name'])
+            refresh_cards(ProductCard.objects.filter(
+                product__category_id__in=[item.id for item in renamed]
+                ).values_list('product_info_id', flat=True))
+        existing.update(names)
+        through = Category.shops.through
+        through.objects.bulk_create(
+            [through(category_id=category_id, shop_id=self.shop.id)
+             for category_id in names],
+            ignore_conflicts=True
+            )
+
+    def resolve(self, goods):
+        """Разрешает ключи пакета товаров.
+
+        Возвращает несохранённые ProductInfo по внешнему ключу и значения
+        параметров {id параметра: значение} по внешнему ключу.
+        """
+        products = self.resolve_products(goods)
+        parameters = self.resolve_parameters(goods)
+        offers = {
+            item['id']: ProductInfo(
+                external_id=item['id'],
+                model=item['model'],
+                shop_id=self.shop.id,
+                product_id=products[(item['name'], item['category'])],
+                quantity=item['quantity'],
+                price=item['price'],
+                price_rrc=item['price_rrc']
+                )
+            for item in goods
+            }
+        values = {
+            item['id']: {parameters[name]: str(value)
+                         for name, value in item.get('parameters', {}).items()}
+            for item in goods
+            }
+        return offers, values
+
+    def write(self, offers, values):
+        existing = {}
+        if self.mode == DELTA:
+            existing = self.existing_offers(offers)
+        self.create_offers(
+            [offer for external_id, offer in offers.items()
+             if external_id not in existing],
+            values
+            )
+        if existing:
+            self.update_offers(existing, offers, values)
+        self.stats.rows += len(offers)
+
+    def existing_offers(self, offers):
+        """Возвращает словарь внешний ключ -> ProductInfo магазина"""
+        existing = {}
+        queryset = ProductInfo.objects.filter(
+            shop_id=self.shop.id,
+            external_id__in=list(offers)
+            ).order_by('id')
+        for info in queryset:
+            existing[info.external_id] = info
+        return existing
+
+    def create_offers(self, offers, values):
+        if not offers:
+            return
+        offers = ProductInfo.objects.bulk_create(offers)
+        product_info_ids = self.product_info_ids(offers)
+        product_parameters = [
+            ProductParameter(
+                product_info_id=product_info_ids[external_id],
+                parameter_id=parameter_id,
+                value=value
+                )
+            for external_id in product_info_ids
+            for parameter_id, value in values[external_id].items()
+            ]
+        ProductParameter.objects.bulk_create(product_parameters)
+        refresh_cards(product_info_ids.values())
+        self.seen.update(product_info_ids.values())
+        self.stats.created += len(offers)
+        self.stats.parameters += len(product_parameters)
+
+    def update_offers(self, existing, offers, values):
+        """Обновляет только изменившиеся предложения и их параметры"""
+        changed = []
+        for external_id, info in existing.items():
+            offer = offers[external_id]
+            if any(getattr(info, field) != getattr(offer, field)
+                   for field in OFFER_FIELDS):
+                for field in OFFER_FIELDS:
+                    setattr(info, field, getattr(offer, field))
+                changed.append(info)
+        if changed:
+            ProductInfo.objects.bulk_update(changed, OFFER_FIELDS)
+        changed_ids = {info.id for info in changed}
+
+        current = {}
+        rows = ProductParameter.objects.filter(
+            product_info_id__in=[info.id for info in existing.values()]
+            ).values_list('id', 'product_info_id', 'parameter_id', 'value')
+        for parameter_row_id, product_info_id, parameter_id, value in rows:
+            current.setdefault(product_info_id, {})[parameter_id] = \
+                (parameter_row_id, value)
+        created, updated, deleted = [], [], []
+        for external_id, info in existing.items():
+            wanted = values[external_id]
+            present = current.get(info.id, {})
+            for parameter_id, value in wanted.items():
+                if parameter_id not in present:
+                    created.append(ProductParameter(
+                        product_info_id=info.id,
+                        parameter_id=parameter_id,
+                        value=value
+                        ))
+                elif present[parameter_id][1] != value:
+                    updated.append(ProductParameter(
+                        id=present[parameter_id][0],
+                        value=value
+                        ))
+            deleted.extend(row_id
+                           for parameter_id, (row_id, _) in present.items()
+                           if parameter_id not in wanted)
+            if wanted.keys() != present.keys() or any(
+                    present[parameter_id][1] != value
+                    for parameter_id, value in wanted.items()):
+                changed_ids.add(info.id)
+        if created:
+            ProductParameter.objects.bulk_create(created)
+        if updated:
+            ProductParameter.objects.bulk_update(updated, ['value'])
+        if deleted:
+            ProductParameter.objects.filter(id__in=deleted).delete()
+        if changed_ids:
+            refresh_cards(changed_ids)
+
+        self.seen.update(info.id for info in existing.values())
+        self.stats.updated += len(changed_ids)
+        self.stats.unchanged += len(existing) - len(changed_ids)
+        self.stats.parameters += len(created) + len(updated) + len(deleted)
+
+    def retire_missing(self):
+        """Снимает с продажи предложения, которых нет в новом прайсе"""
+        missing = [product_info_id
+                   for product_info_id in ProductInfo.objects.filter(
+                       shop_id=self.shop.id,
+                       quantity__gt=0
+                       ).values_list('id', flat=True).iterator()
+                   if product_info_id not in self.seen]
+        for batch in batched(missing, self.batch_size):
+            self.stats.retired += ProductInfo.objects.filter(
+                id__in=batch
+                ).update(quantity=0)
+            refresh_cards(batch)
+
+    def resolve_staged(self, job_id, start, stop):
+        """Разрешает ключи части прайса из StagedOffer с номерами
+        [start, stop).
+
+        Проставляет строкам id продуктов и складывает значения параметров
+        в StagedParameter. Повторный вызов для той же части ничего
+        не дублирует.
+        """
+        rows = list(StagedOffer.objects.filter(
+            job_id=job_id,
+            position__gte=start,
+            position__lt=stop
+            ).order_by('position'))
+        goods = [{'name': row.name,
+                  'category': row.category_id,
+                  'parameters': row.parameters} for row in rows]
+        products = self.resolve_products(goods)
+        parameters = self.resolve_parameters(goods)
+        for row in rows:
+            row.product_id = products[(row.name, row.category_id)]
+        with transaction.atomic():
+            StagedOffer.objects.bulk_update(rows, ['product_id'],
+                                            batch_size=self.batch_size)
+            StagedParameter.objects.bulk_create(
+                [StagedParameter(job_id=job_id,
+                                 external_id=row.external_id,
+                                 parameter_id=parameters[name],
+                                 value=value)
+                 for row in rows
+                 for name, value in row.parameters.items()],
+                batch_size=self.batch_size,
+                ignore_conflicts=True
+                )
+        return len(rows)
+
+    def merge_staged(self, job_id):
+        """Переносит разрешённый прайс из StagedOffer и StagedParameter
+        в каталог магазина.
+
+        Предложения и параметры сливаются несколькими множественными
+        INSERT ... SELECT и UPDATE ... FROM в одной транзакции, поэтому
+        новый каталог становится виден целиком в момент коммита.
+        """
+        start = time.perf_counter()
+        tables = {
+            'product_info': ProductInfo._meta.db_table,
+            'product_parameter': ProductParameter._meta.db_table,
+            'staged_offer': StagedOffer._meta.db_table,
+            'staged_parameter': StagedParameter._meta.db_table,
+            }
+        shop_id = self.shop.id
+        with QueryCounter() as counter, transaction.atomic(), \
+                connection.cursor() as cursor:
+            if self.mode == REPLACE:
+                ProductInfo.objects.filter(shop=self.shop).delete()
+            self.stats.rows = StagedOffer.objects.filter(job_id=job_id).count()
+
+            cursor.execute('''
+                SELECT {product_info}.id FROM {product_info}
+                JOIN {staged_offer} s
+                    ON s.external_id = {product_info}.external_id
+                WHERE s.job_id = %s AND {product_info}.shop_id = %s
+                AND '''.format(**tables) + OFFER_DIFFERS.format(**tables),
+                [job_id, shop_id])
+            changed = {row[0] for row in cursor.fetchall()}
+            cursor.execute('''
+                UPDATE {product_info} SET
+                    product_id = s.product_id,
+                    model = s.model,
+                    quantity = s.quantity,
+                    price = s.price,
+                    price_rrc = s.price_rrc
+                FROM {staged_offer} s
+                WHERE s.job_id = %s AND {product_info}.shop_id = %s
+                AND {product_info}.external_id = s.external_id
+                AND '''.format(**tables) + OFFER_DIFFERS.format(**tables),
+                [job_id, shop_id])
+            cursor.execute('''
+                INSERT INTO {product_info} (external_id, model, shop_id,
+                    product_id, quantity, price, price_rrc)
+                SELECT s.external_id, s.model, %s, s.product_id,
+                    s.quantity, s.price, s.price_rrc
+                FROM {staged_offer} s
+                WHERE s.job_id = %s AND NOT EXISTS (
+                    SELECT 1 FROM {product_info} i
+                    WHERE i.shop_id = %s AND i.external_id = s.external_id
+                )
+                ON CONFLICT (product_id, shop_id, external_id) DO NOTHING
+                RETURNING id
+                '''.format(**tables), [shop_id, job_id, shop_id])
+            created = {row[0] for row in cursor.fetchall()}
+
+            cursor.execute('''
+                INSERT INTO {product_parameter}
+                    (product_info_id, parameter_id, value)
+                SELECT i.id, v.parameter_id, v.value
+                FROM {staged_parameter} v
+                JOIN {product_info} i ON i.external_id = v.external_id
+                WHERE v.job_id = %s AND i.shop_id = %s
+                ON CONFLICT (product_info_id, parameter_id) DO UPDATE
+                SET value = excluded.value
+                WHERE {product_parameter}.value <> excluded.value
+                RETURNING product_info_id
+                '''.format(**tables), [job_id, shop_id])
+            values = [row[0] for row in cursor.fetchall()]
+            cursor.execute('''
+                DELETE FROM {product_parameter}
+                WHERE product_info_id IN (
+                    SELECT i.id FROM {product_info} i
+                    JOIN {staged_offer} s ON s.external_id = i.external_id
+                    WHERE s.job_id = %s AND i.shop_id = %s
+                )
+                AND NOT EXISTS (
+                    SELECT 1 FROM {staged_parameter} v
+                    JOIN {product_info} i ON i.external_id = v.external_id
+                    WHERE v.job_id = %s AND i.shop_id = %s
+                    AND i.id = {product_parameter}.product_info_id
+                    AND v.parameter_id = {product_parameter}.parameter_id
+                )
+                RETURNING product_info_id
+                '''.format(**tables), [job_id, shop_id, job_id, shop_id])
+            values += [row[0] for row in cursor.fetchall()]
+            changed.update(values)
+
+            retired = set()
+            if self.mode == DELTA:
+                cursor.execute('''
+                    UPDATE {product_info} SET quantity = 0
+                    WHERE shop_id = %s AND quantity > 0
+                    AND NOT EXISTS (
+                        SELECT 1 FROM {staged_offer} s
+                        WHERE s.job_id = %s
+                        AND s.external_id = {product_info}.external_id
+                    )
+                    RETURNING id
+                    '''.format(**tables), [shop_id, job_id])
+                retired = {row[0] for row in cursor.fetchall()}
+
+            refresh_cards(changed | created | retired)
+            self.refresh_summaries()
+            bump_catalog_version(Shop.objects.filter(pk=shop_id))
+        self.stats.created = len(created)
+        self.stats.updated = len(changed - created)
+        self.stats.unchanged = \
+            self.stats.rows - self.stats.created - self.stats.updated
+        self.stats.retired = len(retired)
+        self.stats.parameters = len(values)
+        self.stats.queries = counter.count
+        self.stats.duration = time.perf_counter() - start
+        return self.stats
+
+    def resolve_products(self, goods):
+        """Возвращает словарь (название, категория) -> id продукта,
+        создавая недостающие продукты одним запросом"""
+        keys = {(item['name'], item['category']) for item in goods}
+        self.keys.load_products({category for _, category in keys})
+        missing = [Product(name=name, category_id=category_id)
+                   for name, category_id in keys
+                   if (name, category_id) not in self.keys.products]
+        for product in self.create(Product, missing, ('name', 'category_id')):
+            self.keys.products[(product.name, product.category_id)] = \
+                product.id
+        return self.keys.products
+
+    def resolve_parameters(self, goods):
+        """Возвращает словарь название -> id параметра,
+        создавая недостающие параметры одним запросом"""
+        names = {name
+                 for item in goods
+                 for name in item.get('parameters', {})}
+        self.keys.load_parameters()
+        missing = [Parameter(name=name)
+                   for name in names if name not in self.keys.parameters]
+        for parameter in self.create(Parameter, missing, ('name',)):
+            self.keys.parameters[parameter.name] = parameter.id
+        return self.keys.parameters
+
+    @staticmethod
+    def create(model, objects, key_fields):
+        """bulk_create по уникальному ключу с дочитыванием id.
+
+        Строки, которые успел создать параллельный импорт, пропускаются
+        (ignore_conflicts), поэтому id всех строк читаются после вставки.
+        """
+        if not objects:
+            return objects
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        lookup = {field + '__in': {getattr(obj, field) for obj in objects}
+                  for field in key_fields}
+        return model.objects.filter(**lookup)
+
+    def product_info_ids(self, product_infos):
+        """Возвращает словарь внешний ключ -> id созданной ProductInfo"""
+        if connection.features.can_return_rows_from_bulk_insert:
+            return {info.external_id: info.id for info in product_infos}
+        return dict(ProductInfo.objects.filter(
+            shop_id=self.shop.id,
+            external_id__in=[info.external_id for info in product_infos]
+            ).values_list('external_id', 'id'))
+
+
+
+def get_importer(shop, batch_size=BATCH_SIZE, mode=REPLACE, progress=None,
+                 loader=ORM):
+    """Возвращает загрузчик прайса: COPY работает только на PostgreSQL,
+    на остальных базах используется CatalogImporter"""
+    if loader not in LOADERS:
+        raise ValueError(f'Неизвестный загрузчик: {loader}')
+    if loader == COPY and connection.vendor == 'postgresql':
+        from .pg_loader import CopyLoader
+        return CopyLoader(shop, batch_size, mode, progress)
+    return CatalogImporter(shop, batch_size, mode, progress)
+
+
+
+def stage_goods(job_id, goods, batch_size=BATCH_SIZE):
+    """Складывает товары прайса в StagedOffer пакетами по мере чтения.
+
+    Возвращает число прочитанных товаров: части для параллельного импорта
+    задаются диапазонами номеров строк, а не самими товарами.
+    """
+    position = 0
+    for batch in batched(goods, batch_size):
+        rows = {}
+        for item in batch:
+            rows[item['id']] = StagedOffer(
+                job_id=job_id,
+                position=position,
+                external_id=item['id'],
+                category_id=item['category'],
+                name=item['name'],
+                model=item['model'],
+                quantity=item['quantity'],
+                price=item['price'],
+                price_rrc=item['price_rrc'],
+                parameters={name: str(value) for name, value
+                            in item.get('parameters', {}).items()}
+                )
+            position += 1
+        # при повторе внешнего ключа побеждает последняя строка прайса
+        StagedOffer.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=['job_id', 'external_id'],
+            update_fields=STAGED_FIELDS
+            )
+    return position
+
+
+
+def fetch_price_list(user_id, url, start):
+    """Скачивает прайс магазина пользователя.
+
+    Возвращает (shop, fetched, history). Если источник ответил 304 на
+    условный запрос или хеш содержимого совпал с последним успешным
+    импортом, fetched равен None, а history - запись о пропуске импорта.
+    """
+    shop = Shop.objects.filter(user_id=user_id).first()
+    conditional = shop is not None and shop.url == url and shop.import_hash
+    fetched = download(
+        url,
+        etag=shop.import_etag if conditional else '',
+        last_modified=shop.import_last_modified if conditional else ''
+        )
+    if fetched is None:
+        return shop, None, ImportHistory.objects.create(
+            shop=shop,
+            url=url,
+            content_hash=shop.import_hash,
+            status='not_modified',
+            duration=time.perf_counter() - start
+            )
+    if shop is not None and shop.import_hash == fetched.content_hash:
+        fetched.stream.close()
+        Shop.objects.filter(pk=shop.pk).update(
+            url=url,
+            import_etag=fetched.etag,
+            import_last_modified=fetched.last_modified
+            )
+        return shop, None, ImportHistory.objects.create(
+            shop=shop,
+            url=url,
+            content_hash=fetched.content_hash,
+            status='unchanged',
+            duration=time.perf_counter() - start
+            )
+    return shop, fetched, None
+
+
+
+def get_shop(user_id, shop, name):
+    if shop is not None:
+        return shop
+    shop, _ = Shop.objects.get_or_create(
+        name=name,
+        user_id=user_id,
+        defaults={'distance': 0}
+        )
+    return shop
+
+
+
+def record_import(shop, url, source, stats, duration):
+    """Запоминает источник успешного импорта и пишет его в историю.
+
+    source - словарь с content_hash, etag и last_modified прайса.
+    """
+    Shop.objects.filter(pk=shop.pk).update(
+        url=url,
+        import_hash=source['content_hash'],
+        import_etag=source['etag'],
+        import_last_modified=source['last_modified'],
+        imported_at=timezone.now()
+        )
+    return ImportHistory.objects.create(
+        shop=shop,
+        url=url,
+        content_hash=source['content_hash'],
+        status='imported',
+        duration=duration,
+        rows=stats.rows,
+        created=stats.created,
+        updated=stats.updated,
+        unchanged=stats.unchanged,
+        retired=stats.retired,
+        queries=stats.queries
+        )
+
+
+
+def import_price_list(user_id, url, mode=DELTA, batch_size=BATCH_SIZE,
+                      progress=None, loader=ORM):
+    """Импортирует прайс магазина пользователя по ссылке.
+
+    Неизменённый прайс не импортируется (см. fetch_price_list).
+    Каждый вызов записывается в ImportHistory. progress(stats, fraction)
+    вызывается после каждого пакета, fraction - доля прочитанного файла.
+    """
+    start = time.perf_counter()
+    shop, fetched, history = fetch_price_list(user_id, url, start)
+    if fetched is None:
+        return history
+    with fetched:
+        price_list = PriceList(fetched.stream)
+        report = None
+        if progress is not None:
+            def report(stats):
+                progress(stats, fetched.stream.tell() / (fetched.size or 1))
+        with transaction.atomic():
+            shop = get_shop(user_id, shop, price_list.shop)
+            importer = get_importer(shop, batch_size, mode, report, loader)
+            stats = importer.run(
+                price_list.categories,
+                price_list.goods()
+                )
+            return record_import(shop, url, fetched.source,
+                                 stats, time.perf_counter() - start)
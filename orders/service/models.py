@@ -27,6 +27,30 @@ USER_TYPE_CHOICES = (
 
 
 
+JOB_STATE_CHOICES = (
+    ('queued', 'В очереди'),
+    ('running', 'Выполняется'),
+    ('done', 'Завершена'),
+    ('failed', 'Ошибка'),
+    )
+
+
+
+IMPORT_STATUS_CHOICES = (
+    ('imported', 'Импортирован'),
+    ('unchanged', 'Содержимое не изменилось'),
+    ('not_modified', 'Не изменён на источнике'),
+    )
+
+
+
+EXPORT_KIND_CHOICES = (
+    ('catalog', 'Каталог магазина'),
+    ('orders', 'Заказы за период'),
+    )
+
+
+
 """Миксин для управления пользователями"""
 class UserManager(BaseUserManager):
     use_in_migrations = True
@@ -142,6 +166,35 @@ class Shop(models.Model):
         null=True,
         on_delete=models.CASCADE
         )
+    import_hash = models.CharField(
+        verbose_name='Хеш последнего прайса',
+        max_length=64,
+        blank=True
+        )
+    import_etag = models.CharField(
+        verbose_name='ETag последнего прайса',
+        max_length=200,
+        blank=True
+        )
+    import_last_modified = models.CharField(
+        verbose_name='Last-Modified последнего прайса',
+        max_length=50,
+        blank=True
+        )
+    imported_at = models.DateTimeField(
+        verbose_name='Время последнего импорта',
+        null=True,
+        blank=True
+        )
+    catalog_version = models.PositiveIntegerField(
+        verbose_name='Версия каталога',
+        default=0
+        )
+    catalog_modified = models.DateTimeField(
+        verbose_name='Время последнего изменения каталога',
+        null=True,
+        blank=True
+        )
     class Meta:
         verbose_name = 'Магазин'
         verbose_name_plural = "Список магазинов"
@@ -152,6 +205,247 @@ class Shop(models.Model):
 
 
 
+class ImportHistory(models.Model):
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name='Магазин',
+        related_name='imports',
+        on_delete=models.CASCADE
+        )
+    url = models.URLField(verbose_name='Ссылка')
+    content_hash = models.CharField(
+        verbose_name='Хеш прайса',
+        max_length=64,
+        blank=True
+        )
+    status = models.CharField(
+        verbose_name='Статус',
+        choices=IMPORT_STATUS_CHOICES,
+        max_length=20
+        )
+    dt = models.DateTimeField(auto_now_add=True)
+    duration = models.FloatField(verbose_name='Длительность, с', default=0)
+    rows = models.PositiveIntegerField(verbose_name='Строк в прайсе', default=0)
+    created = models.PositiveIntegerField(verbose_name='Добавлено', default=0)
+    updated = models.PositiveIntegerField(verbose_name='Изменено', default=0)
+    unchanged = models.PositiveIntegerField(
+        verbose_name='Без изменений',
+        default=0
+        )
+    retired = models.PositiveIntegerField(
+        verbose_name='Снято с продажи',
+        default=0
+        )
+    queries = models.PositiveIntegerField(
+        verbose_name='SQL-запросов',
+        default=0
+        )
+
+    class Meta:
+        verbose_name = 'Импорт прайса'
+        verbose_name_plural = "История импорта прайсов"
+        ordering = ('-dt',)
+
+    def __str__(self):
+        return f'{self.shop} {self.dt} {self.status}'
+
+
+
+class ImportJob(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='Пользователь',
+        related_name='import_jobs',
+        on_delete=models.CASCADE
+        )
+    url = models.URLField(verbose_name='Ссылка')
+    mode = models.CharField(verbose_name='Режим импорта', max_length=20)
+    loader = models.CharField(
+        verbose_name='Загрузчик',
+        max_length=20,
+        default='orm'
+        )
+    state = models.CharField(
+        verbose_name='Состояние',
+        choices=JOB_STATE_CHOICES,
+        max_length=20,
+        default='queued'
+        )
+    progress = models.FloatField(verbose_name='Выполнено, %', default=0)
+    rows = models.PositiveIntegerField(
+        verbose_name='Обработано строк',
+        default=0
+        )
+    rows_per_second = models.FloatField(
+        verbose_name='Строк в секунду',
+        default=0
+        )
+    errors = models.JSONField(verbose_name='Ошибки', default=list, blank=True)
+    chunk_size = models.PositiveIntegerField(
+        verbose_name='Размер части для параллельного импорта',
+        null=True,
+        blank=True
+        )
+    history = models.ForeignKey(
+        ImportHistory,
+        verbose_name='Запись истории импорта',
+        related_name='jobs',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+        )
+    dt = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Задача импорта'
+        verbose_name_plural = "Список задач импорта"
+        ordering = ('-dt',)
+
+    def __str__(self):
+        return f'{self.url} {self.state}'
+
+    @property
+    def progress_key(self):
+        return f'import_job:{self.pk}'
+
+
+
+class StagedOffer(models.Model):
+    job = models.ForeignKey(
+        ImportJob,
+        verbose_name='Задача импорта',
+        related_name='staged_offers',
+        on_delete=models.CASCADE
+        )
+    position = models.PositiveIntegerField(verbose_name='Номер в прайсе')
+    external_id = models.PositiveIntegerField(verbose_name='Внешний ключ')
+    category_id = models.PositiveIntegerField(verbose_name='ID категории')
+    name = models.CharField(max_length=100, verbose_name='Название продукта')
+    product_id = models.PositiveIntegerField(
+        verbose_name='ID продукта',
+        null=True,
+        blank=True
+        )
+    model = models.CharField(max_length=100, verbose_name='Модель')
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    price = models.PositiveIntegerField(verbose_name='Цена')
+    price_rrc = models.PositiveIntegerField(
+        verbose_name='Рекомендуемая розничная цена'
+        )
+    parameters = models.JSONField(
+        verbose_name='Значения параметров по названию',
+        default=dict
+        )
+
+    class Meta:
+        verbose_name = 'Предложение в промежуточной таблице'
+        verbose_name_plural = "Промежуточные предложения импорта"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['job', 'external_id'],
+                name='unique_staged_offer'
+                ),
+            ]
+        # части прайса выбираются диапазоном номеров
+        indexes = [
+            models.Index(fields=['job', 'position'],
+                         name='staged_offer_position_idx'),
+            ]
+
+
+
+class StagedParameter(models.Model):
+    job = models.ForeignKey(
+        ImportJob,
+        verbose_name='Задача импорта',
+        related_name='staged_parameters',
+        on_delete=models.CASCADE
+        )
+    external_id = models.PositiveIntegerField(verbose_name='Внешний ключ')
+    parameter_id = models.PositiveIntegerField(verbose_name='ID параметра')
+    value = models.CharField(
+        verbose_name='Значение',
+        max_length=100,
+        blank=True
+        )
+
+    class Meta:
+        verbose_name = 'Параметр в промежуточной таблице'
+        verbose_name_plural = "Промежуточные параметры импорта"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['job', 'external_id', 'parameter_id'],
+                name='unique_staged_parameter'
+                ),
+            ]
+
+
+
+class ExportArtifact(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='Пользователь',
+        related_name='exports',
+        on_delete=models.CASCADE
+        )
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name='Магазин',
+        related_name='exports',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE
+        )
+    kind = models.CharField(
+        verbose_name='Что выгружается',
+        choices=EXPORT_KIND_CHOICES,
+        max_length=20
+        )
+    export_format = models.CharField(verbose_name='Формат', max_length=10)
+    compression = models.CharField(verbose_name='Сжатие', max_length=10)
+    date_from = models.DateField(null=True, blank=True)
+    date_to = models.DateField(null=True, blank=True)
+    key = models.CharField(
+        verbose_name='Отпечаток содержимого',
+        max_length=64,
+        blank=True,
+        db_index=True
+        )
+    state = models.CharField(
+        verbose_name='Состояние',
+        choices=JOB_STATE_CHOICES,
+        max_length=20,
+        default='queued'
+        )
+    file = models.FileField(
+        verbose_name='Файл выгрузки',
+        upload_to='exports/',
+        blank=True
+        )
+    size = models.PositiveBigIntegerField(
+        verbose_name='Размер, байт',
+        default=0
+        )
+    rows = models.PositiveIntegerField(
+        verbose_name='Выгружено строк',
+        default=0
+        )
+    errors = models.JSONField(verbose_name='Ошибки', default=list, blank=True)
+    dt = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Выгрузка'
+        verbose_name_plural = "Список выгрузок"
+        ordering = ('-dt',)
+
+    def __str__(self):
+        return f'{self.kind} {self.export_format} {self.state}'
+
+
+
 class Category(models.Model):
     id = models.PositiveIntegerField(
         primary_key=True,
@@ -172,6 +466,9 @@ class Category(models.Model):
         verbose_name = 'Категория'
         verbose_name_plural = "Список категорий"
         ordering = ('-name',)
+        indexes = [
+            models.Index(fields=['name', 'id'], name='category_name_id_idx'),
+            ]
 
     def __str__(self):
         return self.name
@@ -194,6 +491,21 @@ class Product(models.Model):
         verbose_name = 'Продукт'
         verbose_name_plural = "Список продуктов"
         ordering = ('-name',)
+        # по этому ключу импорт находит продукты, в том числе
+        # параллельными частями без блокировок
+        constraints = [
+            models.UniqueConstraint(
+                fields=['category', 'name'],
+                name='unique_product'
+                ),
+            ]
+        # порядок и условие постраничного вывода каталога (KeysetPagination)
+        indexes = [
+            models.Index(
+                fields=['category', 'name', 'id'],
+                name='product_category_name_id_idx'
+                ),
+            ]
 
     def __str__(self):
         return self.name
@@ -237,11 +549,24 @@ class ProductInfo(models.Model):
                 name='unique_product_info'
                 ),
             ]
+        # сравнение предложений: цена и остаток читаются только из индекса
+        indexes = [
+            models.Index(
+                fields=['product', 'price', 'shop'],
+                include=['quantity', 'id'],
+                condition=models.Q(quantity__gt=0),
+                name='product_offer_price_idx'
+                ),
+            ]
 
 
 
 class Parameter(models.Model):
-    name = models.CharField(max_length=50, verbose_name='Название')
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='Название'
+        )
     class Meta:
         verbose_name = 'Название параметра'
         verbose_name_plural = "Список названий параметров"
@@ -282,6 +607,152 @@ class ProductParameter(models.Model):
                 name='unique_product_parameter'
                 ),
             ]
+        # списки предложений по паре параметр-значение для фасетов
+        indexes = [
+            models.Index(
+                fields=['parameter', 'value', 'product_info'],
+                name='product_parameter_facet_idx'
+                ),
+            ]
+
+
+
+class ProductCard(models.Model):
+    product_info = models.OneToOneField(
+        ProductInfo,
+        verbose_name='Информация о продукте',
+        related_name='card',
+        primary_key=True,
+        on_delete=models.CASCADE
+        )
+    product = models.ForeignKey(
+        Product,
+        verbose_name='Продукт',
+        related_name='cards',
+        on_delete=models.CASCADE
+        )
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name='Магазин',
+        related_name='cards',
+        on_delete=models.CASCADE
+        )
+    document = models.JSONField(verbose_name='Карточка товара')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Карточка товара'
+        verbose_name_plural = "Карточки товаров"
+        indexes = [
+            models.Index(
+                fields=['product', 'shop', 'product_info'],
+                name='product_card_lookup_idx'
+                ),
+            ]
+
+
+
+class CategorySummary(models.Model):
+    category = models.OneToOneField(
+        Category,
+        verbose_name='Категория',
+        related_name='summary',
+        primary_key=True,
+        on_delete=models.CASCADE
+        )
+    products = models.PositiveIntegerField(
+        verbose_name='Товаров в наличии',
+        default=0
+        )
+    offers = models.PositiveIntegerField(
+        verbose_name='Предложений в наличии',
+        default=0
+        )
+    shops = models.PositiveIntegerField(verbose_name='Магазинов', default=0)
+    min_price = models.PositiveIntegerField(
+        verbose_name='Минимальная цена',
+        null=True,
+        blank=True
+        )
+    max_price = models.PositiveIntegerField(
+        verbose_name='Максимальная цена',
+        null=True,
+        blank=True
+        )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Сводка по категории'
+        verbose_name_plural = "Сводки по категориям"
+
+
+
+class ProductFacet(models.Model):
+    parameter = models.ForeignKey(
+        Parameter,
+        verbose_name='Параметр',
+        related_name='facets',
+        on_delete=models.CASCADE
+        )
+    value = models.CharField(
+        verbose_name='Значение',
+        max_length=100,
+        blank=True
+        )
+    product = models.ForeignKey(
+        Product,
+        verbose_name='Продукт',
+        related_name='facets',
+        on_delete=models.CASCADE
+        )
+    in_stock = models.BooleanField(verbose_name='В наличии', default=False)
+
+    class Meta:
+        verbose_name = 'Товар со значением параметра'
+        verbose_name_plural = "Списки товаров по значениям параметров"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['parameter', 'value', 'product'],
+                name='unique_product_facet'
+                ),
+            ]
+        # значения параметров для найденных товаров
+        indexes = [
+            models.Index(fields=['product', 'parameter', 'value'],
+                         name='product_facet_product_idx'),
+            ]
+
+
+
+class FacetCount(models.Model):
+    category = models.ForeignKey(
+        Category,
+        verbose_name='Категория',
+        related_name='facet_counts',
+        on_delete=models.CASCADE
+        )
+    parameter = models.ForeignKey(
+        Parameter,
+        verbose_name='Параметр',
+        related_name='facet_counts',
+        on_delete=models.CASCADE
+        )
+    value = models.CharField(
+        verbose_name='Значение',
+        max_length=100,
+        blank=True
+        )
+    products = models.PositiveIntegerField(verbose_name='Товаров', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик значения параметра'
+        verbose_name_plural = "Счётчики значений параметров"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['category', 'parameter', 'value'],
+                name='unique_facet_count'
+                ),
+            ]
 
 
 
@@ -298,11 +769,32 @@ class Order(models.Model):
         choices=STATE_CHOICES,
         max_length=50
         )
+    # суммы пересчитывает service.order_totals при изменении позиций
+    total_price = models.PositiveIntegerField(
+        verbose_name='Сумма позиций',
+        default=0
+        )
+    delivery_price = models.DecimalField(
+        verbose_name='Стоимость доставки',
+        max_digits=12,
+        decimal_places=2,
+        default=0
+        )
+    final_price = models.DecimalField(
+        verbose_name='Итог',
+        max_digits=12,
+        decimal_places=2,
+        default=0
+        )
 
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = "Список заказ"
         ordering = ('-dt',)
+        # история заказов покупателя
+        indexes = [
+            models.Index(fields=['user', '-dt'], name='order_user_dt_idx'),
+            ]
 
     def __str__(self):
         return str(self.dt)
@@ -334,6 +826,12 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(
         verbose_name='Количество'
         )
+    # цена фиксируется, когда заказ уходит из корзины
+    price = models.PositiveIntegerField(
+        verbose_name='Цена на момент заказа',
+        null=True,
+        blank=True
+        )
 
     class Meta:
         verbose_name = 'Заказанная позиция'
@@ -347,6 +845,39 @@ class OrderItem(models.Model):
 
 
 
+class OrderShopTotal(models.Model):
+    order = models.ForeignKey(
+        Order,
+        verbose_name='Заказ',
+        related_name='shop_totals',
+        on_delete=models.CASCADE
+        )
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name='Магазин',
+        related_name='order_totals',
+        on_delete=models.CASCADE
+        )
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    subtotal = models.PositiveIntegerField(verbose_name='Сумма позиций')
+    delivery_price = models.DecimalField(
+        verbose_name='Стоимость доставки',
+        max_digits=12,
+        decimal_places=2
+        )
+
+    class Meta:
+        verbose_name = 'Сумма заказа по магазину'
+        verbose_name_plural = "Суммы заказов по магазинам"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['order', 'shop'],
+                name='unique_order_shop_total'
+                ),
+            ]
+
+
+
 class UsersContactPhone(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
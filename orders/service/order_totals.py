@@ -0,0 +1,119 @@
+"""Суммы заказов в колонках Order и строках OrderShopTotal.
+
+Пересчитываются в транзакции при каждом изменении позиций: сигналы
+сохранения и удаления OrderItem и Order, а массовые операции вызывают
+refresh_order_totals сами или откладывают пересчёт через
+deferred_totals(). Пока заказ в корзине, позиции считаются
+по текущим ценам предложений, поэтому импорт прайса пересчитывает
+корзины с предложениями магазина; когда заказ уходит из корзины, цены
+позиций фиксируются в OrderItem.price и суммы больше от каталога
+не зависят.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from .models import Order, OrderItem, OrderShopTotal, ProductInfo
+from .pricing import order_lines, price_lines
+
+
+# заказы, пересчёт которых отложен до выхода из deferred_totals()
+pending_orders = ContextVar('pending_orders', default=None)
+
+
+
+def freeze_prices(order_ids):
+    """Фиксирует текущие цены позиций, у которых цены ещё нет"""
+    return OrderItem.objects.filter(
+        order__in=order_ids,
+        price__isnull=True
+        ).update(price=Subquery(ProductInfo.objects.filter(
+            pk=OuterRef('product_info')
+            ).values('price')[:1]))
+
+
+
+def refresh_order_totals(order_ids):
+    order_ids = set(order_ids)
+    with transaction.atomic():
+        orders = {
+            order_id: (status, discount_factor)
+            for order_id, status, discount_factor
+            in Order.objects.select_for_update().filter(
+                pk__in=order_ids
+                ).values_list('id', 'status', 'user__discount_factor')
+            }
+        if not orders:
+            return
+        placed = [order_id for order_id, (status, _) in orders.items()
+                  if status != 'basket']
+        if placed:
+            freeze_prices(placed)
+        lines = defaultdict(list)
+        for line in order_lines(OrderItem.objects.filter(order__in=orders)):
+            lines[line['order']].append(line)
+
+        OrderShopTotal.objects.filter(order__in=orders).delete()
+        shop_totals = []
+        for order_id, (_, discount_factor) in orders.items():
+            pricing = price_lines(lines[order_id], discount_factor)
+            shop_totals += [OrderShopTotal(order_id=order_id,
+                                           shop_id=shop['shop'],
+                                           quantity=shop['quantity'],
+                                           subtotal=shop['subtotal'],
+                                           delivery_price=shop['delivery'])
+                            for shop in pricing['shops']]
+            Order.objects.filter(pk=order_id).update(
+                total_price=pricing['subtotal'],
+                delivery_price=pricing['delivery'],
+                final_price=pricing['total']
+                )
+        OrderShopTotal.objects.bulk_create(shop_totals)
+
+
+
+def refresh_basket_totals(shop):
+    """Пересчитывает корзины, в которых есть предложения магазина -
+    после импорта его прайса"""
+    refresh_order_totals(Order.objects.filter(
+        status='basket',
+        ordered_items__product_info__shop=shop
+        ).values_list('id', flat=True).distinct())
+
+
+
+@contextmanager
+def deferred_totals():
+    """Сигналы внутри блока только запоминают заказы, суммы
+    пересчитываются один раз на выходе - например, после удаления
+    многих позиций одним запросом"""
+    pending = set()
+    token = pending_orders.set(pending)
+    try:
+        yield pending
+    finally:
+        pending_orders.reset(token)
+    if pending:
+        refresh_order_totals(pending)
+
+
+
+def changed(order_id):
+    pending = pending_orders.get()
+    if pending is None:
+        refresh_order_totals([order_id])
+    else:
+        pending.add(order_id)
+
+
+
+def item_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changed(instance.order_id)
+
+
+
+def order_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changed(instance.pk)
@@ -0,0 +1,177 @@
+import hashlib
+from tempfile import SpooledTemporaryFile
+import requests
+from yaml.events import StreamStartEvent, DocumentStartEvent, \
+    MappingStartEvent, MappingEndEvent, SequenceStartEvent, \
+    SequenceEndEvent, ScalarEvent, AliasEvent
+from yaml.nodes import ScalarNode, SequenceNode, MappingNode
+try:
+    from yaml import CSafeLoader as Loader
+except ImportError:
+    from yaml import SafeLoader as Loader
+
+
+DOWNLOAD_TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
+# до этого размера прайс держится в памяти, дальше - во временном файле
+SPOOL_SIZE = 8 * 1024 * 1024
+
+
+
+"""Загруженный прайс: поток для разбора и его хеш/ETag/Last-Modified"""
+class Download:
+
+    def __init__(self, stream, content_hash, etag='', last_modified='',
+                 size=0):
+        self.stream = stream
+        self.size = size
+        self.content_hash = content_hash
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def source(self):
+        return {'content_hash': self.content_hash,
+                'etag': self.etag,
+                'last_modified': self.last_modified}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stream.close()
+
+
+
+def download(url, etag='', last_modified=''):
+    """Скачивает прайс, считая sha256 по ходу загрузки.
+
+    С etag/last_modified выполняется условный запрос: если источник
+    ответил 304, возвращается None и файл не скачивается.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    response = requests.get(url, stream=True, headers=headers,
+                            timeout=DOWNLOAD_TIMEOUT)
+    with response:
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        digest = hashlib.sha256()
+        stream = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        size = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            digest.update(chunk)
+            stream.write(chunk)
+            size += len(chunk)
+        stream.seek(0)
+        return Download(stream,
+                        digest.hexdigest(),
+                        response.headers.get('ETag', ''),
+                        response.headers.get('Last-Modified', ''),
+                        size)
+
+
+
+"""Потоковый разбор прайса в формате data/shop1.yaml.
+
+Ключи shop и categories читаются сразу и должны идти в файле до goods,
+товары из goods отдаются по одному генератором goods(), поэтому память
+не зависит от размера файла. Якоря YAML действуют на весь документ.
+При наличии libyaml используется C-парсер.
+"""
+class PriceList:
+
+    def __init__(self, stream):
+        self.loader = Loader(stream)
+        self.header = {}
+        self._anchors = {}
+        self._has_goods = self._read_header()
+
+    @property
+    def shop(self):
+        return self.header.get('shop')
+
+    @property
+    def categories(self):
+        return self.header.get('categories') or []
+
+    def goods(self):
+        try:
+            if self._has_goods:
+                while not self.loader.check_event(SequenceEndEvent):
+                    yield self._construct()
+                self.loader.get_event()
+                self._read_keys()
+        finally:
+            self.loader.dispose()
+
+    def _read_header(self):
+        self._expect(StreamStartEvent)
+        self._expect(DocumentStartEvent)
+        self._expect(MappingStartEvent)
+        return self._read_keys()
+
+    def _read_keys(self):
+        """Читает пары ключ-значение до goods или до конца документа"""
+        while not self.loader.check_event(MappingEndEvent):
+            key = self._construct()
+            if key == 'goods' and self.loader.check_event(SequenceStartEvent):
+                missing = {'shop', 'categories'} - self.header.keys()
+                if missing:
+                    raise ValueError(
+                        'Неверный формат прайса: ключи '
+                        f'{", ".join(sorted(missing))} должны идти до goods'
+                        )
+                self.loader.get_event()
+                return True
+            self.header[key] = self._construct()
+        return False
+
+    def _expect(self, event_class):
+        event = self.loader.get_event()
+        if not isinstance(event, event_class):
+            raise ValueError(f'Неверный формат прайса: {event}')
+        return event
+
+    def _construct(self):
+        return self.loader.construct_document(self._compose())
+
+    def _compose(self):
+        """Собирает узел YAML из событий парсера"""
+        event = self.loader.get_event()
+        if isinstance(event, AliasEvent):
+            return self._anchors[event.anchor]
+        if isinstance(event, ScalarEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self.loader.resolve(ScalarNode, event.value, event.implicit)
+            node = ScalarNode(tag, event.value, event.start_mark,
+                              event.end_mark, style=event.style)
+        elif isinstance(event, SequenceStartEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self.loader.resolve(SequenceNode, None, event.implicit)
+            node = SequenceNode(tag, [], event.start_mark, None,
+                                flow_style=event.flow_style)
+            while not self.loader.check_event(SequenceEndEvent):
+                node.value.append(self._compose())
+            node.end_mark = self.loader.get_event().end_mark
+        elif isinstance(event, MappingStartEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self.loader.resolve(MappingNode, None, event.implicit)
+            node = MappingNode(tag, [], event.start_mark, None,
+                               flow_style=event.flow_style)
+            while not self.loader.check_event(MappingEndEvent):
+                key = self._compose()
+                node.value.append((key, self._compose()))
+            node.end_mark = self.loader.get_event().end_mark
+        else:
+            raise ValueError(f'Неверный формат прайса: {event}')
+        if getattr(event, 'anchor', None) is not None:
+            self._anchors[event.anchor] = node
+        return node
@@ -0,0 +1,279 @@
+import csv
+import io
+import json
+import time
+from django.db import connection, transaction
+from .cards import refresh_cards
+from .catalog_cache import bump_catalog_version
+from .importer import CatalogImporter, QueryCounter, REPLACE, DELTA
+from .models import ProductInfo, Product, Parameter, ProductParameter, Shop
+
+
+
+"""Файловый объект для COPY ... FROM STDIN, читающий товары из генератора.
+
+Каждый товар превращается в строку CSV, параметры - в JSON со
+значениями-строками, как их записывает CatalogImporter.
+"""
+class GoodsReader:
+
+    def __init__(self, goods, on_batch=None, batch_size=1000):
+        self.goods = enumerate(goods)
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.rows = 0
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+        self.pending = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.pending) < size:
+            if not self.fill():
+                break
+        if size < 0:
+            size = len(self.pending)
+        chunk, self.pending = self.pending[:size], self.pending[size:]
+        return chunk
+
+    readline = read
+
+    def fill(self):
+        for line, item in self.goods:
+            self.writer.writerow((
+                line,
+                item['id'],
+                item['category'],
+                item['name'],
+                item['model'],
+                item['quantity'],
+                item['price'],
+                item['price_rrc'],
+                json.dumps({name: str(value) for name, value
+                            in item.get('parameters', {}).items()},
+                           ensure_ascii=False)
+                ))
+            self.rows += 1
+            if self.rows % self.batch_size == 0:
+                break
+        else:
+            if not self.buffer.tell():
+                return False
+        self.pending += self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        if self.on_batch is not None:
+            self.on_batch(self.rows)
+        return True
+
+
+
+"""Загрузка прайса через COPY во временную таблицу PostgreSQL.
+
+Товары потоком попадают в import_offer, затем категории, продукты,
+параметры, ProductInfo и ProductParameter сливаются в каталог
+множественными INSERT ... ON CONFLICT / UPDATE. Режимы REPLACE и DELTA
+ведут себя так же, как в CatalogImporter.
+"""
+class CopyLoader(CatalogImporter):
+
+    def run(self, categories, goods):
+        start = time.perf_counter()
+        tables = {
+            'product': Product._meta.db_table,
+            'parameter': Parameter._meta.db_table,
+            'product_info': ProductInfo._meta.db_table,
+            'product_parameter': ProductParameter._meta.db_table,
+            }
+        with QueryCounter() as counter, transaction.atomic(), \
+                connection.cursor() as cursor:
+            self.import_categories(categories)
+            if self.mode == REPLACE:
+                ProductInfo.objects.filter(shop=self.shop).delete()
+            self.copy_goods(cursor, goods, start)
+            self.merge(cursor, tables)
+            self.refresh_cards(cursor)
+            self.refresh_summaries()
+            bump_catalog_version(Shop.objects.filter(pk=self.shop.pk))
+        # COPY идёт мимо execute_wrapper
+        self.stats.queries = counter.count + 1
+        self.stats.duration = time.perf_counter() - start
+        return self.stats
+
+    def copy_goods(self, cursor, goods, start):
+        cursor.execute('''
+            CREATE TEMPORARY TABLE import_offer (
+                line bigint,
+                external_id bigint,
+                category_id integer,
+                name varchar(100),
+                model varchar(100),
+                quantity integer,
+                price integer,
+                price_rrc integer,
+                parameters jsonb,
+                product_id integer
+            ) ON COMMIT DROP
+            ''')
+        cursor.execute('''
+            CREATE TEMPORARY TABLE import_changed (id integer) ON COMMIT DROP
+            ''')
+        cursor.execute('''
+            CREATE TEMPORARY TABLE import_created (id integer) ON COMMIT DROP
+            ''')
+
+        def report(rows):
+            if self.progress is not None:
+                self.stats.rows = rows
+                self.stats.duration = time.perf_counter() - start
+                self.progress(self.stats)
+
+        reader = GoodsReader(goods, report, self.batch_size)
+        cursor.copy_expert(
+            'COPY import_offer (line, external_id, category_id, name, model, '
+            'quantity, price, price_rrc, parameters) FROM STDIN WITH CSV',
+            reader
+            )
+        # при повторе внешнего ключа побеждает последняя строка прайса
+        cursor.execute('''
+            DELETE FROM import_offer a USING import_offer b
+            WHERE a.external_id = b.external_id AND a.line < b.line
+            ''')
+        self.stats.rows = reader.rows - cursor.rowcount
+        cursor.execute('ANALYZE import_offer')
+
+    def merge(self, cursor, tables):
+        shop_id = self.shop.id
+        cursor.execute('''
+            INSERT INTO {product} (name, category_id)
+            SELECT DISTINCT s.name, s.category_id FROM import_offer s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {product} p
+                WHERE p.name = s.name AND p.category_id = s.category_id
+            )
+            ON CONFLICT DO NOTHING
+            '''.format(**tables))
+        cursor.execute('''
+            UPDATE import_offer s SET product_id = p.id
+            FROM (
+                SELECT name, category_id, min(id) AS id FROM {product}
+                WHERE (name, category_id) IN (
+                    SELECT name, category_id FROM import_offer
+                )
+                GROUP BY name, category_id
+            ) p
+            WHERE p.name = s.name AND p.category_id = s.category_id
+            '''.format(**tables))
+        cursor.execute('''
+            INSERT INTO {parameter} (name)
+            SELECT DISTINCT v.key
+            FROM import_offer s, jsonb_each_text(s.parameters) v
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {parameter} p WHERE p.name = v.key
+            )
+            ON CONFLICT DO NOTHING
+            '''.format(**tables))
+
+        cursor.execute('''
+            WITH changed AS (
+                UPDATE {product_info} i SET
+                    product_id = s.product_id,
+                    model = s.model,
+                    quantity = s.quantity,
+                    price = s.price,
+                    price_rrc = s.price_rrc
+                FROM import_offer s
+                WHERE i.shop_id = %s AND i.external_id = s.external_id
+                AND (i.product_id, i.model, i.quantity, i.price, i.price_rrc)
+                    IS DISTINCT FROM
+                    (s.product_id, s.model, s.quantity, s.price, s.price_rrc)
+                RETURNING i.id
+            )
+            INSERT INTO import_changed SELECT id FROM changed
+            '''.format(**tables), [shop_id])
+        cursor.execute('''
+            WITH created AS (
+                INSERT INTO {product_info} (external_id, model, shop_id,
+                    product_id, quantity, price, price_rrc)
+                SELECT s.external_id, s.model, %s, s.product_id,
+                    s.quantity, s.price, s.price_rrc
+                FROM import_offer s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {product_info} i
+                    WHERE i.shop_id = %s AND i.external_id = s.external_id
+                )
+                ON CONFLICT (product_id, shop_id, external_id) DO NOTHING
+                RETURNING id
+            )
+            INSERT INTO import_created SELECT id FROM created
+            '''.format(**tables), [shop_id, shop_id])
+        self.stats.created = cursor.rowcount
+
+        cursor.execute('''
+            CREATE TEMPORARY TABLE import_value ON COMMIT DROP AS
+            SELECT i.id AS product_info_id, p.id AS parameter_id, v.value
+            FROM import_offer s
+            JOIN {product_info} i
+                ON i.shop_id = %s AND i.external_id = s.external_id
+            CROSS JOIN jsonb_each_text(s.parameters) v
+            JOIN (
+                SELECT name, min(id) AS id FROM {parameter} GROUP BY name
+            ) p ON p.name = v.key
+            '''.format(**tables), [shop_id])
+        cursor.execute('''
+            WITH changed AS (
+                INSERT INTO {product_parameter}
+                    (product_info_id, parameter_id, value)
+                SELECT product_info_id, parameter_id, value FROM import_value
+                ON CONFLICT (product_info_id, parameter_id) DO UPDATE
+                SET value = EXCLUDED.value
+                WHERE {product_parameter}.value IS DISTINCT FROM EXCLUDED.value
+                RETURNING product_info_id
+            )
+            INSERT INTO import_changed SELECT product_info_id FROM changed
+            '''.format(**tables))
+        self.stats.parameters = cursor.rowcount
+        cursor.execute('''
+            WITH removed AS (
+                DELETE FROM {product_parameter} pp
+                USING (SELECT DISTINCT product_info_id FROM import_value) t
+                WHERE pp.product_info_id = t.product_info_id
+                AND NOT EXISTS (
+                    SELECT 1 FROM import_value v
+                    WHERE v.product_info_id = pp.product_info_id
+                    AND v.parameter_id = pp.parameter_id
+                )
+                RETURNING pp.product_info_id
+            )
+            INSERT INTO import_changed SELECT product_info_id FROM removed
+            '''.format(**tables))
+        self.stats.parameters += cursor.rowcount
+        cursor.execute('''
+            SELECT count(DISTINCT id) FROM import_changed
+            WHERE id NOT IN (SELECT id FROM import_created)
+            ''')
+        self.stats.updated = cursor.fetchone()[0]
+        self.stats.unchanged = \
+            self.stats.rows - self.stats.created - self.stats.updated
+
+        if self.mode == DELTA:
+            cursor.execute('''
+                WITH retired AS (
+                    UPDATE {product_info} i SET quantity = 0
+                    WHERE i.shop_id = %s AND i.quantity > 0
+                    AND NOT EXISTS (
+                        SELECT 1 FROM import_offer s
+                        WHERE s.external_id = i.external_id
+                    )
+                    RETURNING i.id
+                )
+                INSERT INTO import_changed SELECT id FROM retired
+                '''.format(**tables), [shop_id])
+            self.stats.retired = cursor.rowcount
+
+    def refresh_cards(self, cursor):
+        """Пересобирает карточки созданных, изменённых и снятых
+        с продажи предложений"""
+        cursor.execute('''
+            SELECT id FROM import_changed UNION SELECT id FROM import_created
+            ''')
+        refresh_cards(row[0] for row in cursor.fetchall())
@@ -0,0 +1,89 @@
+"""Расчёт корзины: цены позиций, суммы и доставка по магазинам.
+
+Позиции корзины читаются одним запросом, дальше только арифметика.
+Доставка считается по тарифу от расстояния до магазина позиции
+(Shop.distance) с коэффициентом скидки покупателя:
+    до 50 км        - 500 / 100 * discount_factor
+    от 50 до 300 км - distance / 11 * discount_factor
+    дальше 300 км   - distance / 10.5 * discount_factor
+за единицу товара с множителем 0.4. Суммы доставки округляются
+до копеек.
+"""
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from .models import OrderItem
+
+
+BASE_DELIVERY = 500
+NEAR_DISTANCE = 50
+FAR_DISTANCE = 300
+DELIVERY_SHARE = 0.4
+
+
+
+def delivery_rate(distance, discount_factor):
+    """Стоимость доставки единицы товара из магазина"""
+    if distance <= NEAR_DISTANCE:
+        rate = BASE_DELIVERY / 100
+    elif distance <= FAR_DISTANCE:
+        rate = distance / 11
+    else:
+        rate = distance / 10.5
+    return rate * discount_factor * DELIVERY_SHARE
+
+
+
+def order_lines(items):
+    """Строки позиций для price_lines: зафиксированная цена позиции,
+    а пока её нет - текущая цена предложения"""
+    return items.values(
+        'id', 'order', 'product_info', 'quantity', 'shop',
+        unit_price=Coalesce('price', 'product_info__price'),
+        shop_name=F('shop__name'),
+        distance=F('shop__distance')
+        ).order_by('shop_id', 'id')
+
+
+
+def basket_lines(user_id, status='basket'):
+    """Позиции заказов пользователя в статусе status одним запросом"""
+    return order_lines(OrderItem.objects.filter(
+        order__user=user_id,
+        order__status=status
+        ))
+
+
+
+def price_lines(lines, discount_factor):
+    """Суммы по позициям, магазинам и итог для строк basket_lines"""
+    shops = {}
+    priced = []
+    for line in lines:
+        line = dict(line, total=line['unit_price'] * line['quantity'])
+        priced.append(line)
+        shop = shops.setdefault(line['shop'], {
+            'shop': line['shop'],
+            'name': line['shop_name'],
+            'distance': line['distance'],
+            'quantity': 0,
+            'subtotal': 0,
+            })
+        shop['quantity'] += line['quantity']
+        shop['subtotal'] += line['total']
+    for shop in shops.values():
+        shop['delivery'] = round(
+            delivery_rate(shop['distance'], discount_factor)
+            * shop['quantity'], 2
+            )
+    subtotal = sum(shop['subtotal'] for shop in shops.values())
+    delivery = round(sum(shop['delivery'] for shop in shops.values()), 2)
+    return {'lines': priced,
+            'shops': list(shops.values()),
+            'subtotal': subtotal,
+            'delivery': delivery,
+            'total': round(subtotal + delivery, 2)}
+
+
+
+def price_basket(user, status='basket'):
+    return price_lines(basket_lines(user.id, status), user.discount_factor)
@@ -0,0 +1,119 @@
+from django.db import connection
+from django.db.models import Count, Min, Max, Exists, OuterRef
+from .models import Category, CategorySummary, ProductInfo, Product, \
+    ProductParameter, ProductFacet, FacetCount
+
+
+
+def refresh_category_summaries(category_ids=None):
+    """Пересчитывает сводки категорий: товары, предложения и магазины
+    в наличии, минимальная и максимальная цена.
+
+    Вызывается импортом для категорий магазина; без category_ids
+    пересчитываются все категории. Строки обновляются на месте одним
+    INSERT ... ON CONFLICT, поэтому параллельные импорты с общими
+    категориями не падают на дубликате ключа.
+    """
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(id__in=category_ids)
+    category_ids = list(categories.values_list('id', flat=True))
+    aggregates = {
+        row['product__category']: row
+        for row in ProductInfo.objects.filter(
+            product__category__in=category_ids,
+            quantity__gt=0
+            ).values('product__category').annotate(
+                products=Count('product', distinct=True),
+                offers=Count('id'),
+                shops=Count('shop', distinct=True),
+                min_price=Min('price'),
+                max_price=Max('price')
+                ).order_by()
+        }
+    summaries = []
+    for category_id in category_ids:
+        row = aggregates.get(category_id, {})
+        summaries.append(CategorySummary(
+            category_id=category_id,
+            products=row.get('products', 0),
+            offers=row.get('offers', 0),
+            shops=row.get('shops', 0),
+            min_price=row.get('min_price'),
+            max_price=row.get('max_price')
+            ))
+    CategorySummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['category_id'],
+        update_fields=['products', 'offers', 'shops', 'min_price',
+                       'max_price', 'updated_at']
+        )
+
+
+
+def refresh_facets(category_ids=None):
+    """Пересобирает списки товаров по значениям параметров и их счётчики
+    для товаров категорий.
+
+    В списки попадают все товары с этим значением, in_stock отмечает
+    товары с предложениями в наличии; счётчики считаются только по ним.
+    Списки правятся разницей: лишние строки удаляются, недостающие
+    добавляются, у существующих обновляется только in_stock, поэтому
+    параллельные импорты магазинов с общими категориями не конфликтуют.
+    """
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(id__in=category_ids)
+    category_ids = list(categories.values_list('id', flat=True))
+    if not category_ids:
+        return
+    postings = ProductFacet.objects.filter(product__category__in=category_ids)
+    postings.exclude(Exists(ProductParameter.objects.filter(
+        product_info__product=OuterRef('product'),
+        parameter=OuterRef('parameter'),
+        value=OuterRef('value')
+        ))).delete()
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            INSERT INTO {product_facet}
+                (parameter_id, value, product_id, in_stock)
+            SELECT pp.parameter_id, pp.value, i.product_id,
+                MAX(CASE WHEN i.quantity > 0 THEN 1 ELSE 0 END) = 1
+            FROM {product_parameter} pp
+            JOIN {product_info} i ON i.id = pp.product_info_id
+            JOIN {product} p ON p.id = i.product_id
+            WHERE p.category_id IN ({categories})
+            GROUP BY pp.parameter_id, pp.value, i.product_id
+            ON CONFLICT (parameter_id, value, product_id) DO UPDATE
+            SET in_stock = EXCLUDED.in_stock
+            WHERE {product_facet}.in_stock <> EXCLUDED.in_stock
+            '''.format(
+                product_facet=ProductFacet._meta.db_table,
+                product_parameter=ProductParameter._meta.db_table,
+                product_info=ProductInfo._meta.db_table,
+                product=Product._meta.db_table,
+                categories=', '.join(['%s'] * len(category_ids))
+                ), category_ids)
+
+    in_stock = postings.filter(in_stock=True)
+    counts = [FacetCount(category_id=row['product__category'],
+                         parameter_id=row['parameter'],
+                         value=row['value'],
+                         products=row['products'])
+              for row in in_stock.values(
+                  'product__category', 'parameter', 'value'
+                  ).annotate(products=Count('id')).order_by()]
+    FacetCount.objects.bulk_create(
+        counts,
+        update_conflicts=True,
+        unique_fields=['category_id', 'parameter_id', 'value'],
+        update_fields=['products']
+        )
+    FacetCount.objects.filter(category__in=category_ids).exclude(
+        Exists(in_stock.filter(
+            product__category=OuterRef('category'),
+            parameter=OuterRef('parameter'),
+            value=OuterRef('value')
+            ))
+        ).delete()
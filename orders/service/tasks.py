@@ -1,73 +1,186 @@
-from idlelib.searchengine import get
-from django.core.validators import URLValidator
-from django.http import JsonResponse
-from rest_framework.exceptions import ValidationError
-from yaml import load, Loader
-from .models import ProductInfo, Product, Parameter, ProductParameter, Category, Shop
-from celery import shared_task
+import time
+from tempfile import TemporaryFile
+from django.core.cache import cache
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from .exporters import write_artifact, artifact_name
+from .importer import import_price_list, fetch_price_list, get_shop, \
+    record_import, stage_goods, CatalogImporter
+from .models import ImportJob, StagedOffer, StagedParameter, Shop, \
+    ExportArtifact
+from .parser import PriceList
+from celery import shared_task, chord
+
+
+# прогресс хранится в кеше: строка ImportJob заблокирована транзакцией
+# импорта, а опрос состояния не должен ходить в базу на каждый пакет
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+
+
+def report_progress(job, stats, fraction):
+    """Пишет прогресс задачи импорта в кеш после очередного пакета"""
+    cache.set(job.progress_key, {
+        'state': 'running',
+        'progress': round(min(fraction, 1) * 100, 1),
+        'rows': stats.rows,
+        'rows_per_second': round(stats.rows_per_second, 1),
+        }, PROGRESS_TIMEOUT)
+
+
+
+def finish_job(job, history=None, error=None):
+    if error is None:
+        job.state = 'done'
+        job.progress = 100
+        job.history = history
+        job.rows = history.rows
+        if history.duration:
+            job.rows_per_second = round(history.rows / history.duration, 1)
+    else:
+        job.state = 'failed'
+        job.errors = [str(error)]
+    job.finished_at = timezone.now()
+    job.save()
+    cache.delete(job.progress_key)
+    return {'Status': job.state == 'done', 'Job': job.id}
 
 
 @shared_task()
-def update_price(request, *args, **kwargs):
-    if not request.user.is_authenticated:
-        return JsonResponse(
-            {'Status': False, 'Error': 'Нужна авторизация'},
-            status=403
+def update_price(job_id):
+    job = ImportJob.objects.get(pk=job_id)
+    job.state = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['state', 'started_at'])
+    try:
+        if job.chunk_size:
+            return dispatch_chunks(job)
+        history = import_price_list(
+            job.user_id,
+            job.url,
+            mode=job.mode,
+            progress=lambda stats, fraction: report_progress(job, stats,
+                                                             fraction),
+            loader=job.loader
+            )
+    except Exception as e:
+        return finish_job(job, error=e)
+    return finish_job(job, history)
+
+
+@shared_task()
+def export_data(artifact_id):
+    """Пишет каталог магазина или заказы за период в сжатый файл.
+
+    Файл собирается во временном файле и сохраняется в хранилище
+    (MEDIA_ROOT/exports), в запись выгрузки попадают размер и число
+    выгруженных записей.
+    """
+    artifact = ExportArtifact.objects.select_related('shop').get(
+        pk=artifact_id
         )
+    artifact.state = 'running'
+    artifact.save(update_fields=['state'])
+    try:
+        with TemporaryFile() as stream:
+            artifact.rows = write_artifact(artifact, stream)
+            artifact.size = stream.tell()
+            stream.seek(0)
+            artifact.file.save(artifact_name(artifact), File(stream),
+                               save=False)
+        artifact.state = 'done'
+    except Exception as e:
+        artifact.state = 'failed'
+        artifact.errors = [str(e)]
+    artifact.finished_at = timezone.now()
+    artifact.save()
+    return {'Status': artifact.state == 'done', 'Export': artifact.id}
+
 
-    if request.user.type != 'shop':
-        return JsonResponse(
-            {'Status': False, 'Error': 'Только для магазинов'},
-            status=403
+
+def dispatch_chunks(job):
+    """Делит прайс на части и запускает их импорт группой задач.
+
+    Прайс читается потоком и складывается в StagedOffer, задачам частей
+    передаются только диапазоны номеров строк. Категории создаются здесь,
+    продукты и параметры каждая часть разрешает сама. Финальная задача
+    finish_import сливает промежуточные таблицы в каталог одной
+    транзакцией. Если прайс не дочитан или группу не удалось
+    поставить в очередь, промежуточные строки задачи удаляются.
+    """
+    start = time.perf_counter()
+    shop, fetched, history = fetch_price_list(job.user_id, job.url, start)
+    if fetched is None:
+        return finish_job(job, history)
+    try:
+        with fetched:
+            price_list = PriceList(fetched.stream)
+            shop = get_shop(job.user_id, shop, price_list.shop)
+            CatalogImporter(shop).import_categories(price_list.categories)
+            total = stage_goods(job.id, price_list.goods())
+        starts = range(0, total, job.chunk_size)
+        chord(
+            [import_chunk.s(job.id, shop.id, first, first + job.chunk_size,
+                            total)
+             for first in starts]
+            )(finish_import.s(job.id, shop.id, fetched.source).on_error(
+                fail_import.s(job.id)
+                ))
+    except Exception:
+        # пакеты уже закоммичены, а номер задачи больше не используется
+        clear_staged(job.id)
+        raise
+    return {'Status': True, 'Job': job.id, 'Chunks': len(starts)}
+
+
+@shared_task(autoretry_for=(Exception,), max_retries=3, retry_backoff=True)
+def import_chunk(job_id, shop_id, start, stop, total):
+    """Разрешает ключи строк StagedOffer с номерами [start, stop).
+
+    Части не блокируют друг друга: продукты и параметры создаются по
+    уникальному ключу с пропуском конфликтов. Повторный запуск той же
+    части ничего не дублирует.
+    """
+    shop = Shop.objects.get(pk=shop_id)
+    rows = CatalogImporter(shop).resolve_staged(job_id, start, stop)
+    resolved = StagedOffer.objects.filter(
+        job_id=job_id,
+        product_id__isnull=False
+        ).count()
+    ImportJob.objects.filter(pk=job_id, rows__lt=resolved).update(
+        rows=resolved,
+        progress=round(resolved * 100 / (total or 1), 1)
         )
+    return rows
+
+
 
-    url = request.data.get('url')
-    if url:
-        validate_url = URLValidator()
-        try:
-            validate_url(url)
-        except ValidationError as e:
-            return JsonResponse({'Status': False, 'Error': str(e)})
-        else:
-            stream = get(url).content
-            data = load(stream, Loader=Loader)
-            shop, _ = Shop.objects.get_or_create(
-                name=data['shop'],
-                user=request.user.id
+def clear_staged(job_id):
+    StagedParameter.objects.filter(job_id=job_id).delete()
+    StagedOffer.objects.filter(job_id=job_id).delete()
+
+
+@shared_task()
+def finish_import(results, job_id, shop_id, source):
+    """Сливает все части прайса в каталог магазина одной транзакцией"""
+    job = ImportJob.objects.get(pk=job_id)
+    shop = Shop.objects.get(pk=shop_id)
+    with transaction.atomic():
+        stats = CatalogImporter(shop, mode=job.mode).merge_staged(job_id)
+        history = record_import(
+            shop,
+            job.url,
+            source,
+            stats,
+            (timezone.now() - job.started_at).total_seconds()
             )
-            for category in data['categories']:
-                category_object, _ = Category.objects.get_or_create(
-                    id=category['id'],
-                    name=category['name']
-                )
-                category_object.shops.add(shop.id)
-                category_object.save()
-
-            ProductInfo.objects.filter(shop=shop.id).delete()
-            for item in data['goods']:
-                product, _ = Product.objects.get_or_create(
-                    name=item['name'],
-                    category=item['category']
-                )
-                product_info = ProductInfo.objects.create(
-                    external_id=item['id'],
-                    model=item['model'],
-                    shop=shop.id,
-                    product=product.id,
-                    quantity=item['quantity'],
-                    price=item['price'],
-                    price_rrc=item['price_rrc']
-                )
-                for name, value in item['parameters'].items():
-                    parameter_object, _ = Parameter.objects.get_or_create(name=name)
-                    ProductParameter.objects.create(
-                        product_info=product_info.id,
-                        parameter=parameter_object.id,
-                        value=value
-                    )
-            return JsonResponse({'Status': True})
-
-    return JsonResponse(
-        {'Status': False,
-         'Errors': 'Не указаны все необходимые аргументы'}
-    )
+        clear_staged(job_id)
+    return finish_job(job, history)
+
+
+@shared_task()
+def fail_import(request, exc, traceback, job_id):
+    job = ImportJob.objects.get(pk=job_id)
+    clear_staged(job_id)
+    return finish_job(job, error=exc)
@@ -1,14 +1,352 @@
+import os
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse
+from django.urls import reverse
+from django.utils.dateparse import parse_date
 from rest_framework.views import APIView
-from .tasks import update_price
+from .catalog_cache import cache_stats
+from .exporters import export_catalog, catalog_key, EXPORT_FORMATS, \
+    ORDER_EXPORT_FORMATS, COMPRESSIONS
+from .importer import DELTA, IMPORT_MODES, ORM, LOADERS
+from .models import ImportJob, Shop, ExportArtifact
+from .tasks import update_price, export_data
 
 
 """Класс для обновления прайса от поставщика"""
 class PartnerUpdate(APIView):
 
     def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Нужна авторизация'},
+                status=403
+                )
 
-        update_price.delay(request, *args, **kwargs)
+        if request.user.type != 'shop':
+            return JsonResponse(
+                {'Status': False, 'Error': 'Только для магазинов'},
+                status=403
+                )
 
+        mode = request.data.get('mode', DELTA)
+        if mode not in IMPORT_MODES:
+            return JsonResponse(
+                {'Status': False,
+                 'Error': f'Неизвестный режим импорта: {mode}'},
+                status=400
+                )
 
+        loader = request.data.get('loader', ORM)
+        if loader not in LOADERS:
+            return JsonResponse(
+                {'Status': False,
+                 'Error': f'Неизвестный загрузчик: {loader}'},
+                status=400
+                )
 
+        url = request.data.get('url')
+        if not url:
+            return JsonResponse(
+                {'Status': False,
+                 'Errors': 'Не указаны все необходимые аргументы'},
+                status=400
+                )
+        validate_url = URLValidator()
+        try:
+            validate_url(url)
+        except ValidationError as e:
+            return JsonResponse({'Status': False, 'Error': str(e)}, status=400)
 
+        chunk_size = request.data.get('chunk_size')
+        if chunk_size is not None:
+            try:
+                chunk_size = int(chunk_size)
+            except (TypeError, ValueError):
+                chunk_size = 0
+            if chunk_size <= 0:
+                return JsonResponse(
+                    {'Status': False,
+                     'Error': 'Размер части должен быть целым числом больше 0'},
+                    status=400
+                    )
+
+        job = ImportJob.objects.create(
+            user=request.user,
+            url=url,
+            mode=mode,
+            loader=loader,
+            chunk_size=chunk_size
+            )
+        transaction.on_commit(lambda: update_price.delay(job.id))
+        return JsonResponse({'Status': True, 'Job': job.id}, status=202)
+
+
+
+"""Состояние задачи импорта прайса"""
+class PartnerUpdateStatus(APIView):
+
+    def get(self, request, pk, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Нужна авторизация'},
+                status=403
+                )
+        job = ImportJob.objects.filter(pk=pk, user=request.user.id).first()
+        if job is None:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Задача не найдена'},
+                status=404
+                )
+        state = {
+            'state': job.state,
+            'progress': job.progress,
+            'rows': job.rows,
+            'rows_per_second': job.rows_per_second,
+            }
+        if job.state == 'running':
+            state.update(cache.get(job.progress_key) or {})
+        return JsonResponse({
+            'Status': True,
+            'Job': job.id,
+            **state,
+            'errors': job.errors,
+            'result': job.history.status if job.history_id else None,
+            })
+
+
+
+def get_export_shop(request, params):
+    """Магазин для выгрузки: свой для поставщика, любой для персонала.
+
+    Возвращает пару (магазин, ответ с ошибкой).
+    """
+    if request.user.is_staff and params.get('shop'):
+        if not str(params['shop']).isdigit():
+            return None, JsonResponse(
+                {'Status': False, 'Errors': 'Неверный магазин'},
+                status=400
+                )
+        return Shop.objects.filter(pk=params['shop']).first(), None
+    if request.user.type == 'shop':
+        return Shop.objects.filter(user=request.user.id).first(), None
+    if request.user.is_staff:
+        return None, None
+    return None, JsonResponse(
+        {'Status': False, 'Error': 'Только для магазинов'},
+        status=403
+        )
+
+
+
+"""Потоковая выгрузка каталога магазина (yaml, csv, jsonl)"""
+class PartnerExport(APIView):
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Нужна авторизация'},
+                status=403
+                )
+
+        export_format = request.query_params.get('type', 'yaml')
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse(
+                {'Status': False,
+                 'Error': f'Неизвестный формат выгрузки: {export_format}'},
+                status=400
+                )
+
+        shop, error = get_export_shop(request, request.query_params)
+        if error is not None:
+            return error
+        if shop is None:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Магазин не найден'},
+                status=404
+                )
+
+        _, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            export_catalog(shop, export_format),
+            content_type=f'{content_type}; charset=utf-8'
+            )
+        response['Content-Disposition'] = \
+            f'attachment; filename="shop{shop.id}.{export_format}"'
+        return response
+
+
+
+"""Фоновая выгрузка каталога или заказов за период в сжатый файл.
+
+Повторный запрос неизменившегося каталога возвращает уже готовый
+(или ещё собирающийся) файл вместо новой выгрузки.
+"""
+class PartnerExportJob(APIView):
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Нужна авторизация'},
+                status=403
+                )
+
+        kind = request.data.get('kind', 'catalog')
+        formats = {'catalog': EXPORT_FORMATS,
+                   'orders': ORDER_EXPORT_FORMATS}.get(kind)
+        if formats is None:
+            return JsonResponse(
+                {'Status': False,
+                 'Error': f'Неизвестный вид выгрузки: {kind}'},
+                status=400
+                )
+        export_format = request.data.get('type', 'jsonl')
+        if export_format not in formats:
+            return JsonResponse(
+                {'Status': False,
+                 'Error': f'Неизвестный формат выгрузки: {export_format}'},
+                status=400
+                )
+        compression = request.data.get('compression', 'gzip')
+        if compression not in COMPRESSIONS:
+            return JsonResponse(
+                {'Status': False,
+                 'Error': f'Сжатие недоступно: {compression}'},
+                status=400
+                )
+
+        shop, error = get_export_shop(request, request.data)
+        if error is not None:
+            return error
+        # без магазина персонал выгружает заказы всех магазинов
+        if shop is None and (kind == 'catalog' or not request.user.is_staff
+                             or request.data.get('shop')):
+            return JsonResponse(
+                {'Status': False, 'Error': 'Магазин не найден'},
+                status=404
+                )
+
+        dates = {}
+        for field in ('date_from', 'date_to'):
+            value = request.data.get(field)
+            if kind == 'orders' and value:
+                try:
+                    dates[field] = parse_date(value)
+                except ValueError:
+                    dates[field] = None
+                if dates[field] is None:
+                    return JsonResponse(
+                        {'Status': False,
+                         'Error': f'Неверная дата в {field}: {value}'},
+                        status=400
+                        )
+
+        key = catalog_key(shop, export_format, compression) \
+            if kind == 'catalog' else ''
+        if key:
+            existing = ExportArtifact.objects.filter(key=key).exclude(
+                state='failed'
+                ).first()
+            if existing is not None and (
+                    existing.state != 'done'
+                    or existing.file.storage.exists(existing.file.name)):
+                return JsonResponse({'Status': True, 'Export': existing.id})
+
+        artifact = ExportArtifact.objects.create(
+            user=request.user,
+            shop=shop,
+            kind=kind,
+            export_format=export_format,
+            compression=compression,
+            key=key,
+            **dates
+            )
+        transaction.on_commit(lambda: export_data.delay(artifact.id))
+        return JsonResponse({'Status': True, 'Export': artifact.id},
+                            status=202)
+
+
+
+def get_artifact(request, pk):
+    """Выгрузка, доступная пользователю: своя, своего магазина или любая
+    для персонала"""
+    artifacts = ExportArtifact.objects.filter(pk=pk)
+    if not request.user.is_staff:
+        artifacts = artifacts.filter(
+            Q(user=request.user.id) | Q(shop__user=request.user.id)
+            )
+    return artifacts.first()
+
+
+
+"""Состояние фоновой выгрузки и ссылка на файл после завершения"""
+class PartnerExportStatus(APIView):
+
+    def get(self, request, pk, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Нужна авторизация'},
+                status=403
+                )
+        artifact = get_artifact(request, pk)
+        if artifact is None:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Выгрузка не найдена'},
+                status=404
+                )
+        url = None
+        if artifact.state == 'done':
+            url = request.build_absolute_uri(
+                reverse('export_download', args=[artifact.id])
+                )
+        return JsonResponse({
+            'Status': True,
+            'Export': artifact.id,
+            'state': artifact.state,
+            'kind': artifact.kind,
+            'type': artifact.export_format,
+            'compression': artifact.compression,
+            'size': artifact.size,
+            'rows': artifact.rows,
+            'errors': artifact.errors,
+            'url': url,
+            })
+
+
+
+"""Скачивание готового файла выгрузки"""
+class PartnerExportDownload(APIView):
+
+    def get(self, request, pk, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Нужна авторизация'},
+                status=403
+                )
+        artifact = get_artifact(request, pk)
+        if artifact is None or artifact.state != 'done':
+            return JsonResponse(
+                {'Status': False, 'Error': 'Выгрузка не найдена'},
+                status=404
+                )
+        return FileResponse(
+            artifact.file.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(artifact.file.name)
+            )
+
+
+
+"""Счётчики попаданий и промахов кеша каталога (только для персонала)"""
+class CatalogCacheStats(APIView):
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated or not request.user.is_staff:
+            return JsonResponse(
+                {'Status': False, 'Error': 'Только для персонала'},
+                status=403
+                )
+        return JsonResponse({'Status': True, **cache_stats()})
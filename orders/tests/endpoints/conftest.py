@@ -0,0 +1,100 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from service.models import Category, Product, Shop, ProductInfo, \
+    Parameter, ProductParameter, Order, OrderItem, User
+from service.order_totals import refresh_order_totals
+
+
+@pytest.fixture
+def buyer():
+    return User.objects.create_user('buyer@mail.ru', 'Pass1234',
+                                    is_active=True)
+
+@pytest.fixture
+def make_catalog():
+    """Добавляет в каталог count товаров с двумя параметрами в двух
+    магазинах"""
+    counter = {'rows': 0}
+
+    def make(count):
+        shops = [Shop.objects.get_or_create(name=f'Магазин {number}',
+                                            defaults={'distance': 10})[0]
+                 for number in (1, 2)]
+        parameters = [Parameter.objects.get_or_create(name=name)[0]
+                      for name in ('Цвет', 'Память')]
+        infos = []
+        for _ in range(count):
+            counter['rows'] += 1
+            row = counter['rows']
+            category, _ = Category.objects.get_or_create(
+                id=row % 3 + 1,
+                defaults={'name': f'Категория {row % 3 + 1}'}
+                )
+            product = Product.objects.create(name=f'Товар {row}',
+                                             category=category)
+            for shop in shops:
+                info = ProductInfo.objects.create(
+                    external_id=row, model=f'model/{row}', shop=shop,
+                    product=product, quantity=10, price=100 + row,
+                    price_rrc=120 + row
+                    )
+                ProductParameter.objects.bulk_create([
+                    ProductParameter(product_info=info, parameter=parameter,
+                                     value=str(row))
+                    for parameter in parameters
+                    ])
+                infos.append(info)
+        return infos
+
+    return make
+
+@pytest.fixture
+def add_items(make_catalog):
+    """Добавляет в заказ count позиций по 2 штуки"""
+
+    def add(order, count):
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_info=info, shop=info.shop,
+                      quantity=2)
+            for info in make_catalog(count)[::2]
+            ])
+        # bulk_create идёт мимо сигналов
+        refresh_order_totals([order.id])
+        return order
+
+    return add
+
+@pytest.fixture
+def make_order(add_items):
+
+    def make(user, status, count=1):
+        return add_items(Order.objects.create(user=user, status=status),
+                         count)
+
+    return make
+
+@pytest.fixture
+def assert_flat_queries():
+    """Проверяет, что число запросов не растёт вместе с размером ответа.
+
+    fetch() выполняет запрос к эндпоинту, grow() добавляет данные.
+    Кеш каталога очищается, чтобы мерить запросы построения ответа.
+    """
+
+    def check(fetch, grow):
+        cache.clear()
+        with CaptureQueriesContext(connection) as small:
+            response = fetch()
+        assert response.status_code == 200, response.content
+        grow()
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            response = fetch()
+        assert response.status_code == 200, response.content
+        assert len(large) == len(small), \
+            [query['sql'] for query in large.captured_queries]
+        return len(large)
+
+    return check
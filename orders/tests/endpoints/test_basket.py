@@ -0,0 +1,126 @@
+import json
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from service.models import Order, OrderItem
+
+
+@pytest.fixture
+def client(buyer):
+    client = APIClient()
+    client.force_authenticate(buyer)
+    return client
+
+@pytest.fixture
+def offers(make_catalog):
+    return make_catalog(3)
+
+
+def basket_items(buyer):
+    return dict(OrderItem.objects.filter(
+        order__user=buyer, order__status='basket'
+        ).values_list('product_info', 'quantity'))
+
+
+@pytest.mark.django_db
+def test_add_items_reports_line_errors(client, buyer, offers):
+    # Act
+    response = client.post('/user/basket', {'items': [
+        {'product_info': offers[0].id, 'quantity': 2},
+        {'product_info': offers[1].id, 'quantity': 0},
+        {'product_info': 100500, 'quantity': 1},
+        {'product_info': offers[2].id, 'quantity': 11},
+        {'product_info': offers[0].id, 'quantity': 3},
+        ]})
+    # Assert
+    assert response.status_code == 200
+    assert response.json()['Создано объектов'] == 1
+    assert [error['line'] for error in response.json()['Errors']] == [1, 2, 3]
+    assert basket_items(buyer) == {offers[0].id: 5}
+    assert Order.objects.get(user=buyer).total_price == 5 * offers[0].price
+
+
+@pytest.mark.django_db
+def test_add_items_from_json_string_merges_quantities(client, buyer, offers):
+    # Arrange
+    client.post('/user/basket', {'items': [
+        {'product_info': offers[0].id, 'quantity': 1}
+        ]})
+    # Act
+    response = client.post('/user/basket', {'items': json.dumps([
+        {'product_info': offers[0].id, 'quantity': 2},
+        {'product_info': offers[1].id, 'quantity': 1},
+        ])}, format='multipart')
+    # Assert
+    assert response.json()['Создано объектов'] == 1
+    assert response.json()['Обновлено объектов'] == 1
+    assert basket_items(buyer) == {offers[0].id: 3, offers[1].id: 1}
+
+
+@pytest.mark.django_db
+def test_update_and_delete_items(client, buyer, offers):
+    # Arrange
+    client.post('/user/basket', {'items': [
+        {'product_info': info.id, 'quantity': 1} for info in offers[:3]
+        ]})
+    items = dict(OrderItem.objects.values_list('product_info', 'id'))
+    # Act
+    updated = client.put('/user/basket', {'items': [
+        {'id': items[offers[0].id], 'quantity': 4},
+        {'id': 100500, 'quantity': 1},
+        {'id': items[offers[1].id], 'quantity': 99},
+        ]})
+    deleted = client.delete(
+        '/user/basket',
+        {'items': f'{items[offers[2].id]},abc,100500'}
+        )
+    # Assert
+    assert updated.json()['Обновлено объектов'] == 1
+    assert [error['line'] for error in updated.json()['Errors']] == [1, 2]
+    assert deleted.json()['Удалено объектов'] == 1
+    assert [error['line'] for error in deleted.json()['Errors']] == [1, 2]
+    assert basket_items(buyer) == {offers[0].id: 4, offers[1].id: 1}
+    assert Order.objects.get(user=buyer).total_price == \
+        4 * offers[0].price + offers[1].price
+
+
+@pytest.mark.django_db
+def test_batch_queries_do_not_grow_with_lines(client, buyer, make_catalog):
+    # Arrange
+    small = make_catalog(2)
+    large = make_catalog(100)
+
+    def post(infos):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/user/basket', {'items': [
+                {'product_info': info.id, 'quantity': 1} for info in infos
+                ]})
+        assert response.status_code == 200
+        return len(queries)
+
+    def delete(infos):
+        ids = OrderItem.objects.filter(
+            product_info__in=[info.id for info in infos]
+            ).values_list('id', flat=True)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.delete('/user/basket', {'items': list(ids)})
+        assert response.json()['Удалено объектов'] == len(infos)
+        return len(queries)
+
+    # Act
+    added = post(small), post(large)
+    deleted = delete(small), delete(large)
+    # Assert
+    assert added[0] == added[1]
+    assert deleted[0] == deleted[1]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('items', [None, 'not json', '[{"id": ', [{}] * 1001])
+def test_bad_batches_are_rejected(client, items):
+    # Act
+    response = client.post('/user/basket', {'items': items} if items else {})
+    # Assert
+    assert response.status_code == 400
+    assert response.json()['Status'] is False
@@ -0,0 +1,93 @@
+from datetime import timedelta
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from service.catalog_cache import bump_catalog_version
+from service.models import Shop
+
+
+@pytest.fixture
+def client(buyer):
+    client = APIClient()
+    client.force_authenticate(buyer)
+    return client
+
+@pytest.fixture
+def imported(make_catalog):
+    infos = make_catalog(3)
+    Shop.objects.update(
+        catalog_modified=timezone.now() - timedelta(hours=1)
+        )
+    return infos
+
+
+@pytest.mark.django_db
+def test_etag_answers_not_modified_without_main_query(client, imported):
+    # Arrange
+    first = client.get('/products/')
+    # Act
+    with CaptureQueriesContext(connection) as queries:
+        repeated = client.get('/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+    # Assert
+    assert first.status_code == 200
+    assert first['ETag'].startswith('"')
+    assert repeated.status_code == 304
+    assert repeated['ETag'] == first['ETag']
+    # только чтение версии каталога
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_etag_changes_with_import_and_query(client, imported):
+    # Arrange
+    first = client.get('/products/')
+    other_page = client.get('/products/', {'page_size': 1})
+    # Act
+    bump_catalog_version(Shop.objects.all())
+    after_import = client.get('/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+    # Assert
+    assert other_page['ETag'] != first['ETag']
+    assert after_import.status_code == 200
+    assert after_import['ETag'] != first['ETag']
+
+
+@pytest.mark.django_db
+def test_last_modified_for_product_card(client, imported):
+    # Arrange
+    info = imported[0]
+    url = f'/user/products/{info.product_id}'
+    first = client.get(url, {'shop_id': info.shop_id})
+    # Act
+    not_modified = client.get(url, {'shop_id': info.shop_id},
+                              HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+    bump_catalog_version(Shop.objects.filter(pk=info.shop_id))
+    modified = client.get(
+        url, {'shop_id': info.shop_id},
+        HTTP_IF_MODIFIED_SINCE=http_date(
+            (timezone.now() - timedelta(minutes=30)).timestamp()
+            )
+        )
+    # Assert
+    assert first.status_code == 200
+    assert not_modified.status_code == 304
+    assert modified.status_code == 200
+
+
+@pytest.mark.django_db
+def test_last_modified_follows_catalog_edit(client, imported):
+    # Arrange
+    first = client.get('/products/')
+    # Act
+    not_modified = client.get('/products/',
+                              HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+    client.patch(f'/products/{imported[0].product_id}/', {'name': 'Новое'})
+    after_edit = client.get('/products/',
+                            HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+    # Assert
+    assert not_modified.status_code == 304
+    assert after_edit.status_code == 200
+    assert after_edit['Last-Modified'] != first['Last-Modified']
+    assert 'Новое' in [item['name'] for item in after_edit.json()['results']]
@@ -0,0 +1,113 @@
+import pytest
+from rest_framework.test import APIClient
+from endpoints.filters import facet_counts
+from service.models import Category, Parameter, Product, ProductInfo, \
+    ProductParameter, Shop
+from service.summaries import refresh_facets
+
+
+GOODS = (
+    ('iPhone XR 256', {'Цвет': 'красный', 'Встроенная память (Гб)': '256'}),
+    ('iPhone XR 64', {'Цвет': 'красный', 'Встроенная память (Гб)': '64'}),
+    ('iPhone XS 256', {'Цвет': 'золотистый', 'Встроенная память (Гб)': '256'}),
+    ('Galaxy 256', {'Цвет': 'белый', 'Встроенная память (Гб)': '256'}),
+    )
+
+
+@pytest.fixture
+def client(buyer):
+    client = APIClient()
+    client.force_authenticate(buyer)
+    return client
+
+@pytest.fixture
+def catalog():
+    category = Category.objects.create(id=1, name='Смартфоны')
+    shops = [Shop.objects.create(name=name, distance=10)
+             for name in ('Связной', 'М.Видео')]
+    products = {}
+    for row, (name, parameters) in enumerate(GOODS):
+        product = Product.objects.create(name=name, category=category)
+        products[name] = product.id
+        # предложение в каждом магазине, товар считается один раз
+        for shop in shops:
+            info = ProductInfo.objects.create(
+                external_id=row, model=name, shop=shop, product=product,
+                quantity=1, price=100, price_rrc=100
+                )
+            for parameter, value in parameters.items():
+                ProductParameter.objects.create(
+                    product_info=info,
+                    parameter=Parameter.objects.get_or_create(
+                        name=parameter
+                        )[0],
+                    value=value
+                    )
+    refresh_facets()
+    return products
+
+
+def names(response):
+    return sorted(item['name'] for item in response.json()['results'])
+
+
+@pytest.mark.django_db
+def test_filter_by_several_facets(client, catalog):
+    # Act
+    red_256 = client.get('/products/', {'param': [
+        'Цвет:красный', 'Встроенная память (Гб):256'
+        ]})
+    red_or_white = client.get('/products/', {'param': [
+        'Цвет:красный', 'Цвет:белый', 'Встроенная память (Гб):256'
+        ]})
+    unknown = client.get('/products/', {'param': 'Вес:100'})
+    # Assert
+    assert names(red_256) == ['iPhone XR 256']
+    assert names(red_or_white) == ['Galaxy 256', 'iPhone XR 256']
+    assert names(unknown) == []
+
+
+@pytest.mark.django_db
+def test_facet_counts(client, catalog):
+    # Act
+    everything = client.get('/products/facets/').json()
+    red = client.get('/products/facets/', {'param': 'Цвет:красный'}).json()
+    # Assert
+    assert everything['Цвет'] == {'красный': 2, 'золотистый': 1, 'белый': 1}
+    assert everything['Встроенная память (Гб)'] == {'256': 3, '64': 1}
+    # по выбранному параметру видны и другие значения
+    assert red['Цвет'] == everything['Цвет']
+    assert red['Встроенная память (Гб)'] == {'256': 1, '64': 1}
+
+
+@pytest.mark.django_db
+def test_bad_facet(client, catalog):
+    # Act
+    response = client.get('/products/', {'param': 'красный'})
+    # Assert
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_facets_count_only_offers_in_stock(client, catalog):
+    # Arrange
+    ProductInfo.objects.filter(product=catalog['Galaxy 256']).update(
+        quantity=0
+        )
+    refresh_facets([1])
+    # Act
+    counts = client.get('/products/facets/').json()
+    white = client.get('/products/', {'param': 'Цвет:белый'})
+    everything = client.get('/products/')
+    ProductInfo.objects.filter(product=catalog['Galaxy 256']).update(
+        quantity=1
+        )
+    refresh_facets([1])
+    restocked = facet_counts({'Цвет': {'белый'}})
+    # Assert
+    assert counts['Цвет'] == {'красный': 2, 'золотистый': 1}
+    assert counts['Встроенная память (Гб)'] == {'256': 2, '64': 1}
+    # фильтр сужает полный список, а не только товары в наличии
+    assert names(white) == ['Galaxy 256']
+    assert 'Galaxy 256' in names(everything)
+    assert restocked['Цвет']['белый'] == 1
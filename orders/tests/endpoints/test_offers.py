@@ -0,0 +1,87 @@
+import pytest
+from rest_framework.test import APIClient
+from service.models import Category, Product, ProductInfo, Shop
+
+
+@pytest.fixture
+def client(buyer):
+    client = APIClient()
+    client.force_authenticate(buyer)
+    return client
+
+@pytest.fixture
+def offers():
+    category = Category.objects.create(id=1, name='Смартфоны')
+    shops = {name: Shop.objects.create(name=name, distance=distance)
+             for name, distance in (('Связной', 40), ('М.Видео', 120),
+                                    ('Евросеть', 400))}
+    phone = Product.objects.create(name='iPhone XR', category=category)
+    galaxy = Product.objects.create(name='Galaxy', category=category)
+    for product, shop, price, quantity in (
+            (phone, 'Связной', 900, 3),
+            (phone, 'М.Видео', 700, 1),
+            (phone, 'Евросеть', 500, 0),
+            (galaxy, 'Евросеть', 300, 8),
+            ):
+        ProductInfo.objects.create(
+            external_id=product.id, model=product.name, shop=shops[shop],
+            product=product, quantity=quantity, price=price, price_rrc=price
+            )
+    return phone, galaxy
+
+
+@pytest.mark.django_db
+def test_offers_sorted_by_price_in_stock_only(client, offers):
+    # Arrange
+    phone, _ = offers
+    # Act
+    response = client.get('/products/offers/', {'product': phone.id})
+    # Assert
+    assert response.status_code == 200
+    [result] = response.json()['results']
+    assert result['product'] == phone.id
+    assert [(offer['shop_name'], offer['price'], offer['quantity'],
+             offer['distance']) for offer in result['offers']] == \
+        [('М.Видео', 700, 1, 120), ('Связной', 900, 3, 40)]
+
+
+@pytest.mark.django_db
+def test_offers_for_many_products_in_one_call(client, offers):
+    # Arrange
+    phone, galaxy = offers
+    # Act
+    response = client.get('/products/offers/',
+                          {'product': f'{galaxy.id},{phone.id},999'})
+    # Assert
+    results = response.json()['results']
+    assert [result['product'] for result in results] == \
+        [galaxy.id, phone.id, 999]
+    assert [offer['price'] for offer in results[0]['offers']] == [300]
+    assert len(results[1]['offers']) == 2
+    assert results[2]['offers'] == []
+
+
+@pytest.mark.django_db
+def test_offers_query_count_is_flat(client, make_catalog,
+                                    assert_flat_queries):
+    # Arrange
+    infos = make_catalog(2)
+
+    def fetch():
+        ids = ','.join(str(info.product_id) for info in infos)
+        return client.get('/products/offers/', {'product': ids})
+
+    # Act
+    queries = assert_flat_queries(fetch, lambda: infos.extend(make_catalog(5)))
+    # Assert
+    # версия каталога и сами предложения
+    assert queries == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('product', ['', 'abc', ','.join(map(str, range(101)))])
+def test_offers_reject_bad_product_list(client, product):
+    # Act
+    response = client.get('/products/offers/', {'product': product})
+    # Assert
+    assert response.status_code == 400
@@ -0,0 +1,106 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from endpoints.pagination import KeysetPagination
+from service.models import Product
+
+
+@pytest.fixture
+def client(buyer):
+    client = APIClient()
+    client.force_authenticate(buyer)
+    return client
+
+
+def walk(client, url, params=None):
+    pages = []
+    while url:
+        response = client.get(url, params)
+        assert response.status_code == 200
+        pages.append(response.json())
+        url, params = pages[-1]['next'], None
+    return pages
+
+
+@pytest.mark.django_db
+def test_pages_cover_catalog_in_order(client, make_catalog):
+    # Arrange
+    make_catalog(10)
+    expected = list(Product.objects.order_by(
+        'category_id', 'name', 'id'
+        ).values_list('id', flat=True))
+    # Act
+    pages = walk(client, '/products/', {'page_size': 3})
+    # Assert
+    assert [len(page['results']) for page in pages] == [3, 3, 3, 1]
+    assert [item['id'] for page in pages for item in page['results']] == \
+        expected
+    assert pages[0]['previous'] is None
+
+
+@pytest.mark.django_db
+def test_previous_link_returns_same_page(client, make_catalog):
+    # Arrange
+    make_catalog(7)
+    pages = walk(client, '/products/', {'page_size': 2})
+    # Act
+    previous = client.get(pages[2]['previous']).json()
+    first = client.get(previous['previous']).json()
+    # Assert
+    assert previous['results'] == pages[1]['results']
+    assert first['results'] == pages[0]['results']
+    assert first['previous'] is None
+
+
+@pytest.mark.django_db
+def test_page_size_is_capped(client, make_catalog, monkeypatch):
+    # Arrange
+    monkeypatch.setattr(KeysetPagination, 'max_page_size', 4)
+    make_catalog(6)
+    # Act
+    capped = client.get('/products/', {'page_size': 1000}).json()
+    default = client.get('/products/', {'page_size': 'много'}).json()
+    # Assert
+    assert len(capped['results']) == 4
+    assert len(default['results']) == 6
+
+
+@pytest.mark.django_db
+def test_deep_page_costs_same_as_first(client, make_catalog):
+    # Arrange
+    make_catalog(12)
+    pages = walk(client, '/products/', {'page_size': 2})
+    cache.clear()
+    # Act
+    with CaptureQueriesContext(connection) as first:
+        client.get('/products/', {'page_size': 2})
+    with CaptureQueriesContext(connection) as deep:
+        client.get(pages[-2]['next'])
+    # Assert
+    assert len(first) == len(deep) == 2
+    assert 'OFFSET' not in deep.captured_queries[-1]['sql']
+
+
+@pytest.mark.django_db
+def test_seek_uses_ordering_index(make_catalog):
+    # Arrange
+    make_catalog(12)
+    paginator = KeysetPagination()
+    last = Product.objects.order_by(*paginator.ordering)[5]
+    queryset = Product.objects.order_by(*paginator.ordering)
+    # Act
+    plan = paginator.after(queryset, paginator.position(last),
+                           reverse=False)[:3].explain()
+    # Assert
+    assert 'product_category_name_id_idx' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@pytest.mark.django_db
+def test_invalid_cursor(client):
+    # Act
+    response = client.get('/products/', {'cursor': 'не курсор'})
+    # Assert
+    assert response.status_code == 404
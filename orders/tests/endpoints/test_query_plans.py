@@ -0,0 +1,103 @@
+import pytest
+from rest_framework.test import APIClient
+from service.models import UsersContactAdress
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.mark.django_db
+def test_product_list_queries(client, buyer, make_catalog,
+                              assert_flat_queries):
+    # Arrange
+    client.force_authenticate(buyer)
+    make_catalog(2)
+    # Act
+    queries = assert_flat_queries(lambda: client.get('/products/'),
+                                  lambda: make_catalog(10))
+    # Assert
+    # версия каталога и сама страница
+    assert queries == 2
+
+
+@pytest.mark.django_db
+def test_product_card_queries(client, buyer, make_catalog,
+                              assert_flat_queries):
+    # Arrange
+    client.force_authenticate(buyer)
+    info = make_catalog(1)[0]
+    url = f'/user/products/{info.product_id}'
+    # Act
+    response = client.get(url, {'shop_id': info.shop_id})
+    rigth_module = response.json()['rigth_module']
+    queries = assert_flat_queries(
+        lambda: client.get(url, {'shop_id': info.shop_id}),
+        lambda: make_catalog(5)
+        )
+    # Assert
+    assert rigth_module['Поставщик: '] == info.shop.name
+    assert len(rigth_module['Характеристики: ']) == 2
+    # версия каталога и готовая карточка
+    assert queries == 2
+
+
+@pytest.mark.django_db
+def test_basket_queries(client, buyer, make_order, add_items,
+                        assert_flat_queries):
+    # Arrange
+    client.force_authenticate(buyer)
+    basket = make_order(buyer, 'basket')
+    # Act
+    total = client.get('/user/basket').json()['Итог: ']
+    queries = assert_flat_queries(lambda: client.get('/user/basket'),
+                                  lambda: add_items(basket, 10))
+    # Assert
+    assert total['Сумма: '] == 2 * 101
+    assert total['Стоимость доставки: '] == 500 * 2 * 0.4
+    # корзина, позиции, параметры, контакты и расчёт корзины
+    assert queries == 6
+
+
+@pytest.mark.django_db
+def test_order_list_queries(client, buyer, make_order, assert_flat_queries):
+    # Arrange
+    client.force_authenticate(buyer)
+    make_order(buyer, 'new')
+    make_order(buyer, 'basket')
+
+    def grow():
+        for _ in range(5):
+            make_order(buyer, 'confirmed', 2)
+
+    # Act
+    queries = assert_flat_queries(lambda: client.get('/user/orders'), grow)
+    history = client.get('/user/orders').json()['История заказов']
+    # Assert
+    assert len(history) == 6
+    assert queries == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('status, url', [
+    ('delivered', '/user/order'),
+    ('confirmed', '/user/greeting'),
+    ])
+def test_order_details_queries(client, buyer, make_order, add_items,
+                               assert_flat_queries, status, url):
+    # Arrange
+    client.force_authenticate(buyer)
+    UsersContactAdress.objects.create(user=buyer, city='Москва',
+                                      street='Тверская', house='1')
+    order = make_order(buyer, status)
+    # Act
+    queries = assert_flat_queries(
+        lambda: client.get(url, {'id': order.id}),
+        lambda: add_items(order, 10)
+        )
+    main_module = client.get(url, {'id': order.id}).json()['Основной блок']
+    # Assert
+    assert len(main_module['Детали заказа: ']) == 11
+    assert main_module['Адрес: '][0]['city'] == 'Москва'
+    assert queries == 5
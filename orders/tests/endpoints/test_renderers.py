@@ -0,0 +1,58 @@
+import json
+from decimal import Decimal
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from endpoints.renderers import ORJSONRenderer, ORJSONResponse
+
+
+def test_renderer_matches_default_renderer():
+    # Arrange
+    data = {'results': [{'id': 1, 'name': 'Смартфон', 'price': 110000,
+                         'parameters': [{'Цвет': 'золотистый'}]}],
+            'next': None}
+    # Act
+    rendered = ORJSONRenderer().render(data)
+    # Assert
+    assert json.loads(rendered) == json.loads(JSONRenderer().render(data))
+
+
+def test_renderer_falls_back_to_drf_encoder():
+    # Act
+    rendered = ORJSONRenderer().render({'price': Decimal('10.50'),
+                                        'message': gettext_lazy('Цена'),
+                                        1: 'ключ-число'})
+    # Assert
+    assert json.loads(rendered) == {'price': 10.5, 'message': 'Цена',
+                                    '1': 'ключ-число'}
+
+
+@pytest.mark.django_db
+def test_parser_rejects_broken_json(buyer):
+    # Arrange
+    client = APIClient()
+    client.force_authenticate(buyer)
+    # Act
+    response = client.post('/products/', '{"name": ',
+                           content_type='application/json')
+    # Assert
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith('JSON parse error')
+
+
+@pytest.mark.django_db
+def test_product_card_is_cached_as_orjson(buyer, make_catalog):
+    # Arrange
+    info = make_catalog(1)[0]
+    client = APIClient()
+    client.force_authenticate(buyer)
+    url = f'/user/products/{info.product_id}'
+    # Act
+    miss = client.get(url, {'shop_id': info.shop_id})
+    hit = client.get(url, {'shop_id': info.shop_id})
+    # Assert
+    assert (miss['X-Cache'], hit['X-Cache']) == ('MISS', 'HIT')
+    assert isinstance(miss, ORJSONResponse)
+    assert isinstance(hit, ORJSONResponse)
+    assert hit.content == miss.content
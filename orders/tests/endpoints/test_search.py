@@ -0,0 +1,90 @@
+import pytest
+from django.db import connection
+from rest_framework.test import APIClient
+from endpoints.search import InvertedIndex, similarity, build_index, \
+    postgres_search, SEARCH_LIMIT
+from service.models import Category, Product, ProductInfo, Shop
+
+
+@pytest.fixture
+def client(buyer):
+    client = APIClient()
+    client.force_authenticate(buyer)
+    return client
+
+@pytest.fixture
+def catalog():
+    category = Category.objects.create(id=1, name='Смартфоны')
+    shop = Shop.objects.create(name='Связной', distance=10)
+    products = {}
+    for row, (name, model) in enumerate((
+            ('Смартфон Apple iPhone XR 256GB (красный)', 'apple/iphone/xr'),
+            ('Смартфон Apple iPhone XS Max 512GB (золотистый)',
+             'apple/iphone/xs-max'),
+            ('Смартфон Samsung Galaxy S10 128GB (белый)', 'samsung/galaxy/s10'),
+            )):
+        product = Product.objects.create(name=name, category=category)
+        ProductInfo.objects.create(external_id=row, model=model, shop=shop,
+                                   product=product, quantity=1, price=100,
+                                   price_rrc=100)
+        products[model] = product.id
+    return products
+
+
+def found(response):
+    return [item['id'] for item in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_search_ranks_best_match_first(client, catalog):
+    # Act
+    iphone = client.get('/products/search/', {'q': 'iphone xs'})
+    galaxy = client.get('/products/search/', {'q': 'смартфон galaxy'})
+    # Assert
+    assert found(iphone)[0] == catalog['apple/iphone/xs-max']
+    assert set(found(iphone)) >= {catalog['apple/iphone/xr']}
+    assert found(galaxy)[0] == catalog['samsung/galaxy/s10']
+    assert iphone.json()['results'][0]['rank'] > \
+        iphone.json()['results'][-1]['rank']
+
+
+@pytest.mark.django_db
+def test_search_tolerates_typos(client, catalog):
+    # Act
+    response = client.get('/products/search/', {'q': 'samsng galxy'})
+    # Assert
+    assert found(response)[0] == catalog['samsung/galaxy/s10']
+
+
+@pytest.mark.django_db
+def test_search_requires_query(client):
+    # Act
+    response = client.get('/products/search/')
+    # Assert
+    assert response.status_code == 400
+
+
+def test_inverted_index_limit_and_similarity():
+    # Arrange
+    index = InvertedIndex()
+    for product_id in range(5):
+        index.add(product_id, f'Чехол для iphone {product_id}')
+    # Act
+    ranked = index.search('iphone', limit=3)
+    # Assert
+    assert [product_id for product_id, _ in ranked] == [0, 1, 2]
+    assert similarity('iphone', 'iphone') == 1
+    assert similarity('iphone', 'galaxy') == 0
+
+
+@pytest.mark.skipif(connection.vendor != 'postgresql',
+                    reason='полнотекстовый поиск и pg_trgm есть только '
+                           'в PostgreSQL')
+@pytest.mark.django_db
+def test_postgres_search_matches_fallback(catalog):
+    # Act
+    fallback = build_index().search('apple iphone')
+    ranked = postgres_search('apple iphone', SEARCH_LIMIT)
+    # Assert
+    assert {product_id for product_id, _ in ranked} == \
+        {product_id for product_id, _ in fallback}
@@ -0,0 +1,48 @@
+import pytest
+from endpoints.queries import product_queryset, order_list_queryset, \
+    order_items_queryset, order_items_prefetch
+from endpoints.serializers import ProductSerializer, OrderListSerializer, \
+    OrderItemCreateSerializer, ProductValuesSerializer, \
+    OrderListValuesSerializer, OrderItemValuesSerializer
+from service.models import OrderItem
+
+
+@pytest.mark.django_db
+def test_product_values_match_model_serializer(make_catalog):
+    # Arrange
+    make_catalog(4)
+    queryset = product_queryset()
+    # Act
+    values = ProductValuesSerializer(
+        ProductValuesSerializer.values(queryset)
+        ).data
+    # Assert
+    assert values == ProductSerializer(queryset, many=True).data
+
+
+@pytest.mark.django_db
+def test_order_list_values_match_model_serializer(buyer, make_order):
+    # Arrange
+    make_order(buyer, 'new', 2)
+    make_order(buyer, 'delivered', 3)
+    queryset = order_list_queryset(buyer.id)
+    # Act
+    values = OrderListValuesSerializer(
+        OrderListValuesSerializer.values(queryset)
+        ).data
+    # Assert
+    assert values == OrderListSerializer(queryset, many=True).data
+
+
+@pytest.mark.django_db
+def test_order_item_values_match_model_serializer(buyer, make_order):
+    # Arrange
+    order = make_order(buyer, 'delivered', 3)
+    items = order_items_prefetch().queryset.filter(order=order)
+    # Act
+    values = OrderItemValuesSerializer(
+        OrderItemValuesSerializer.values(order_items_queryset(order.id))
+        ).data
+    # Assert
+    assert len(values) == OrderItem.objects.filter(order=order).count()
+    assert values == OrderItemCreateSerializer(items, many=True).data
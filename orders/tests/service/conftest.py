@@ -0,0 +1,61 @@
+import os
+from unittest import mock
+import pytest
+from yaml import load, SafeLoader
+from service.models import Shop, User
+
+
+class FakeResponse:
+
+    def __init__(self, content=b'', status_code=200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+@pytest.fixture
+def price_list_path():
+    return os.path.join(
+        os.path.dirname(__file__), '..', '..', '..', 'data', 'shop1.yaml'
+        )
+
+@pytest.fixture
+def price_list(price_list_path):
+    with open(price_list_path, encoding='utf-8') as stream:
+        return load(stream, Loader=SafeLoader)
+
+@pytest.fixture
+def shop(price_list):
+    return Shop.objects.create(name=price_list['shop'], distance=10)
+
+@pytest.fixture
+def user_shop():
+    return User.objects.create_user('shop@mail.ru', 'Pass1234', type='shop')
+
+@pytest.fixture
+def price_list_content(price_list_path):
+    with open(price_list_path, 'rb') as stream:
+        return stream.read()
+
+@pytest.fixture
+def source():
+    """Подменяет HTTP-источник прайса"""
+    def serve(content=b'', status_code=200, headers=None):
+        return mock.patch(
+            'service.parser.requests.get',
+            return_value=FakeResponse(content, status_code, headers)
+            )
+    return serve
@@ -0,0 +1,82 @@
+import copy
+import pytest
+from rest_framework.test import APIClient
+from service.cards import get_card
+from service.importer import CatalogImporter, DELTA
+from service.models import ProductCard, ProductInfo, User
+
+
+@pytest.mark.django_db
+def test_import_builds_cards(shop, price_list):
+    # Act
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    info = ProductInfo.objects.get(external_id=4216292)
+    card = get_card(info.product_id, shop.id)
+    # Assert
+    assert ProductCard.objects.filter(shop=shop).count() == \
+        len(price_list['goods'])
+    assert card['left_module']['Наименование: '] == \
+        'Смартфон Apple iPhone XS Max 512GB (золотистый)'
+    assert card['rigth_module']['Поставщик: '] == shop.name
+    assert card['rigth_module']['Цена: '] == 110000
+    assert {'product_info': info.id, 'parameter': 'Цвет',
+            'value': 'золотистый'} in card['rigth_module']['Характеристики: ']
+
+
+@pytest.mark.django_db
+def test_delta_import_refreshes_only_touched_cards(shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    before = {card.product_info_id: card.updated_at
+              for card in ProductCard.objects.all()}
+    goods = copy.deepcopy(price_list['goods'])
+    goods[0]['price'] += 1000
+    goods[1]['parameters']['Цвет'] = 'синий'
+    retired = goods.pop()
+    # Act
+    CatalogImporter(shop, mode=DELTA).run(price_list['categories'], goods)
+    cards = {card.product_info.external_id: card
+             for card in ProductCard.objects.select_related('product_info')}
+    # Assert
+    assert cards[goods[0]['id']].document['rigth_module']['Цена: '] == \
+        goods[0]['price']
+    assert {'product_info': cards[goods[1]['id']].product_info_id,
+            'parameter': 'Цвет', 'value': 'синий'} in \
+        cards[goods[1]['id']].document['rigth_module']['Характеристики: ']
+    assert cards[retired['id']].document['rigth_module']['Количество: '] == 0
+    untouched = cards[goods[2]['id']]
+    assert untouched.updated_at == before[untouched.product_info_id]
+
+
+@pytest.mark.django_db
+def test_missing_card_is_built_on_demand(shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    info = ProductInfo.objects.get(external_id=4216292)
+    ProductCard.objects.all().delete()
+    # Act
+    card = get_card(info.product_id, shop.id)
+    # Assert
+    assert card['rigth_module']['Цена: '] == 110000
+    assert ProductCard.objects.count() == 1
+    assert get_card(info.product_id + 1000, shop.id) is None
+
+
+@pytest.mark.django_db
+def test_product_edit_refreshes_cards(shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    info = ProductInfo.objects.get(external_id=4216292)
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user('buyer@mail.ru',
+                                                       'Pass1234'))
+    url = f'/user/products/{info.product_id}'
+    before = client.get(url, {'shop_id': shop.id}).json()
+    # Act
+    client.patch(f'/products/{info.product_id}/', {'name': 'Новое название'})
+    after = client.get(url, {'shop_id': shop.id}).json()
+    # Assert
+    assert before['left_module']['Наименование: '] != 'Новое название'
+    assert after['left_module']['Наименование: '] == 'Новое название'
+    assert get_card(info.product_id, shop.id)['left_module'][
+        'Наименование: '] == 'Новое название'
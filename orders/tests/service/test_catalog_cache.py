@@ -0,0 +1,79 @@
+import pytest
+from rest_framework.test import APIClient
+from service.importer import CatalogImporter, DELTA
+from service.models import Shop, User
+
+
+@pytest.fixture
+def client():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(
+        'admin@mail.ru', 'Pass1234', is_staff=True
+        ))
+    return client
+
+
+@pytest.mark.django_db
+def test_import_bumps_catalog_version(shop, price_list):
+    # Act
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    CatalogImporter(shop, mode=DELTA).run(price_list['categories'],
+                                          price_list['goods'])
+    # Assert
+    shop.refresh_from_db()
+    assert shop.catalog_version == 2
+
+
+@pytest.mark.django_db
+def test_catalog_cache_is_invalidated_by_import(client, shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    product_id = shop.product_infos.first().product_id
+    card = f'/user/products/{product_id}'
+    # Act
+    first = client.get('/products/')
+    second = client.get('/products/')
+    first_card = client.get(card, {'shop_id': shop.id})
+    second_card = client.get(card, {'shop_id': shop.id})
+    price_list['goods'][0]['name'] = 'Новое название'
+    CatalogImporter(shop, mode=DELTA).run(price_list['categories'],
+                                          price_list['goods'])
+    after_import = client.get('/products/')
+    stats = client.get('/catalog_cache').json()
+    # Assert
+    assert [first['X-Cache'], second['X-Cache'], after_import['X-Cache']] == \
+        ['MISS', 'HIT', 'MISS']
+    assert [first_card['X-Cache'], second_card['X-Cache']] == ['MISS', 'HIT']
+    assert second.json() == first.json()
+    assert second_card.json() == first_card.json()
+    assert 'Новое название' in \
+        [item['name'] for item in after_import.json()['results']]
+    assert stats['hits'] == 2
+    assert stats['misses'] == 3
+
+
+@pytest.mark.django_db
+def test_product_card_cache_follows_its_shop(client, shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    other = Shop.objects.create(name='Другой магазин', distance=5)
+    product_id = shop.product_infos.first().product_id
+    card = f'/user/products/{product_id}'
+    client.get(card, {'shop_id': shop.id})
+    # Act
+    CatalogImporter(other).run([], [])
+    cached = client.get(card, {'shop_id': shop.id})
+    # Assert
+    assert cached['X-Cache'] == 'HIT'
+
+
+@pytest.mark.django_db
+def test_cache_stats_are_for_staff_only():
+    # Arrange
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user('buyer@mail.ru',
+                                                       'Pass1234'))
+    # Act
+    response = client.get('/catalog_cache')
+    # Assert
+    assert response.status_code == 403
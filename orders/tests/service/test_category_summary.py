@@ -0,0 +1,109 @@
+import copy
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from service.importer import CatalogImporter, DELTA
+from endpoints.filters import facet_counts
+from service.models import CategorySummary, ProductInfo, Shop, User
+from service.summaries import refresh_category_summaries
+
+
+@pytest.fixture
+def client():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user('buyer@mail.ru',
+                                                       'Pass1234'))
+    return client
+
+
+@pytest.mark.django_db
+def test_import_fills_category_summaries(shop, price_list):
+    # Act
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    summaries = {summary.category_id: summary
+                 for summary in CategorySummary.objects.all()}
+    # Assert
+    assert set(summaries) == {224, 15, 1}
+    phones = summaries[224]
+    assert (phones.products, phones.offers, phones.shops) == (4, 4, 1)
+    assert (phones.min_price, phones.max_price) == (60000, 110000)
+    assert (summaries[15].offers, summaries[15].min_price) == (0, None)
+
+
+@pytest.mark.django_db
+def test_delta_import_and_other_shop_update_summaries(shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    goods = copy.deepcopy(price_list['goods'])
+    cheapest = goods.pop()
+    other = Shop.objects.create(name='Другой магазин', distance=5)
+    # Act
+    CatalogImporter(shop, mode=DELTA).run(price_list['categories'], goods)
+    CatalogImporter(other).run(price_list['categories'],
+                               [dict(cheapest, price=1000)])
+    phones = CategorySummary.objects.get(category=224)
+    # Assert
+    assert (phones.products, phones.offers, phones.shops) == (4, 4, 2)
+    assert (phones.min_price, phones.max_price) == (1000, 110000)
+
+
+@pytest.mark.django_db
+def test_refresh_upserts_summaries_in_place(shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    ProductInfo.objects.filter(product__category=224).update(quantity=0)
+    # Act
+    with CaptureQueriesContext(connection) as queries:
+        refresh_category_summaries([224])
+    phones = CategorySummary.objects.get(category=224)
+    # Assert
+    assert (phones.products, phones.offers, phones.min_price) == (0, 0, None)
+    assert not any(query['sql'].startswith('DELETE')
+                   for query in queries.captured_queries)
+    assert any('ON CONFLICT' in query['sql']
+               for query in queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_import_maintains_facets(shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    goods = copy.deepcopy(price_list['goods'])
+    retired = goods.pop()
+    colors = {}
+    for item in goods:
+        color = item['parameters']['Цвет']
+        colors[color] = colors.get(color, 0) + 1
+    # Act
+    before = facet_counts({})['Цвет']
+    CatalogImporter(shop, mode=DELTA).run(price_list['categories'], goods)
+    after = facet_counts({})['Цвет']
+    # Assert
+    assert sum(before.values()) == len(price_list['goods'])
+    assert after == colors
+    assert facet_counts(
+        {'Цвет': {retired['parameters']['Цвет']}}
+        )['Цвет'] == colors
+
+
+@pytest.mark.django_db
+def test_categories_endpoint_reads_summaries(client, shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    # Act
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/categories')
+    # Assert
+    assert response.status_code == 200
+    assert response.json()['results'] == [
+        {'id': 1, 'name': 'Flash-накопители', 'products': 0, 'offers': 0,
+         'shops': 0, 'min_price': None, 'max_price': None},
+        {'id': 15, 'name': 'Аксессуары', 'products': 0, 'offers': 0,
+         'shops': 0, 'min_price': None, 'max_price': None},
+        {'id': 224, 'name': 'Смартфоны', 'products': 4, 'offers': 4,
+         'shops': 1, 'min_price': 60000, 'max_price': 110000},
+        ]
+    # версия каталога и категории со сводкой, без GROUP BY
+    assert len(queries) == 2
+    assert 'GROUP BY' not in queries[-1]['sql']
@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+import pytest
+from rest_framework.test import APIClient
+from service.importer import CatalogImporter
+from service.models import Shop, User
+from service.parser import PriceList
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+@pytest.fixture
+def catalog(user_shop, price_list):
+    shop = Shop.objects.create(name=price_list['shop'], distance=10,
+                               user=user_shop)
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    return shop
+
+
+def content(response):
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+@pytest.mark.django_db
+def test_export_yaml_round_trips(client, user_shop, catalog, price_list):
+    # Arrange
+    client.force_authenticate(user_shop)
+    # Act
+    response = client.get('/export_catalog', {'type': 'yaml'})
+    exported = PriceList(io.StringIO(content(response)))
+    goods = list(exported.goods())
+    # Assert
+    assert response.status_code == 200
+    assert exported.shop == price_list['shop']
+    assert sorted(exported.categories, key=lambda item: item['id']) == \
+        sorted(price_list['categories'], key=lambda item: item['id'])
+    assert [item['id'] for item in goods] == \
+        [item['id'] for item in price_list['goods']]
+    assert goods[0]['parameters']['Цвет'] == 'золотистый'
+    assert goods[0]['parameters']['Диагональ (дюйм)'] == '6.5'
+
+
+@pytest.mark.django_db
+def test_export_csv_and_jsonl(client, user_shop, catalog, price_list):
+    # Arrange
+    client.force_authenticate(user_shop)
+    # Act
+    rows = list(csv.DictReader(io.StringIO(
+        content(client.get('/export_catalog', {'type': 'csv'}))
+        )))
+    lines = [json.loads(line) for line in content(
+        client.get('/export_catalog', {'type': 'jsonl'})
+        ).splitlines()]
+    # Assert
+    assert len(rows) == len(lines) == len(price_list['goods'])
+    assert rows[1]['model'] == 'apple/iphone/xr'
+    assert json.loads(rows[1]['parameters'])['Цвет'] == 'красный'
+    assert lines[1]['price'] == 65000
+
+
+@pytest.mark.django_db
+def test_export_is_for_shops_only(client):
+    # Arrange
+    buyer = User.objects.create_user('buyer@mail.ru', 'Pass1234')
+    client.force_authenticate(buyer)
+    # Act
+    response = client.get('/export_catalog')
+    # Assert
+    assert response.status_code == 403
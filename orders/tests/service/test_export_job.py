@@ -0,0 +1,144 @@
+import gzip
+import json
+import pytest
+from rest_framework.test import APIClient
+from service.catalog_cache import bump_catalog_version
+from service.importer import CatalogImporter
+from service.models import ExportArtifact, Shop, Order, OrderItem, \
+    ProductInfo, User
+from service.tasks import export_data
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def catalog(user_shop, price_list):
+    shop = Shop.objects.create(name=price_list['shop'], distance=10,
+                               user=user_shop)
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    return shop
+
+
+def download(client, url):
+    response = client.get(url)
+    return gzip.decompress(b''.join(response.streaming_content)).decode()
+
+
+@pytest.mark.django_db
+def test_catalog_export_writes_compressed_file(
+        client, media, user_shop, catalog, price_list,
+        django_capture_on_commit_callbacks):
+    # Arrange
+    client.force_authenticate(user_shop)
+    # Act
+    with django_capture_on_commit_callbacks() as callbacks:
+        response = client.post('/export', data={'type': 'jsonl'})
+    export_id = response.json()['Export']
+    export_data(export_id)
+    state = client.get(f'/export/{export_id}').json()
+    lines = download(client, state['url']).splitlines()
+    # Assert
+    assert response.status_code == 202
+    assert len(callbacks) == 1
+    assert state['state'] == 'done'
+    assert state['rows'] == len(price_list['goods'])
+    assert state['size'] == \
+        ExportArtifact.objects.get(pk=export_id).file.size
+    assert [json.loads(line)['id'] for line in lines] == \
+        [item['id'] for item in price_list['goods']]
+
+
+@pytest.mark.django_db
+def test_unchanged_catalog_reuses_file(client, media, user_shop, catalog):
+    # Arrange
+    client.force_authenticate(user_shop)
+    first = client.post('/export', data={'type': 'csv'}).json()['Export']
+    export_data(first)
+    # Act
+    repeated = client.post('/export', data={'type': 'csv'})
+    other_format = client.post('/export', data={'type': 'yaml'})
+    catalog.import_hash = 'другой прайс'
+    catalog.save()
+    after_import = client.post('/export', data={'type': 'csv'})
+    # Assert
+    assert repeated.status_code == 200
+    assert repeated.json()['Export'] == first
+    assert other_format.json()['Export'] != first
+    assert after_import.status_code == 202
+    assert after_import.json()['Export'] != first
+
+
+@pytest.mark.django_db
+def test_catalog_edit_invalidates_file(client, media, user_shop, catalog):
+    # Arrange
+    client.force_authenticate(user_shop)
+    first = client.post('/export', data={'type': 'csv'}).json()['Export']
+    export_data(first)
+    # Act
+    bump_catalog_version(Shop.objects.filter(pk=catalog.pk))
+    after_edit = client.post('/export', data={'type': 'csv'})
+    # Assert
+    assert after_edit.status_code == 202
+    assert after_edit.json()['Export'] != first
+
+
+@pytest.mark.django_db
+def test_orders_export_by_date_range(client, media, user_shop, catalog):
+    # Arrange
+    buyer = User.objects.create_user('buyer@mail.ru', 'Pass1234')
+    info = ProductInfo.objects.filter(shop=catalog).first()
+    order = Order.objects.create(user=buyer, status='new')
+    OrderItem.objects.create(order=order, product_info=info, shop=catalog,
+                             quantity=2)
+    Order.objects.create(user=buyer, status='basket')
+    client.force_authenticate(user_shop)
+    # Act
+    today = order.dt.date().isoformat()
+    export_id = client.post('/export', data={
+        'kind': 'orders', 'type': 'jsonl',
+        'date_from': today, 'date_to': today
+        }).json()['Export']
+    export_data(export_id)
+    state = client.get(f'/export/{export_id}').json()
+    exported = [json.loads(line)
+                for line in download(client, state['url']).splitlines()]
+    empty = client.post('/export', data={
+        'kind': 'orders', 'date_to': '2000-01-01'
+        }).json()['Export']
+    export_data(empty)
+    # Assert
+    assert state['rows'] == 1
+    assert exported[0]['id'] == order.id
+    assert exported[0]['items'][0]['quantity'] == 2
+    assert client.get(f'/export/{empty}').json()['rows'] == 0
+
+
+@pytest.mark.django_db
+def test_export_rejects_foreign_and_bad_requests(client, media, user_shop,
+                                                 catalog):
+    # Arrange
+    buyer = User.objects.create_user('buyer@mail.ru', 'Pass1234')
+    client.force_authenticate(user_shop)
+    export_id = client.post('/export').json()['Export']
+    bad_date = client.post('/export', data={'kind': 'orders',
+                                            'date_from': 'вчера'})
+    bad_compression = client.post('/export', data={'compression': 'rar'})
+    client.force_authenticate(User.objects.create_user(
+        'admin@mail.ru', 'Pass1234', is_staff=True
+        ))
+    bad_shop = client.post('/export', data={'shop': 'abc'})
+    # Act
+    client.force_authenticate(buyer)
+    foreign = client.get(f'/export/{export_id}')
+    # Assert
+    assert bad_date.status_code == 400
+    assert bad_compression.status_code == 400
+    assert bad_shop.status_code == 400
+    assert foreign.status_code == 404
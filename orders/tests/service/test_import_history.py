@@ -0,0 +1,45 @@
+import pytest
+from service.importer import import_price_list
+from service.models import Shop, ProductInfo, ImportHistory
+
+
+URL = 'https://example.com/shop1.yaml'
+
+
+@pytest.mark.django_db
+def test_repeated_import_is_short_circuited(user_shop, source,
+                                            price_list_content):
+    # Arrange
+    headers = {'ETag': '"v1"'}
+    with source(price_list_content, headers=headers):
+        first = import_price_list(user_shop.id, URL)
+    ids = list(ProductInfo.objects.values_list('id', flat=True))
+    # Act
+    with source(price_list_content, headers=headers) as get:
+        second = import_price_list(user_shop.id, URL)
+    # Assert
+    shop = Shop.objects.get(user=user_shop)
+    assert first.status == 'imported'
+    assert first.rows == len(ids)
+    assert second.status == 'unchanged'
+    assert get.call_args.kwargs['headers'] == {'If-None-Match': '"v1"'}
+    assert list(ProductInfo.objects.values_list('id', flat=True)) == ids
+    assert shop.import_hash == first.content_hash
+    assert shop.imported_at is not None
+    assert ImportHistory.objects.filter(shop=shop).count() == 2
+
+
+@pytest.mark.django_db
+def test_not_modified_source_is_not_downloaded(user_shop, source,
+                                               price_list_content):
+    # Arrange
+    with source(price_list_content,
+                headers={'Last-Modified': 'Wed, 01 Mar 2023'}):
+        import_price_list(user_shop.id, URL)
+    # Act
+    with source(status_code=304) as get:
+        history = import_price_list(user_shop.id, URL)
+    # Assert
+    assert history.status == 'not_modified'
+    assert get.call_args.kwargs['headers'] == \
+        {'If-Modified-Since': 'Wed, 01 Mar 2023'}
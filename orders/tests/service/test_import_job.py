@@ -0,0 +1,175 @@
+import copy
+from unittest import mock
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+from orders.celery import celery_app
+from service.importer import CatalogImporter, stage_goods, DELTA
+from service.models import ImportJob, User, Shop, ProductInfo, \
+    ProductParameter, StagedOffer, StagedParameter, ProductCard
+from service.tasks import update_price, import_chunk, finish_import
+
+
+URL = 'https://example.com/shop1.yaml'
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.mark.django_db
+def test_import_job_reports_progress(client, user_shop, source,
+                                     price_list_content,
+                                     django_capture_on_commit_callbacks):
+    # Arrange
+    client.force_authenticate(user_shop)
+    # Act
+    with django_capture_on_commit_callbacks() as callbacks:
+        response = client.post('/update_catalog', data={'url': URL})
+    job_id = response.json()['Job']
+    queued = client.get(f'/update_catalog/{job_id}').json()
+    with source(price_list_content):
+        update_price(job_id)
+    done = client.get(f'/update_catalog/{job_id}').json()
+    # Assert
+    assert response.status_code == 202
+    assert len(callbacks) == 1
+    assert queued['state'] == 'queued'
+    assert done['state'] == 'done'
+    assert done['progress'] == 100
+    assert done['rows'] == 4
+    assert done['result'] == 'imported'
+
+
+@pytest.mark.django_db
+def test_import_job_failure_is_reported(client, user_shop):
+    # Arrange
+    client.force_authenticate(user_shop)
+    job = ImportJob.objects.create(user=user_shop, url=URL, mode='delta')
+    # Act
+    with mock.patch('service.parser.requests.get',
+                    side_effect=ConnectionError('нет связи')):
+        update_price(job.id)
+    state = client.get(f'/update_catalog/{job.id}').json()
+    # Assert
+    assert state['state'] == 'failed'
+    assert state['errors'] == ['нет связи']
+
+
+@pytest.mark.django_db
+def test_import_job_requires_shop(client):
+    # Arrange
+    buyer = User.objects.create_user('buyer@mail.ru', 'Pass1234')
+    client.force_authenticate(buyer)
+    # Act
+    response = client.post('/update_catalog', data={'url': URL})
+    # Assert
+    assert response.status_code == 403
+    assert not ImportJob.objects.exists()
+
+
+@pytest.mark.django_db
+def test_parallel_import_chunks_are_idempotent(user_shop, shop, price_list):
+    # Arrange
+    job = ImportJob.objects.create(user=user_shop, url=URL, mode='delta',
+                                   chunk_size=2, started_at=timezone.now())
+    CatalogImporter(shop).import_categories(price_list['categories'])
+    total = stage_goods(job.id, price_list['goods'])
+    # Act
+    import_chunk(job.id, shop.id, 0, 2, total)
+    import_chunk(job.id, shop.id, 0, 2, total)
+    import_chunk(job.id, shop.id, 2, 4, total)
+    result = finish_import([2, 2], job.id, shop.id,
+                           {'content_hash': 'abc', 'etag': '',
+                            'last_modified': ''})
+    # Assert
+    job.refresh_from_db()
+    assert result['Status']
+    assert job.rows == 4
+    assert ProductInfo.objects.filter(shop=shop).count() == 4
+    assert ProductParameter.objects.count() == 16
+    assert not StagedOffer.objects.exists()
+    assert not StagedParameter.objects.exists()
+    assert Shop.objects.get(pk=shop.pk).import_hash == 'abc'
+
+
+@pytest.mark.django_db
+def test_parallel_import_runs_as_chord(user_shop, source, price_list_content):
+    # Arrange
+    job = ImportJob.objects.create(user=user_shop, url=URL, mode='delta',
+                                   chunk_size=3)
+    celery_app.conf.task_always_eager = True
+    # Act
+    try:
+        with source(price_list_content):
+            update_price(job.id)
+    finally:
+        celery_app.conf.task_always_eager = False
+    # Assert
+    job.refresh_from_db()
+    assert job.state == 'done'
+    assert job.history.rows == 4
+    assert ProductInfo.objects.count() == 4
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('tail, dispatch_error', [
+    (b'  - id: 1\n    category: 224\n', None),
+    (b'', ConnectionError('брокер недоступен')),
+    ])
+def test_failed_dispatch_clears_staged_rows(user_shop, source,
+                                            price_list_content, tail,
+                                            dispatch_error):
+    # Arrange
+    job = ImportJob.objects.create(user=user_shop, url=URL, mode='delta',
+                                   chunk_size=3)
+    # Act
+    with source(price_list_content + tail), \
+            mock.patch('service.tasks.stage_goods',
+                       lambda job_id, goods: stage_goods(job_id, goods, 2)), \
+            mock.patch('service.tasks.chord', side_effect=dispatch_error):
+        update_price(job.id)
+    # Assert
+    job.refresh_from_db()
+    assert job.state == 'failed'
+    assert not StagedOffer.objects.filter(job=job).exists()
+    assert not StagedParameter.objects.filter(job=job).exists()
+
+
+@pytest.mark.django_db
+def test_staged_merge_matches_delta_import(user_shop, shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    goods = copy.deepcopy(price_list['goods'])
+    goods[0]['price'] += 1000
+    goods[1]['parameters']['Цвет'] = 'синий'
+    del goods[2]['parameters']['Цвет']
+    retired = goods.pop()
+    goods.append(dict(goods[0], id=100500, name='Новый товар'))
+    job = ImportJob.objects.create(user=user_shop, url=URL, mode=DELTA,
+                                   chunk_size=2, started_at=timezone.now())
+    total = stage_goods(job.id, goods)
+    import_chunk(job.id, shop.id, 0, 2, total)
+    import_chunk(job.id, shop.id, 2, 4, total)
+    # Act
+    finish_import([2, 2], job.id, shop.id,
+                  {'content_hash': 'abc', 'etag': '', 'last_modified': ''})
+    # Assert
+    history = ImportJob.objects.get(pk=job.pk).history
+    offers = {info.external_id: info
+              for info in ProductInfo.objects.filter(shop=shop)}
+    assert (history.rows, history.created, history.updated,
+            history.unchanged, history.retired) == (4, 1, 3, 0, 1)
+    assert offers[goods[0]['id']].price == goods[0]['price']
+    assert offers[retired['id']].quantity == 0
+    assert offers[100500].product.name == 'Новый товар'
+    assert ProductParameter.objects.get(
+        product_info=offers[goods[1]['id']], parameter__name='Цвет'
+        ).value == 'синий'
+    assert not ProductParameter.objects.filter(
+        product_info=offers[goods[2]['id']], parameter__name='Цвет'
+        ).exists()
+    assert ProductCard.objects.get(
+        product_info=offers[goods[0]['id']]
+        ).document['rigth_module']['Цена: '] == goods[0]['price']
@@ -0,0 +1,189 @@
+import csv
+import datetime
+import json
+import pytest
+from django.db import connection
+from service.importer import CatalogImporter, DELTA, COPY, get_importer
+from service.pg_loader import CopyLoader, GoodsReader
+from service.models import Shop, Category, Product, ProductInfo, \
+    Parameter, ProductParameter, Order, OrderItem, User
+
+
+@pytest.mark.django_db
+def test_import_catalog(shop, price_list):
+    # Act
+    stats = CatalogImporter(shop).run(price_list['categories'],
+                                      price_list['goods'])
+    # Assert
+    assert stats.rows == len(price_list['goods'])
+    assert ProductInfo.objects.filter(shop=shop).count() == stats.rows
+    assert Category.objects.filter(shops=shop).count() == 3
+    assert Product.objects.count() == 4
+    assert Parameter.objects.count() == 4
+    assert ProductParameter.objects.count() == stats.parameters
+    info = ProductInfo.objects.get(external_id=4216292)
+    assert info.price == 110000
+    assert info.product.name == 'Смартфон Apple iPhone XS Max 512GB (золотистый)'
+    assert info.product_parameters.get(parameter__name='Цвет').value == 'золотистый'
+
+
+@pytest.mark.django_db
+def test_import_catalog_query_count_is_per_batch(shop, price_list):
+    # Arrange
+    goods = [dict(item, id=item['id'] + number * 10)
+             for number in range(50)
+             for item in price_list['goods']]
+    other_shop = Shop.objects.create(name='Другой магазин', distance=10)
+    # Act
+    small = CatalogImporter(other_shop).run(price_list['categories'],
+                                            price_list['goods'][:1])
+    large = CatalogImporter(shop).run(price_list['categories'], goods)
+    # Assert
+    assert large.rows == len(goods)
+    assert large.queries <= small.queries + 2
+
+
+@pytest.mark.django_db
+def test_delta_import_changes_only_what_changed(shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    first, second, third, *rest = price_list['goods']
+    retired = rest[0]
+    goods = [dict(first, price=first['price'] - 1000),
+             dict(second, parameters=dict(second['parameters'], Цвет='синий')),
+             third,
+             *rest[1:],
+             dict(first, id=1, name='Новинка')]
+    untouched = ProductInfo.objects.get(external_id=third['id'])
+    retired_id = ProductInfo.objects.get(external_id=retired['id']).id
+    order = Order.objects.create(
+        user=User.objects.create_user('buyer@mail.ru', 'Pass1234'),
+        status='new'
+        )
+    OrderItem.objects.create(order=order, product_info_id=retired_id,
+                             shop=shop, quantity=1)
+    # Act
+    stats = CatalogImporter(shop, mode=DELTA).run(price_list['categories'],
+                                                   goods)
+    # Assert
+    assert stats.as_dict()['created'] == 1
+    assert stats.updated == 2
+    assert stats.unchanged == len(goods) - 3
+    assert stats.retired == 1
+    assert ProductInfo.objects.get(external_id=first['id']).price == \
+        first['price'] - 1000
+    assert ProductParameter.objects.get(
+        product_info__external_id=second['id'],
+        parameter__name='Цвет'
+        ).value == 'синий'
+    assert ProductInfo.objects.get(id=untouched.id).price == untouched.price
+    assert ProductInfo.objects.get(id=retired_id).quantity == 0
+    assert OrderItem.objects.filter(product_info_id=retired_id).exists()
+    assert ProductInfo.objects.get(external_id=1).product.name == 'Новинка'
+
+
+@pytest.mark.django_db
+def test_copy_loader_falls_back_to_orm(shop):
+    # Act
+    importer = get_importer(shop, mode=DELTA, loader=COPY)
+    # Assert
+    if connection.vendor == 'postgresql':
+        assert isinstance(importer, CopyLoader)
+    else:
+        assert type(importer) is CatalogImporter
+    with pytest.raises(ValueError):
+        get_importer(shop, loader='csv')
+
+
+@pytest.mark.skipif(connection.vendor != 'postgresql',
+                    reason='COPY есть только в PostgreSQL')
+@pytest.mark.django_db
+def test_copy_loader_matches_orm_import(shop, price_list):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], price_list['goods'])
+    expected = list(ProductInfo.objects.order_by('external_id').values_list(
+        'external_id', 'product__name', 'price', 'quantity'))
+    goods = [dict(item, price=item['price'] + 1)
+             for item in price_list['goods'][1:]]
+    # Act
+    stats = CopyLoader(shop, mode=DELTA).run(price_list['categories'], goods)
+    # Assert
+    assert stats.updated == len(goods)
+    assert stats.retired == 1
+    assert ProductInfo.objects.count() == len(expected)
+    assert ProductParameter.objects.count() == 4 * len(expected)
+
+
+@pytest.fixture
+def yaml_scalars(price_list):
+    """Товары со значениями параметров, которые SafeLoader не оставляет
+    строками: bool, дата и null"""
+    goods = [dict(item, parameters=dict(item['parameters']))
+             for item in price_list['goods']]
+    goods[0]['parameters'].update({'NFC': True,
+                                   'Дата выхода': datetime.date(2021, 5, 1),
+                                   'Гарантия': None})
+    return goods
+
+
+@pytest.mark.skipif(connection.vendor != 'postgresql',
+                    reason='COPY есть только в PostgreSQL')
+@pytest.mark.django_db
+def test_copy_loader_stores_parameters_as_orm(shop, price_list, yaml_scalars):
+    # Arrange
+    CatalogImporter(shop).run(price_list['categories'], yaml_scalars)
+    expected = set(ProductParameter.objects.values_list(
+        'product_info__external_id', 'parameter__name', 'value'))
+    # Act
+    stats = CopyLoader(shop, mode=DELTA).run(price_list['categories'],
+                                             yaml_scalars)
+    # Assert
+    assert (stats.updated, stats.parameters) == (0, 0)
+    assert set(ProductParameter.objects.values_list(
+        'product_info__external_id', 'parameter__name', 'value')) == expected
+    assert {'True', '2021-05-01', 'None'} <= {row[2] for row in expected}
+
+
+def test_goods_reader_encodes_values_as_orm(yaml_scalars):
+    # Act
+    content = GoodsReader(yaml_scalars[:1]).read()
+    parameters = json.loads(next(csv.reader([content]))[-1])
+    # Assert
+    assert parameters == {name: str(value) for name, value
+                          in yaml_scalars[0]['parameters'].items()}
+
+
+def test_goods_reader_streams_csv(price_list):
+    # Arrange
+    batches = []
+    reader = GoodsReader(price_list['goods'] * 3, batches.append, 5)
+    # Act
+    content = ''
+    while True:
+        chunk = reader.read(100)
+        if not chunk:
+            break
+        content += chunk
+    # Assert
+    assert batches == [5, 10, 12]
+    assert len(content.splitlines()) == 12
+    assert '"{""Диагональ (дюйм)"": ""6.5""' in content
+
+
+@pytest.mark.django_db
+def test_key_cache_resolves_repeated_keys_without_queries(
+        shop, price_list, django_assert_num_queries):
+    # Arrange
+    importer = CatalogImporter(shop)
+    importer.import_categories(price_list['categories'])
+    importer.resolve(price_list['goods'])
+    goods = [dict(item, id=item['id'] + 1) for item in price_list['goods']]
+    # Act
+    with django_assert_num_queries(0):
+        offers, values = importer.resolve(goods)
+    # Assert
+    assert len(offers) == len(goods)
+    assert len(importer.keys.parameters) == 4
+    assert set(importer.keys.products) == {
+        (item['name'], item['category']) for item in goods
+        }
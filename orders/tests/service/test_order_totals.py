@@ -0,0 +1,124 @@
+from decimal import Decimal
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from service.importer import CatalogImporter, DELTA
+from service.models import Category, Product, ProductInfo, Shop, User, \
+    Order, OrderItem, OrderShopTotal
+from service.pricing import price_basket
+
+
+@pytest.fixture
+def buyer():
+    return User.objects.create_user('buyer@mail.ru', 'Pass1234')
+
+@pytest.fixture
+def offers():
+    """Два предложения в магазине рядом и одно в 110 км"""
+    category = Category.objects.create(id=1, name='Смартфоны')
+    near = Shop.objects.create(name='Рядом', distance=10)
+    far = Shop.objects.create(name='Далеко', distance=110)
+    infos = []
+    for number, (shop, price) in enumerate(((near, 1000), (near, 500),
+                                            (far, 3000))):
+        product = Product.objects.create(name=f'Товар {number}',
+                                         category=category)
+        infos.append(ProductInfo.objects.create(
+            external_id=number, model='', shop=shop, product=product,
+            quantity=10, price=price, price_rrc=price
+            ))
+    return infos
+
+
+def add(order, info, quantity):
+    return OrderItem.objects.create(order=order, product_info=info,
+                                    shop=info.shop, quantity=quantity)
+
+def totals(order):
+    order.refresh_from_db()
+    return order.total_price, order.delivery_price, order.final_price
+
+
+@pytest.mark.django_db
+def test_totals_follow_item_changes(buyer, offers):
+    # Arrange
+    order = Order.objects.create(user=buyer, status='basket')
+    # Act
+    first = add(order, offers[0], 2)
+    add(order, offers[1], 1)
+    far = add(order, offers[2], 1)
+    after_add = totals(order)
+    first.quantity = 1
+    first.save()
+    far.delete()
+    after_change = totals(order)
+    # Assert
+    assert after_add == (5500, Decimal('1000.00'), Decimal('6500.00'))
+    assert after_change == (1500, Decimal('400.00'), Decimal('1900.00'))
+    assert list(OrderShopTotal.objects.filter(order=order).values_list(
+        'shop__name', 'quantity', 'subtotal', 'delivery_price'
+        )) == [('Рядом', 2, 1500, Decimal('400.00'))]
+
+
+@pytest.mark.django_db
+def test_prices_are_frozen_when_order_leaves_basket(buyer, offers):
+    # Arrange
+    order = Order.objects.create(user=buyer, status='basket')
+    item = add(order, offers[0], 2)
+    ProductInfo.objects.filter(pk=offers[0].pk).update(price=1100)
+    item.save()
+    in_basket = totals(order)
+    # Act
+    order.status = 'new'
+    order.save()
+    ProductInfo.objects.filter(pk=offers[0].pk).update(price=9999)
+    item.refresh_from_db()
+    item.quantity = 3
+    item.save()
+    # Assert
+    assert in_basket[0] == 2200
+    assert item.price == 1100
+    assert totals(order)[0] == 3300
+
+
+@pytest.mark.django_db
+def test_order_history_reads_only_orders(buyer, offers):
+    # Arrange
+    client = APIClient()
+    client.force_authenticate(buyer)
+    order = Order.objects.create(user=buyer, status='basket')
+    add(order, offers[2], 2)
+    order.status = 'confirmed'
+    order.save()
+    # Act
+    with CaptureQueriesContext(connection) as queries:
+        history = client.get('/user/orders').json()['История заказов']
+    # Assert
+    assert history[0]['total_price'] == 6000
+    assert history[0]['final_price'] == '6800.00'
+    assert len(queries) == 1
+    assert 'JOIN' not in queries[0]['sql']
+
+
+@pytest.mark.django_db
+def test_import_refreshes_basket_totals(buyer, offers):
+    # Arrange
+    basket = Order.objects.create(user=buyer, status='basket')
+    add(basket, offers[0], 2)
+    placed = Order.objects.create(user=buyer, status='basket')
+    add(placed, offers[1], 1)
+    placed.status = 'new'
+    placed.save()
+    goods = [{'id': info.external_id, 'category': 1, 'model': '',
+              'name': info.product.name, 'price': price,
+              'price_rrc': price, 'quantity': 10, 'parameters': {}}
+             for info, price in ((offers[0], 1200), (offers[1], 700))]
+    # Act
+    CatalogImporter(offers[0].shop, mode=DELTA).run(
+        [{'id': 1, 'name': 'Смартфоны'}], goods
+        )
+    # Assert
+    assert totals(basket)[0] == price_basket(buyer)['subtotal'] == 2400
+    assert totals(basket)[2] == price_basket(buyer)['total']
+    assert totals(placed)[0] == 500
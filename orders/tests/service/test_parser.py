@@ -0,0 +1,85 @@
+import io
+import pytest
+from service.parser import PriceList
+
+
+def test_price_list_matches_yaml_load(price_list_path, price_list):
+    # Arrange
+    expected = price_list
+    # Act
+    with open(price_list_path, 'rb') as stream:
+        price_list = PriceList(stream)
+        goods = list(price_list.goods())
+    # Assert
+    assert price_list.shop == expected['shop']
+    assert price_list.categories == expected['categories']
+    assert goods == expected['goods']
+
+
+def test_price_list_reads_goods_lazily():
+    # Arrange
+    item = ('  - id: {0}\n'
+            '    category: 224\n'
+            '    model: apple/iphone/xr\n'
+            '    name: Смартфон Apple iPhone XR 256GB (красный)\n'
+            '    price: 65000\n'
+            '    price_rrc: 69990\n'
+            '    quantity: 9\n'
+            '    parameters:\n'
+            '      "Цвет": красный\n')
+    content = ('shop: Связной\n'
+               'categories:\n'
+               '  - id: 224\n'
+               '    name: Смартфоны\n'
+               'goods:\n'
+               + ''.join(item.format(number) for number in range(20000)))
+    stream = io.BytesIO(content.encode('utf-8'))
+    # Act
+    goods = PriceList(stream).goods()
+    first = next(goods)
+    # Assert
+    assert first['id'] == 0
+    assert first['parameters'] == {'Цвет': 'красный'}
+    assert stream.tell() < len(stream.getvalue()) / 10
+    assert sum(1 for _ in goods) == 19999
+
+
+def test_price_list_rejects_non_mapping():
+    with pytest.raises(ValueError):
+        PriceList(io.BytesIO(b'- 1\n- 2\n'))
+
+
+def test_price_list_requires_header_before_goods():
+    # Arrange
+    content = ('shop: Связной\n'
+               'goods:\n'
+               '  - id: 1\n'
+               '    category: 224\n'
+               'categories:\n'
+               '  - id: 224\n'
+               '    name: Смартфоны\n')
+    # Act
+    with pytest.raises(ValueError) as error:
+        PriceList(io.BytesIO(content.encode('utf-8')))
+    # Assert
+    assert 'categories' in str(error.value)
+
+
+def test_price_list_resolves_aliases_across_goods():
+    # Arrange
+    content = ('shop: Связной\n'
+               'categories:\n'
+               '  - id: 224\n'
+               '    name: Смартфоны\n'
+               'goods:\n'
+               '  - id: 1\n'
+               '    category: 224\n'
+               '    parameters: &phone\n'
+               '      "Цвет": красный\n'
+               '  - id: 2\n'
+               '    category: 224\n'
+               '    parameters: *phone\n')
+    # Act
+    goods = list(PriceList(io.BytesIO(content.encode('utf-8'))).goods())
+    # Assert
+    assert goods[1]['parameters'] == {'Цвет': 'красный'}
@@ -0,0 +1,93 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from service.models import Category, Product, ProductInfo, Shop, User, \
+    Order, OrderItem
+from service.pricing import delivery_rate, price_basket
+
+
+@pytest.fixture
+def buyer():
+    return User.objects.create_user('buyer@mail.ru', 'Pass1234')
+
+@pytest.fixture
+def basket(buyer):
+    """Корзина из трёх магазинов: рядом, 110 км и 420 км"""
+    category = Category.objects.create(id=1, name='Смартфоны')
+    order = Order.objects.create(user=buyer, status='basket')
+    other = Order.objects.create(user=buyer, status='new')
+    for number, (distance, price, quantity) in enumerate((
+            (30, 1000, 2), (30, 500, 1), (110, 3000, 1), (420, 200, 5)
+            )):
+        shop, _ = Shop.objects.get_or_create(name=f'Магазин {distance}',
+                                             distance=distance)
+        product = Product.objects.create(name=f'Товар {number}',
+                                         category=category)
+        info = ProductInfo.objects.create(
+            external_id=number, model='', shop=shop, product=product,
+            quantity=10, price=price, price_rrc=price
+            )
+        OrderItem.objects.create(order=order, product_info=info, shop=shop,
+                                 quantity=quantity)
+        # позиции других заказов в расчёт не попадают
+        OrderItem.objects.create(order=other, product_info=info, shop=shop,
+                                 quantity=7)
+    return order
+
+
+@pytest.mark.parametrize('distance, rate', [
+    (10, 200),
+    (50, 200),
+    (55, 200),
+    (300, 1090.909),
+    (420, 1600),
+    ])
+def test_delivery_rate_tiers(distance, rate):
+    # Assert
+    assert delivery_rate(distance, 100) == pytest.approx(rate, abs=0.001)
+
+
+@pytest.mark.django_db
+def test_multi_shop_basket_totals(buyer, basket):
+    # Act
+    with CaptureQueriesContext(connection) as queries:
+        pricing = price_basket(buyer)
+    # Assert
+    assert len(queries) == 1
+    assert [line['total'] for line in pricing['lines']] == \
+        [2000, 500, 3000, 1000]
+    assert [(shop['distance'], shop['quantity'], shop['subtotal'],
+             shop['delivery']) for shop in pricing['shops']] == \
+        [(30, 3, 2500, 600), (110, 1, 3000, 400), (420, 5, 1000, 8000)]
+    assert (pricing['subtotal'], pricing['delivery'], pricing['total']) == \
+        (6500, 9000, 15500)
+
+
+@pytest.mark.django_db
+def test_discount_factor_scales_delivery(buyer, basket):
+    # Arrange
+    buyer.discount_factor = 90
+    # Act
+    pricing = price_basket(buyer)
+    # Assert
+    assert [shop['delivery'] for shop in pricing['shops']] == \
+        [540, 360, 7200]
+    assert pricing['total'] == 6500 + 8100
+
+
+@pytest.mark.django_db
+def test_basket_view_reports_shops(buyer, basket):
+    # Arrange
+    client = APIClient()
+    client.force_authenticate(buyer)
+    # Act
+    response = client.get('/user/basket')
+    # Assert
+    assert response.status_code == 200
+    assert response.json()['Итог: '] == {'Сумма: ': 6500,
+                                         'Стоимость доставки: ': 9000,
+                                         'Итог: ': 15500}
+    assert [shop['Стоимость доставки: ']
+            for shop in response.json()['По магазинам: ']] == \
+        [600, 400, 8000]